@@ -2,27 +2,79 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_cors import CORS
-from app.config import Config
+from app.config import get_config
 
 # Inicializar extensiones
 db = SQLAlchemy()
 migrate = Migrate()
 
-def create_app():
+def create_app(config_name=None):
+    """Crea la aplicación con el perfil indicado (development, testing, production) o el de FLASK_ENV"""
     app = Flask(__name__)
-    app.config.from_object(Config)
+    app.config.from_object(get_config(config_name))
     
     # Inicializar extensiones con la app
     db.init_app(app)
-    migrate.init_app(app, db)
+    from app.engine import configure_engine
+    configure_engine(app)
+    migrate.init_app(app, db, render_as_batch=True)
     CORS(app)
     
     # Registrar blueprints
     from app.routes.parking_routes import parking_bp
     app.register_blueprint(parking_bp, url_prefix='/api')
+    from app.routes.admin_routes import admin_bp
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    from app.routes.report_routes import reports_bp
+    app.register_blueprint(reports_bp, url_prefix='/api/reports')
     
-    # Crear tablas si no existen
+    # Métricas de latencia y consultas por endpoint (/metrics)
+    from app.metrics import request_metrics
+    request_metrics.init_app(app)
+    
+    # Registro de consultas lentas (GET /api/admin/slow-queries)
+    from app.slow_queries import slow_query_log
+    slow_query_log.init_app(app)
+    
+    # Perfilado bajo demanda de peticiones (X-Profile / ?profile=)
+    from app.profiling import request_profiler
+    request_profiler.init_app(app)
+    
+    # El esquema lo crean las migraciones (flask db upgrade); solo las pruebas y
+    # los benchmarks (CREATE_TABLES) lo crean directamente desde los modelos.
+    # La CLI construye la aplicación antes de ejecutar `flask db ...`, así que
+    # aquí no se puede crear nada que las migraciones vayan a crear después
     with app.app_context():
-        db.create_all()
+        if app.config['CREATE_TABLES']:
+            db.create_all()
+        schema_ready = set(db.metadata.tables) <= set(db.inspect(db.engine).get_table_names())
+    if not schema_ready:
+        app.logger.warning('El esquema de la base de datos está incompleto: ejecute flask db upgrade')
+    
+    # Versión de datos para ETag / If-None-Match
+    from app.data_version import data_version
+    data_version.init_app(app)
+    
+    # Caché de reportes analíticos (GET /api/reports/dwell)
+    from app.analytics import report_cache
+    report_cache.init_app(app)
+    
+    # Índice en memoria de espacios libres y stream de sus cambios
+    from app.stream import occupancy_broker
+    occupancy_broker.init_app(app)
+    from app.space_index import space_index
+    
+    # Contadores de estadísticas y su reconciliación periódica
+    from app.counters import counter_reconciler
+    
+    # Sin esquema (p. ej. flask db upgrade sobre una base nueva) no se precarga
+    # nada: el índice de espacios libres se construye en su primera lectura
+    if schema_ready:
+        space_index.init_app(app)
+        counter_reconciler.init_app(app)
+    
+    # Comandos de línea de comandos (flask ...)
+    from app.commands import register_commands
+    register_commands(app)
     
     return app
\ No newline at end of file
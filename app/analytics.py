@@ -0,0 +1,319 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from itertools import chain
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import event
+
+from app import db
+from app.filters import session_filter_clauses
+from app.models.parking import ParkingSpace, ParkingSession, ParkingSessionHistory
+
+# Dimensiones de GET /api/reports/occupancy (?by=)
+OCCUPANCY_DIMENSIONS = ('floor', 'space_type')
+
+EPOCH = datetime(1970, 1, 1)
+
+# Percentiles y límites (minutos) del histograma de permanencia de GET /api/reports/dwell
+DWELL_PERCENTILES = (50, 75, 90, 95, 99)
+DWELL_BUCKETS = (0, 15, 30, 60, 120, 240, 480, 720, 1440)
+
+
+def to_epoch(value):
+    """Segundos desde 1970-01-01 de un datetime UTC sin zona horaria"""
+    return int((value - EPOCH).total_seconds())
+
+
+def session_intervals(start, end, now, chunk_size):
+    """
+    Genera bloques de hasta `chunk_size` filas (arrays NumPy int64 de forma
+    (n, 3): entrada, salida y space_id) de las sesiones vivas y archivadas que
+    se superponen con [start, end). Los tiempos llegan de SQL como segundos
+    epoch enteros, sin crear un datetime por fila; las sesiones activas
+    terminan en `now`. Nunca hay más de un bloque en memoria.
+
+    La consulta se resuelve solo con los índices (entry_time, exit_time,
+    space_id) de ambas tablas, sin leer las filas de sesiones.
+    """
+    now = to_epoch(now)
+    query = db.union_all(*[
+        db.select(
+            db.extract('epoch', model.entry_time),
+            db.func.coalesce(db.extract('epoch', model.exit_time), now),
+            model.space_id
+        ).where(model.entry_time < end, db.or_(model.exit_time.is_(None), model.exit_time > start))
+        for model in (ParkingSession, ParkingSessionHistory)
+    ])
+    return _chunks(query, 3, chunk_size)
+
+
+def closed_session_times(filters, chunk_size):
+    """
+    Genera bloques (arrays NumPy int64 de forma (n, 2): entrada y salida en
+    segundos epoch) de las sesiones cerradas, vivas y archivadas, que
+    cumplen `filters` (los de app/filters.py).
+    """
+    query = db.union_all(*[
+        db.select(db.extract('epoch', model.entry_time), db.extract('epoch', model.exit_time))
+        .where(model.is_active.is_(False), model.exit_time.isnot(None), *session_filter_clauses(model, filters))
+        for model in (ParkingSession, ParkingSessionHistory)
+    ])
+    return _chunks(query, 2, chunk_size)
+
+
+def _chunks(query, width, chunk_size):
+    """Ejecuta `query` (columnas enteras) y genera sus filas en arrays (n, width) de hasta chunk_size filas"""
+    result = db.session.execute(query, execution_options={'yield_per': chunk_size})
+    for rows in result.partitions():
+        # np.array() sobre objetos Row es lento: se aplanan a un iterador de enteros
+        yield np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=width * len(rows)).reshape(-1, width)
+
+
+def occupancy(start, end, step, by=None, now=None, chunk_size=None):
+    """
+    Ocupación entre `start` y `end` en intervalos de `step` minutos, en total
+    o por piso / tipo de espacio (`by`). Cada intervalo reporta la ocupación
+    promedio y la máxima, muestreando minuto a minuto (una sesión cuenta en
+    el minuto t si entry_time <= t < exit_time).
+
+    Barrido con diferencias: cada sesión suma +1 en su primer minuto y -1 en
+    el primer minuto después de su salida, en un arreglo por grupo (un
+    histograma de eventos, que equivale a ordenarlos); la suma acumulada da
+    la ocupación en cada minuto. Las sesiones se leen por bloques de
+    `chunk_size` (ANALYTICS_CHUNK_SIZE) y solo sus eventos se acumulan, así
+    que la memoria depende del rango y no del número de sesiones.
+
+    `start` se redondea al minuto y el rango se extiende hasta completar el
+    último intervalo. Retorna (inicios de intervalo, series); cada serie es un
+    dict con la clave del grupo, `capacity` (espacios actuales del grupo),
+    `average` y `peak`.
+    """
+    if chunk_size is None:
+        chunk_size = current_app.config['ANALYTICS_CHUNK_SIZE']
+    if now is None:
+        now = datetime.utcnow()
+    start = start.replace(second=0, microsecond=0)
+    buckets = max(1, -(-int((end - start).total_seconds()) // (step * 60)))
+    minutes = buckets * step
+    end = start + timedelta(minutes=minutes)
+
+    # Grupo de cada espacio: las sesiones solo traen space_id y se clasifican
+    # con un arreglo indexado por id (los ids empiezan en 1; 0 = sin grupo)
+    key = getattr(ParkingSpace, by) if by else db.literal(None)
+    spaces = db.session.execute(db.select(ParkingSpace.id, key)).all()
+    keys = sorted({space_key for _, space_key in spaces}) if by else [None]
+    group_of = {space_key: index for index, space_key in enumerate(keys)}
+    lookup = np.full(max((space_id for space_id, _ in spaces), default=0) + 1, -1, dtype=np.int64)
+    for space_id, space_key in spaces:
+        lookup[space_id] = group_of[space_key]
+    capacity = np.bincount(lookup[lookup >= 0], minlength=len(keys))
+
+    width = minutes + 1
+    diff = np.zeros(len(keys) * width, dtype=np.int64)
+    origin = to_epoch(start)
+    for chunk in session_intervals(start, end, now, chunk_size):
+        space_ids = chunk[:, 2]
+        groups = lookup[np.where(space_ids < len(lookup), space_ids, 0)]
+        # Primer minuto con la sesión presente y primer minuto después de su salida
+        first = np.clip(-((origin - chunk[:, 0]) // 60), 0, minutes)
+        last = np.clip(-((origin - chunk[:, 1]) // 60), 0, minutes)
+        keep = (groups >= 0) & (first < last)
+        offset = groups[keep] * width
+        np.add.at(diff, offset + first[keep], 1)
+        np.add.at(diff, offset + last[keep], -1)
+
+    per_minute = np.cumsum(diff.reshape(len(keys), width)[:, :minutes], axis=1).reshape(len(keys), buckets, step)
+    average = per_minute.mean(axis=2).round(2)
+    peak = per_minute.max(axis=2)
+
+    starts = [(start + timedelta(minutes=step * index)).isoformat() for index in range(buckets)]
+    series = []
+    for index, space_key in enumerate(keys):
+        item = {by: space_key} if by else {}
+        item.update(capacity=int(capacity[index]), average=average[index].tolist(), peak=peak[index].tolist())
+        series.append(item)
+    return starts, series
+
+
+def dwell_report(filters, chunk_size=None):
+    """
+    Distribución de la permanencia y horas pico de llegadas y salidas de las
+    sesiones cerradas que cumplen `filters`.
+
+    Las sesiones se leen por bloques y cada bloque solo suma a acumuladores
+    de tamaño fijo: un histograma de permanencia por minuto completo (de él
+    salen los percentiles, exactos al minuto, sin guardar una permanencia por
+    sesión) y conteos de llegadas y salidas por día de la semana y hora (UTC,
+    0 = lunes). La permanencia es exit_time - entry_time (total_hours es ese
+    mismo valor redondeado).
+    """
+    if chunk_size is None:
+        chunk_size = current_app.config['ANALYTICS_CHUNK_SIZE']
+
+    minutes = np.zeros(0, dtype=np.int64)
+    buckets = np.zeros(len(DWELL_BUCKETS), dtype=np.int64)
+    arrivals = np.zeros(7 * 24, dtype=np.int64)
+    departures = np.zeros(7 * 24, dtype=np.int64)
+    total_seconds = 0
+    for chunk in closed_session_times(filters, chunk_size):
+        entry, exit_ = chunk[:, 0], chunk[:, 1]
+        dwell = np.maximum(exit_ - entry, 0)
+        total_seconds += int(dwell.sum())
+
+        counts = np.bincount(dwell // 60)
+        if len(counts) > len(minutes):
+            minutes = np.pad(minutes, (0, len(counts) - len(minutes)))
+        minutes[:len(counts)] += counts
+        buckets += np.bincount(np.searchsorted(DWELL_BUCKETS, dwell // 60, side='right') - 1,
+                               minlength=len(DWELL_BUCKETS))
+        arrivals += np.bincount(_weekday_hour(entry), minlength=7 * 24)
+        departures += np.bincount(_weekday_hour(exit_), minlength=7 * 24)
+
+    sessions = int(minutes.sum())
+    if sessions:
+        # Percentil por rango más cercano: el menor minuto que acumula al menos p% de las sesiones
+        ranks = np.maximum(np.ceil(np.array(DWELL_PERCENTILES) / 100 * sessions), 1)
+        percentiles = np.searchsorted(np.cumsum(minutes), ranks).tolist()
+    else:
+        percentiles = [None] * len(DWELL_PERCENTILES)
+
+    return {
+        'sessions': sessions,
+        'dwell': {
+            'mean_minutes': round(total_seconds / sessions / 60, 2) if sessions else None,
+            'max_minutes': len(minutes) - 1 if sessions else None,
+            'percentiles': {f'p{p}': value for p, value in zip(DWELL_PERCENTILES, percentiles)},
+            'histogram': [
+                {'min_minutes': low, 'max_minutes': high, 'sessions': int(count)}
+                for low, high, count in zip(DWELL_BUCKETS, DWELL_BUCKETS[1:] + (None,), buckets)
+            ],
+        },
+        'arrivals': _peaks(arrivals),
+        'departures': _peaks(departures),
+    }
+
+
+def _weekday_hour(times):
+    """Índice día de la semana * 24 + hora (UTC) de tiempos epoch; el 1970-01-01 fue jueves (3)"""
+    return (times // 86400 + 3) % 7 * 24 + times // 3600 % 24
+
+
+def _peaks(counts):
+    """Conteos por hora, por día de la semana y por ambos, con la hora de mayor movimiento"""
+    grid = counts.reshape(7, 24)
+    peak = int(counts.argmax())
+    return {
+        'by_hour': grid.sum(axis=0).tolist(),
+        'by_weekday': grid.sum(axis=1).tolist(),
+        'by_weekday_hour': grid.tolist(),
+        'peak': {'weekday': peak // 24, 'hour': peak % 24, 'sessions': int(counts[peak])} if counts[peak] else None,
+    }
+
+
+class ReportCache:
+    """
+    Resultados de reportes analíticos por (rango de fechas, filtros).
+
+    Las rutas que cierran o pagan sesiones llaman a mark() antes del commit;
+    después del commit se descartan las entradas cuyo rango (?from=&to= sobre
+    ?time_field=) contiene alguna de esas sesiones, y nada más. Los cambios de
+    otros procesos no se ven aquí: cada entrada vive a lo sumo
+    ANALYTICS_CACHE_TTL segundos. Se guardan hasta ANALYTICS_CACHE_SIZE
+    entradas (las menos usadas salen primero).
+
+    Cada entrada guarda la versión de datos (data_version) leída antes de
+    calcularla; la ruta la usa como ETag, así que un resultado guardado nunca
+    se sirve con la versión más nueva que ya vio otro proceso.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # clave -> (guardada en, filtros, resultado, versión de datos)
+        self._pending = {}  # clave -> (token, filtros) de cálculos en curso
+        self.size = 128
+        self.ttl = 60.0
+
+    def init_app(self, app):
+        self.size = app.config.get('ANALYTICS_CACHE_SIZE', 128)
+        self.ttl = app.config.get('ANALYTICS_CACHE_TTL', 60.0)
+        self.clear()
+        if not event.contains(db.session, 'after_commit', _after_commit):
+            event.listen(db.session, 'after_commit', _after_commit)
+            event.listen(db.session, 'after_rollback', _after_rollback)
+
+    def get_or_compute(self, name, filters, compute, version):
+        """
+        Resultado guardado del reporte `name` con `filters`, o compute() si no
+        hay uno vigente. `version` es la versión de datos actual, leída antes
+        de calcular. Retorna (resultado, versión de datos del resultado).
+        """
+        key = (name, tuple(sorted(filters.items())))
+        token = object()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                return entry[2], entry[3]
+            self._pending[key] = (token, filters)
+
+        result = compute()
+        with self._lock:
+            # Si una sesión del rango cambió mientras se calculaba, el resultado no se guarda
+            pending = self._pending.get(key)
+            if pending is not None and pending[0] is token:
+                del self._pending[key]
+                self._entries[key] = (time.monotonic(), filters, result, version)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+        return result, version
+
+    def mark(self, sessions):
+        """Registra sesiones cerradas o pagadas en la transacción actual; debe llamarse antes del commit"""
+        db.session.info.setdefault('report_cache_sessions', []).extend(
+            {'entry_time': session.entry_time, 'exit_time': session.exit_time} for session in sessions
+        )
+
+    def invalidate(self, sessions):
+        """Descarta las entradas (y cálculos en curso) cuyo rango contiene alguna de `sessions`"""
+        with self._lock:
+            for store in (self._entries, self._pending):
+                for key in [key for key, value in store.items() if _covers(value[1], sessions)]:
+                    del store[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+
+
+def _covers(filters, sessions):
+    """True si el rango de tiempo de `filters` contiene alguna de `sessions` (sin rango: siempre)"""
+    bounds = [filters[name] for name in ('from', 'to') if name in filters]
+    if not bounds:
+        return True
+    field = bounds[0][0]
+    start = filters['from'][1] if 'from' in filters else None
+    end = filters['to'][1] if 'to' in filters else None
+    return any(
+        session[field] is not None
+        and (start is None or session[field] >= start)
+        and (end is None or session[field] < end)
+        for session in sessions
+    )
+
+
+def _after_commit(session):
+    sessions = session.info.pop('report_cache_sessions', None)
+    if sessions:
+        report_cache.invalidate(sessions)
+
+
+def _after_rollback(session):
+    session.info.pop('report_cache_sessions', None)
+
+
+report_cache = ReportCache()
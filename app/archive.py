@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import db
+from app.models.parking import ParkingSession, ParkingSessionHistory
+
+# Columnas que se copian de parking_sessions a parking_sessions_history
+ARCHIVED_COLUMNS = [column.name for column in ParkingSession.__table__.columns]
+
+
+def archive_sessions(older_than_days=None, batch_size=None):
+    """
+    Mueve a parking_sessions_history las sesiones cerradas y pagadas cuya
+    salida es anterior a `older_than_days` días (ARCHIVE_AFTER_DAYS).
+
+    Se procesan bloques de `batch_size` filas (ARCHIVE_BATCH_SIZE): cada bloque
+    es un INSERT ... SELECT más un DELETE por id en su propia transacción, así
+    que el bloqueo de escritura se libera entre bloques y las entradas y
+    salidas no esperan a que termine todo el archivado.
+    Retorna el número de sesiones archivadas.
+    """
+    if older_than_days is None:
+        older_than_days = current_app.config['ARCHIVE_AFTER_DAYS']
+    if batch_size is None:
+        batch_size = current_app.config['ARCHIVE_BATCH_SIZE']
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    hot = ParkingSession.__table__
+    history = ParkingSessionHistory.__table__
+    archived = 0
+
+    while True:
+        ids = db.session.scalars(
+            db.select(hot.c.id)
+            .where(
+                hot.c.is_active.is_(False),
+                hot.c.payment_status == 'paid',
+                hot.c.exit_time < cutoff
+            )
+            .order_by(hot.c.id)
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            break
+
+        # Las sesiones cerradas y pagadas ya no cambian, así que copiar y
+        # borrar por id es seguro aunque otras peticiones escriban en medio
+        db.session.execute(
+            history.insert().from_select(
+                ARCHIVED_COLUMNS + ['archived_at'],
+                db.select(
+                    *[hot.c[name] for name in ARCHIVED_COLUMNS],
+                    db.literal(datetime.utcnow(), db.DateTime)
+                ).where(hot.c.id.in_(ids))
+            )
+        )
+        db.session.execute(hot.delete().where(hot.c.id.in_(ids)))
+        db.session.commit()
+        archived += len(ids)
+
+    return archived
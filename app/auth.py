@@ -0,0 +1,25 @@
+import hmac
+
+from flask import current_app, jsonify, request
+
+
+def admin_token_error():
+    """
+    Verifica el token de administración (Authorization: Bearer <token> o
+    X-Admin-Token). Retorna None si la petición está autorizada o la
+    respuesta de error. Sin ADMIN_TOKEN configurado solo se autoriza en
+    desarrollo y pruebas.
+    """
+    token = current_app.config.get('ADMIN_TOKEN')
+    if not token:
+        if current_app.debug or current_app.testing:
+            return None
+        return jsonify({'error': 'Configure ADMIN_TOKEN para usar los endpoints de administración'}), 403
+
+    provided = request.headers.get('X-Admin-Token')
+    authorization = request.headers.get('Authorization', '')
+    if authorization.startswith('Bearer '):
+        provided = authorization[len('Bearer '):]
+    if not provided or not hmac.compare_digest(provided, token):
+        return jsonify({'error': 'Token de administración inválido'}), 401
+    return None
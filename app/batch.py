@@ -0,0 +1,273 @@
+from datetime import datetime
+
+from app import counters, db, revenue
+from app.analytics import report_cache
+from app.models.parking import ParkingSpace, Vehicle, ParkingSession
+from app.space_index import claim_best_space, space_index
+
+EVENT_TYPES = ('entry', 'exit')
+
+
+class SessionBatch:
+    """
+    Procesa un lote de eventos de entrada/salida en una sola transacción.
+
+    La transacción empieza con una escritura (la versión del índice de
+    espacios), que en SQLite toma el bloqueo de escritura: desde ese momento
+    ningún otro proceso puede confirmar cambios, así que los vehículos,
+    sesiones activas y espacios se cargan una sola vez para todo el lote y se
+    validan en memoria. Cada evento produce su propio resultado; los eventos
+    inválidos se reportan sin afectar a los demás, y una entrada cuyo espacio
+    asignado resulta ocupado falla sola con 409.
+    """
+
+    def __init__(self, events):
+        self.events = events
+        self.results = [None] * len(events)
+        self.vehicles = {}  # placa -> Vehicle
+        self.active_sessions = {}  # placa -> ParkingSession activa
+        self.spaces = {}  # space_id -> ParkingSpace
+        self.touched_spaces = {}  # space_id -> ParkingSpace modificado en el lote
+        self.claimed = {}  # space_id asignado automáticamente -> (índice, placa, vehículo nuevo); se ocupan al final
+        self.index_stale = False  # el índice no coincidía con la base de datos
+        self.deltas = {'total_vehicles': 0, 'occupied_spaces': 0, 'active_sessions': 0}
+        self.sessions = []  # (índice del evento, status, ParkingSession)
+        self.closed = []  # (ParkingSession, ParkingSpace, Vehicle) cerradas, para el resumen de ingresos
+
+    def run(self):
+        try:
+            # La primera escritura toma el bloqueo; desde aquí ningún otro
+            # proceso puede cambiar espacios hasta el commit del lote. Si la
+            # versión no es la siguiente a la del índice, otro proceso cambió
+            # espacios antes: el índice se reconstruye ya con el bloqueo tomado
+            version = space_index.bump_version()
+            if space_index.version is None or version != space_index.version + 1:
+                space_index.rebuild(version - 1)
+            self._load()
+
+            # Sin autoflush: los INSERT/UPDATE del lote se emiten juntos al final
+            with db.session.no_autoflush:
+                for index, event in enumerate(self.events):
+                    error = self._validate(event)
+                    if error:
+                        self._fail(index, 400, error)
+                    elif event['type'] == 'entry':
+                        self._entry(index, event)
+                    else:
+                        self._exit(index, event)
+
+                self._occupy_claimed_spaces()
+            revenue.record(self.closed)
+            report_cache.mark(session for session, _, _ in self.closed)
+            if self.sessions:
+                # La versión de espacios ya subió al tomar el bloqueo
+                counters.adjust(**self.deltas)
+            db.session.flush()
+
+            # Serializar antes del commit: vehículos y espacios ya están en memoria
+            for index, status, session in self.sessions:
+                self.results[index] = {'index': index, 'status': status, 'session': session.to_dict()}
+            freed = [space.to_dict() for space in self.touched_spaces.values() if not space.is_occupied]
+            taken = [space_id for space_id, space in self.touched_spaces.items() if space.is_occupied]
+
+            db.session.commit()
+        except Exception:
+            # Los espacios reservados en el índice no se ocuparon: reconstruirlo
+            db.session.rollback()
+            space_index.invalidate()
+            raise
+
+        if self.index_stale:
+            space_index.invalidate()
+        else:
+            space_index.apply(version, freed=freed, taken=taken)
+
+        return self.results
+
+    def _validate(self, event):
+        if not isinstance(event, dict):
+            return 'El evento debe ser un objeto'
+        if event.get('type') not in EVENT_TYPES:
+            return "type debe ser 'entry' o 'exit'"
+        if not event.get('license_plate'):
+            return 'Placa es requerida'
+        return None
+
+    def _load(self):
+        """Carga con una consulta por tabla todo lo que el lote necesita"""
+        plates = {
+            event['license_plate'].upper()
+            for event in self.events
+            if isinstance(event, dict) and event.get('license_plate')
+        }
+        if plates:
+            for vehicle in Vehicle.query.filter(Vehicle.license_plate.in_(plates)):
+                self.vehicles[vehicle.license_plate] = vehicle
+
+        vehicle_ids = [vehicle.id for vehicle in self.vehicles.values()]
+        if vehicle_ids:
+            sessions = ParkingSession.query.filter(
+                ParkingSession.vehicle_id.in_(vehicle_ids),
+                ParkingSession.is_active.is_(True)
+            )
+            plates_by_id = {vehicle.id: plate for plate, vehicle in self.vehicles.items()}
+            for session in sessions:
+                self.active_sessions[plates_by_id[session.vehicle_id]] = session
+
+        space_ids = {session.space_id for session in self.active_sessions.values()}
+        for event in self.events:
+            if isinstance(event, dict) and event.get('type') == 'entry' and event.get('space_id'):
+                try:
+                    space_ids.add(int(event['space_id']))
+                except (TypeError, ValueError):
+                    pass
+        if space_ids:
+            for space in ParkingSpace.query.filter(ParkingSpace.id.in_(space_ids)):
+                self.spaces[space.id] = space
+
+    def _fail(self, index, status, error):
+        self.results[index] = {'index': index, 'status': status, 'error': error}
+
+    def _entry(self, index, event):
+        plate = event['license_plate'].upper()
+        vehicle = self.vehicles.get(plate)
+        new_vehicle = vehicle is None
+        if new_vehicle:
+            if not event.get('owner_name') or not event.get('vehicle_type'):
+                return self._fail(index, 400, 'Para vehículos nuevos se requiere nombre del propietario y tipo de vehículo')
+
+            vehicle = Vehicle(
+                license_plate=plate,
+                vehicle_type=event['vehicle_type'],
+                owner_name=event['owner_name'],
+                owner_phone=event.get('owner_phone')
+            )
+        elif plate in self.active_sessions:
+            return self._fail(index, 400, 'El vehículo ya tiene una sesión activa')
+
+        if event.get('space_id'):
+            try:
+                space = self.spaces.get(int(event['space_id']))
+            except (TypeError, ValueError):
+                space = None
+            if space is None:
+                return self._fail(index, 404, 'Espacio no encontrado')
+            if space.is_occupied:
+                return self._fail(index, 400, 'El espacio ya está ocupado')
+            space.is_occupied = True
+        else:
+            claimed = claim_best_space(
+                event.get('space_type') or vehicle.vehicle_type,
+                occupy=self._occupy_claimed,
+                check_version=False
+            )
+            if claimed is None:
+                return self._fail(index, 400, 'No hay espacios disponibles para este tipo de vehículo')
+            space = self.spaces.get(claimed['id'])
+
+        # El vehículo nuevo solo se guarda si su entrada es válida
+        if new_vehicle:
+            db.session.add(vehicle)
+            self.vehicles[plate] = vehicle
+            self.deltas['total_vehicles'] += 1
+
+        if space is not None:
+            session = ParkingSession(vehicle=vehicle, space=space, entry_time=datetime.utcnow())
+            self.touched_spaces[space.id] = space
+        else:
+            session = ParkingSession(vehicle=vehicle, space_id=claimed['id'], entry_time=datetime.utcnow())
+            self.claimed[claimed['id']] = (index, plate, new_vehicle)
+        db.session.add(session)
+        self.active_sessions[plate] = session
+        self.deltas['occupied_spaces'] += 1
+        self.deltas['active_sessions'] += 1
+        self.sessions.append((index, 201, session))
+
+    def _occupy_claimed(self, space_id):
+        """
+        Ocupa un candidato de la asignación automática. Si el espacio ya está
+        cargado en el lote manda su estado en memoria (puede haber sido ocupado
+        por una entrada anterior aún sin escribir); si no, UPDATE condicional.
+        """
+        space = self.spaces.get(space_id)
+        if space is not None:
+            if space.is_occupied:
+                self.touched_spaces[space_id] = space  # quitarlo del índice al confirmar
+                return False
+            space.is_occupied = True
+            return True
+
+        # Con el índice verificado y el bloqueo tomado, el candidato está libre:
+        # _entry lo registra y se ocupa junto con los demás en _occupy_claimed_spaces
+        return True
+
+    def _occupy_claimed_spaces(self):
+        """
+        Ocupa en un solo UPDATE los espacios asignados automáticamente. Si
+        alguno ya no estaba libre, solo su entrada se deshace y falla con 409;
+        el índice se reconstruye después del commit.
+        """
+        if not self.claimed:
+            return
+
+        occupied = set(db.session.scalars(
+            db.update(ParkingSpace)
+            .where(ParkingSpace.id.in_(self.claimed), ParkingSpace.is_occupied.is_(False))
+            .values(is_occupied=True)
+            .returning(ParkingSpace.id)
+            .execution_options(synchronize_session=False)
+        ))
+        for space_id, (index, plate, new_vehicle) in self.claimed.items():
+            if space_id not in occupied:
+                self._undo_entry(index, plate, new_vehicle)
+                self.index_stale = True
+
+        if occupied:
+            for space in ParkingSpace.query.filter(ParkingSpace.id.in_(occupied)):
+                self.touched_spaces[space.id] = space
+
+    def _undo_entry(self, index, plate, new_vehicle):
+        """Descarta una entrada aún sin escribir y la reporta como conflicto"""
+        session = self.active_sessions.pop(plate)
+        self.sessions = [entry for entry in self.sessions if entry[0] != index]
+        vehicle = session.vehicle
+        # Fuera de vehicle.sessions, para que el flush no la vuelva a agregar
+        session.vehicle = None
+        db.session.expunge(session)
+        if new_vehicle:
+            db.session.expunge(vehicle)
+            del self.vehicles[plate]
+            self.deltas['total_vehicles'] -= 1
+        self.deltas['occupied_spaces'] -= 1
+        self.deltas['active_sessions'] -= 1
+        self._fail(index, 409, 'El espacio asignado ya no está libre')
+
+    def _exit(self, index, event):
+        plate = event['license_plate'].upper()
+        if plate not in self.vehicles:
+            return self._fail(index, 404, 'Vehículo no encontrado')
+
+        session = self.active_sessions.pop(plate, None)
+        if session is None:
+            return self._fail(index, 400, 'No hay sesión activa para este vehículo')
+
+        space = session.space or self.spaces.get(session.space_id)
+        if space is None:
+            # Asignado automáticamente en este mismo lote: ya no hay que ocuparlo
+            self.claimed.pop(session.space_id, None)
+            space = db.session.get(ParkingSpace, session.space_id)
+            self.spaces[space.id] = space
+        session.space = space
+
+        session.exit_time = datetime.utcnow()
+        session.is_active = False
+        session.calculate_cost()
+
+        space.is_occupied = False
+        self.touched_spaces[space.id] = space
+        # Disponible para las entradas automáticas que siguen en el lote
+        space_index.unclaim(space.to_dict())
+        self.deltas['occupied_spaces'] -= 1
+        self.deltas['active_sessions'] -= 1
+        self.sessions.append((index, 200, session))
+        self.closed.append((session, space, self.vehicles[plate]))
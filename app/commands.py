@@ -0,0 +1,65 @@
+import click
+
+from flask import current_app
+
+from app import counters, revenue
+from app.archive import archive_sessions
+from app.importer import IMPORT_FORMATS, IMPORT_KINDS, ImportDecodeError, decode_lines, detect_format, import_rows, read_rows
+
+
+def register_commands(app):
+    """Registra los comandos de `flask ...` de la aplicación"""
+
+    @app.cli.command('reconcile-counters')
+    def reconcile_counters_command():
+        """Recalcula los contadores de /api/stats y reporta la desviación"""
+        drift = counters.reconcile()
+        if drift:
+            for name, delta in drift.items():
+                click.echo(f'{name}: {delta:+d}')
+        else:
+            click.echo('Sin desviación')
+
+
+    @app.cli.command('import-data')
+    @click.argument('kind', type=click.Choice(sorted(IMPORT_KINDS)))
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(IMPORT_FORMATS), help='Por defecto se deduce de la extensión')
+    @click.option('--chunk-size', type=click.IntRange(min=1), help='Filas por bloque (IMPORT_CHUNK_SIZE)')
+    def import_data_command(kind, path, fmt, chunk_size):
+        """Importa espacios o vehículos desde un archivo CSV o NDJSON"""
+        fmt = fmt or detect_format(filename=path)
+        if fmt is None:
+            raise click.UsageError('No se pudo deducir el formato; use --format')
+        chunk_size = chunk_size or current_app.config['IMPORT_CHUNK_SIZE']
+
+        failure = None
+        with open(path, 'rb') as stream:
+            try:
+                summary = import_rows(kind, read_rows(decode_lines(stream), fmt), chunk_size)
+            except ImportDecodeError as e:
+                failure, summary = e, e.summary
+
+        click.echo(f"Insertados: {summary['inserted']}")
+        click.echo(f"Duplicados omitidos: {summary['duplicates']}")
+        click.echo(f"Filas inválidas: {summary['invalid']}")
+        for error in summary['errors']:
+            click.echo(f"  línea {error['line']}: {error['error']}")
+        if failure is not None:
+            raise click.ClickException(f'{failure} (lectura detenida en la línea {failure.line})')
+
+
+    @app.cli.command('archive-sessions')
+    @click.option('--days', type=click.IntRange(min=0), help='Antigüedad mínima de la salida (ARCHIVE_AFTER_DAYS)')
+    @click.option('--batch-size', type=click.IntRange(min=1), help='Sesiones por bloque (ARCHIVE_BATCH_SIZE)')
+    def archive_sessions_command(days, batch_size):
+        """Mueve las sesiones cerradas y pagadas antiguas a parking_sessions_history"""
+        archived = archive_sessions(older_than_days=days, batch_size=batch_size)
+        click.echo(f'Sesiones archivadas: {archived}')
+
+
+    @app.cli.command('rebuild-revenue')
+    def rebuild_revenue_command():
+        """Recalcula el resumen diario de ingresos (revenue_daily) desde las sesiones cerradas"""
+        rows = revenue.rebuild()
+        click.echo(f'Filas del resumen diario: {rows}')
@@ -5,10 +5,132 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///parking.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_ECHO = True  
+    SQLALCHEMY_ECHO = False
+    
+    # Crear las tablas desde los modelos al iniciar (db.create_all). Fuera de
+    # las pruebas el esquema lo crean las migraciones: flask db upgrade
+    CREATE_TABLES = os.environ.get('CREATE_TABLES', '').lower() in ('1', 'true', 'yes')
+    
+    # PRAGMAs aplicados a cada conexión SQLite nueva (ver app/engine.py).
+    # WAL permite que los lectores no bloqueen al escritor ni al revés;
+    # synchronous=NORMAL es seguro en WAL y evita un fsync por commit
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,  # ms esperando el bloqueo de escritura
+        'mmap_size': 256 * 1024 * 1024,
+    }
     
     # Configuración de CORS
     CORS_ORIGINS = ['http://localhost:3000', 'http://127.0.0.1:3000']
     
+    # Paginación por cursor (?limit=&after=): tamaño de página sin ?limit=
+    # (acotado por PAGE_SIZE_MAX) y máximo que se puede pedir
+    PAGE_SIZE_DEFAULT = int(os.environ.get('PAGE_SIZE_DEFAULT', 100))
+    PAGE_SIZE_MAX = 1000
+    
+    # Asignación automática de espacio en la entrada: tipo de vehículo -> tipos
+    # de espacio en orden de preferencia. Dentro de cada tipo se elige el piso
+    # más bajo. Los tipos no listados usan [vehicle_type, 'regular'].
+    SPACE_ASSIGNMENT_POLICY = {
+        'car': ['regular'],
+        'motorcycle': ['regular'],
+        'truck': ['regular'],
+        'electric': ['electric', 'regular'],
+    }
+    
+    # Segundos que un proceso reutiliza la versión de datos leída para los GET
+    # condicionales (ETag) antes de volver a consultarla
+    DATA_VERSION_TTL = float(os.environ.get('DATA_VERSION_TTL', 1.0))
+    
+    # Stream de ocupación (GET /api/spaces/stream): eventos en cola por cliente
+    # antes de descartarlo, eventos guardados para reanudar, y cada cuántos
+    # segundos se buscan cambios de otros procesos y se envía un keepalive
+    STREAM_QUEUE_SIZE = 100
+    STREAM_HISTORY_SIZE = 1000
+    STREAM_POLL_INTERVAL = 2.0
+    STREAM_KEEPALIVE_INTERVAL = 15.0
+    # Clientes del stream por proceso (0 = sin límite). Cada uno ocupa un hilo
+    # de gunicorn mientras está conectado: gunicorn.conf.py lo deriva de los
+    # hilos como GUNICORN_THREADS - GUNICORN_API_THREADS (16 - 4 por defecto)
+    STREAM_MAX_CLIENTS = int(os.environ.get('STREAM_MAX_CLIENTS', 12))
+    
+    # Reconciliación de los contadores de /api/stats (segundos, 0 = desactivada)
+    COUNTER_RECONCILE_INTERVAL = int(os.environ.get('COUNTER_RECONCILE_INTERVAL', 300))
+    
+    # Máximo de eventos por lote en POST /api/sessions/batch
+    BATCH_MAX_EVENTS = 5000
+    
+    # Filas por bloque (un executemany y un commit) en la importación masiva
+    IMPORT_CHUNK_SIZE = 1000
+    
+    # Archivado de sesiones cerradas y pagadas en parking_sessions_history
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 90))
+    ARCHIVE_BATCH_SIZE = 1000
+    
+    # Reportes analíticos (app/analytics.py): sesiones leídas por bloque,
+    # rango máximo en minutos de /api/reports/occupancy (un año) y caché de
+    # /api/reports/dwell: entradas guardadas y segundos que vive cada una (lo
+    # que tardan en verse las salidas registradas por otros procesos)
+    ANALYTICS_CHUNK_SIZE = 100000
+    OCCUPANCY_MAX_MINUTES = 366 * 24 * 60
+    ANALYTICS_CACHE_SIZE = 128
+    ANALYTICS_CACHE_TTL = float(os.environ.get('ANALYTICS_CACHE_TTL', 60))
+    
+    # Métricas por endpoint en formato Prometheus (/metrics)
+    METRICS_ENABLED = True
+    
+    # Registro de consultas lentas: umbral en ms (negativo = desactivado), tamaño
+    # del buffer en memoria y archivo opcional con rotación (líneas JSON)
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 100))
+    SLOW_QUERY_LOG_SIZE = 200
+    SLOW_QUERY_STACK_DEPTH = 8
+    SLOW_QUERY_LOG_FILE = os.environ.get('SLOW_QUERY_LOG_FILE')
+    
+    # Perfilado de peticiones con cProfile (X-Profile: summary|file o ?profile=)
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+    PROFILING_DIR = os.environ.get('PROFILING_DIR')  # por defecto instance/profiles
+    PROFILING_TOP_N = 30
+    
+    # Token para /api/admin/* y el perfilado (Authorization: Bearer <token>)
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+    
     # Zona horaria
-    TIMEZONE = 'America/Bogota'
\ No newline at end of file
+    TIMEZONE = 'America/Bogota'
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    SQLALCHEMY_ECHO = True
+    PROFILING_ENABLED = True
+
+class TestingConfig(Config):
+    TESTING = True
+    # Base de datos separada de la de desarrollo (las pruebas la vacían)
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or 'sqlite:///parking_test.db'
+    CREATE_TABLES = True
+    # Sin hilo de reconciliación: las pruebas llaman counters.reconcile() directamente
+    COUNTER_RECONCILE_INTERVAL = 0
+
+class ProductionConfig(Config):
+    # Tamaño del pool de conexiones por proceso
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': 30,
+        'pool_recycle': 3600,
+    }
+
+# Perfiles seleccionables con FLASK_ENV
+config_by_name = {
+    'development': DevelopmentConfig,
+    'testing': TestingConfig,
+    'production': ProductionConfig,
+}
+
+def get_config(name=None):
+    """Perfil de configuración por nombre; por defecto el de FLASK_ENV o 'development'"""
+    name = name or os.environ.get('FLASK_ENV') or 'development'
+    try:
+        return config_by_name[name]
+    except KeyError:
+        raise ValueError(f"Perfil de configuración desconocido: {name} (use {', '.join(config_by_name)})")
@@ -0,0 +1,126 @@
+import threading
+import time
+
+from flask import current_app
+
+from app import db
+from app.data_version import data_version
+from app.models.parking import ParkingSpace, Vehicle, ParkingSession, ParkingCounter
+from app.space_index import VERSION_COUNTER as SPACES_VERSION
+
+# Contadores que alimentan /api/stats
+STATS_COUNTERS = ('total_spaces', 'occupied_spaces', 'active_sessions', 'total_vehicles')
+
+
+def adjust(spaces=False, **deltas):
+    """
+    Registra todo lo que una operación cambia en parking_counters con un
+    único UPDATE, en la transacción actual: los contadores de estadísticas
+    (p. ej. adjust(occupied_spaces=1, active_sessions=1)), la versión de
+    datos de los ETag y, con spaces=True, la versión del índice de espacios
+    libres. Se llama una vez, antes del commit, en lugar de
+    data_version.bump() y space_index.bump_version().
+    Retorna la nueva versión de espacios (None si spaces=False).
+    """
+    if spaces:
+        deltas[SPACES_VERSION] = 1
+    values = data_version.bump(**deltas)
+    return values[SPACES_VERSION] if spaces else None
+
+
+def read():
+    """Valores actuales de los contadores (una sola consulta)"""
+    rows = db.session.execute(
+        db.select(ParkingCounter.name, ParkingCounter.value)
+        .where(ParkingCounter.name.in_(STATS_COUNTERS))
+    )
+    values = dict.fromkeys(STATS_COUNTERS, 0)
+    for name, value in rows:
+        values[name] = value
+    return values
+
+
+def compute():
+    """Recalcula los contadores desde cero con COUNT(*)"""
+    return {
+        'total_spaces': ParkingSpace.query.count(),
+        'occupied_spaces': ParkingSpace.query.filter_by(is_occupied=True).count(),
+        'active_sessions': ParkingSession.query.filter_by(is_active=True).count(),
+        'total_vehicles': Vehicle.query.count(),
+    }
+
+
+def reconcile():
+    """
+    Recalcula los contadores, corrige los valores guardados y retorna la
+    desviación encontrada (nombre -> valor real - valor guardado).
+    """
+    # Tomar primero el bloqueo de escritura (SQLite inicia la transacción con
+    # el primer UPDATE) para que ninguna entrada o salida se intercale entre
+    # el conteo y la escritura
+    db.session.execute(
+        db.update(ParkingCounter)
+        .where(ParkingCounter.name == STATS_COUNTERS[0])
+        .values(value=ParkingCounter.value)
+    )
+    stored = read()
+    actual = compute()
+
+    drift = {}
+    for name in STATS_COUNTERS:
+        if actual[name] != stored[name]:
+            drift[name] = actual[name] - stored[name]
+        counter = db.session.get(ParkingCounter, name)
+        if counter is None:
+            db.session.add(ParkingCounter(name=name, value=actual[name]))
+        else:
+            counter.value = actual[name]
+    if drift:
+        data_version.bump()
+    db.session.commit()
+
+    if drift:
+        current_app.logger.warning('Desviación en contadores de estadísticas corregida: %s', drift)
+    return drift
+
+
+class CounterReconciler:
+    """
+    Reconciliación periódica de los contadores de estadísticas en un hilo de
+    fondo, cada COUNTER_RECONCILE_INTERVAL segundos (0 la desactiva).
+    Al iniciar la aplicación siempre se reconcilia una vez.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._thread = None
+        self.last_drift = None
+
+    def init_app(self, app):
+        self._app = app
+        with app.app_context():
+            self.last_drift = reconcile()
+
+        if app.config['COUNTER_RECONCILE_INTERVAL'] > 0:
+            self.start()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='counter-reconciler', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            app = self._app
+            interval = app.config['COUNTER_RECONCILE_INTERVAL']
+            if interval <= 0:
+                return
+            time.sleep(interval)
+            try:
+                with app.app_context():
+                    self.last_drift = reconcile()
+            except Exception:
+                app.logger.exception('Error reconciliando contadores de estadísticas')
+
+
+counter_reconciler = CounterReconciler()
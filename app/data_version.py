@@ -0,0 +1,133 @@
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, make_response, request
+from sqlalchemy import event
+
+from app import db
+from app.models.parking import ParkingCounter
+
+# Contador que versiona cualquier cambio de datos hecho por la API
+VERSION_COUNTER = 'data_version'
+
+
+class DataVersion:
+    """
+    Versión global de los datos para GET condicionales (ETag / If-None-Match).
+
+    Cada operación que modifica datos llama a bump() antes de su commit: el
+    contador `data_version` de parking_counters sube en la misma transacción,
+    así que la versión es monótona y compartida entre procesos.
+
+    Las lecturas usan una copia en memoria de la versión que vive
+    DATA_VERSION_TTL segundos: mientras no expire, responder un 304 no toca la
+    base de datos. Los commits de este proceso que hicieron bump() descartan
+    la copia de inmediato; los de otros procesos se ven a lo sumo TTL
+    segundos después.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = None
+        self._read_at = 0.0
+        self._generation = 0
+        self.ttl = 1.0
+
+    def init_app(self, app):
+        self.ttl = app.config.get('DATA_VERSION_TTL', 1.0)
+        self.invalidate()
+        with app.app_context():
+            # Con la fila ya creada, bump() es un único UPDATE (la tabla aún no
+            # existe si la aplicación se inicia para migrar una base nueva)
+            table_exists = db.inspect(db.engine).has_table(ParkingCounter.__tablename__)
+            if table_exists and db.session.get(ParkingCounter, VERSION_COUNTER) is None:
+                db.session.add(ParkingCounter(name=VERSION_COUNTER, value=0))
+                db.session.commit()
+        if not event.contains(db.session, 'after_commit', _after_commit):
+            event.listen(db.session, 'after_commit', _after_commit)
+            event.listen(db.session, 'after_rollback', _after_rollback)
+
+    def current(self):
+        """Versión actual (desde la copia en memoria si no ha expirado)"""
+        now = time.monotonic()
+        with self._lock:
+            if self._value is not None and now - self._read_at < self.ttl:
+                return self._value
+            generation = self._generation
+
+        value = ParkingCounter.current(VERSION_COUNTER)
+        with self._lock:
+            # Si un commit invalidó la copia mientras se leía, no se guarda un valor viejo
+            if generation == self._generation:
+                self._value = value
+                self._read_at = now
+        return value
+
+    def bump(self, **deltas):
+        """
+        Incrementa la versión en la transacción actual; debe llamarse antes del
+        commit. Los demás contadores de la operación (`deltas`, ver
+        counters.adjust) se suman en el mismo UPDATE. Retorna dict nombre ->
+        nuevo valor de los contadores modificados.
+        """
+        values = ParkingCounter.add({VERSION_COUNTER: 1, **deltas})
+        db.session.info['data_version_bumped'] = True
+        return values
+
+    def invalidate(self):
+        """Descarta la copia en memoria; la siguiente lectura consulta la base de datos"""
+        with self._lock:
+            self._value = None
+            self._generation += 1
+
+
+def _after_commit(session):
+    if session.info.pop('data_version_bumped', False):
+        data_version.invalidate()
+
+
+def _after_rollback(session):
+    session.info.pop('data_version_bumped', None)
+
+
+def conditional(view):
+    """
+    Decorador de rutas GET: agrega ETag con la versión de los datos y responde
+    304 Not Modified sin ejecutar la vista si el cliente envía esa misma
+    versión en If-None-Match.
+
+    Una vista que responde con datos guardados de una versión anterior (un
+    reporte de report_cache) la declara con served_version(): el ETag es
+    entonces esa versión, y si el cliente ya la tiene también recibe 304.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # La versión se lee antes que los datos: si cambian en medio, el ETag
+        # queda viejo y el cliente simplemente vuelve a descargar
+        version = data_version.current()
+        if request.if_none_match.contains_weak(f'v{version}'):
+            response = current_app.response_class(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            served = g.pop('served_data_version', version)
+            if served != version:
+                version = served
+                if request.if_none_match.contains_weak(f'v{version}'):
+                    response = current_app.response_class(status=304)
+
+        response.set_etag(f'v{version}', weak=True)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    return wrapper
+
+
+def served_version(version):
+    """Declara que la respuesta de una vista @conditional se calculó con los datos de `version`"""
+    g.served_data_version = version
+
+
+data_version = DataVersion()
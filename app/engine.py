@@ -0,0 +1,42 @@
+from sqlalchemy import event
+
+from app import db
+
+
+def configure_engine(app):
+    """
+    Registra los ajustes por conexión del motor de base de datos.
+    En SQLite aplica SQLITE_PRAGMAS a cada conexión nueva del pool; los
+    demás motores no necesitan nada aquí.
+    """
+    with app.app_context():
+        engine = db.engine
+
+    if engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = dict(app.config.get('SQLITE_PRAGMAS') or {})
+    if engine.url.database in (None, '', ':memory:'):
+        # WAL no aplica a bases en memoria
+        pragmas.pop('journal_mode', None)
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+def dispose_engines(app):
+    """
+    Descarta las conexiones heredadas del proceso padre tras un fork (p. ej.
+    en cada worker de gunicorn con preload_app). Con close=False no se cierran
+    los sockets/archivos que siguen siendo del padre: el worker simplemente
+    abre conexiones nuevas la primera vez que las necesita.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
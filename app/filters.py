@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta, timezone
+
+from app import db
+from app.models.parking import ParkingSpace, Vehicle
+
+# Columnas de tiempo por las que se puede filtrar con ?from=&to=
+TIME_FIELDS = ('entry_time', 'exit_time')
+
+PAYMENT_STATUSES = ('pending', 'paid')
+
+
+class FilterError(ValueError):
+    """Parámetros de filtro inválidos en el listado de sesiones"""
+
+
+def parse_session_filters(args):
+    """
+    Lee los filtros del listado de sesiones:
+      ?plate=  ?space_id=  ?floor=  ?payment_status=pending|paid  ?is_active=true|false
+      ?from=  ?to=  (ISO 8601) sobre ?time_field=entry_time|exit_time (por defecto entry_time)
+    `from` es inclusivo y `to` exclusivo; si `to` es solo una fecha se incluye ese día completo.
+    Retorna un dict solo con los filtros enviados.
+    """
+    filters = {}
+
+    if args.get('plate'):
+        filters['plate'] = args['plate'].upper()
+
+    for name in ('space_id', 'floor'):
+        value = args.get(name)
+        if value is not None:
+            try:
+                filters[name] = int(value)
+            except ValueError:
+                raise FilterError(f'{name} debe ser un número entero')
+
+    payment_status = args.get('payment_status')
+    if payment_status is not None:
+        if payment_status not in PAYMENT_STATUSES:
+            raise FilterError(f'payment_status debe ser uno de: {", ".join(PAYMENT_STATUSES)}')
+        filters['payment_status'] = payment_status
+
+    is_active = args.get('is_active')
+    if is_active is not None:
+        if is_active.lower() not in ('true', 'false', '1', '0'):
+            raise FilterError('is_active debe ser true o false')
+        filters['is_active'] = is_active.lower() in ('true', '1')
+
+    time_field = args.get('time_field', 'entry_time')
+    if time_field not in TIME_FIELDS:
+        raise FilterError(f'time_field debe ser uno de: {", ".join(TIME_FIELDS)}')
+    if args.get('from'):
+        filters['from'] = (time_field, parse_time(args['from'], 'from'))
+    if args.get('to'):
+        to = parse_time(args['to'], 'to')
+        if len(args['to']) == 10:  # solo fecha: hasta el final de ese día
+            to += timedelta(days=1)
+        filters['to'] = (time_field, to)
+
+    return filters
+
+
+def session_filter_clauses(model, filters):
+    """
+    Condiciones SQL de `filters` sobre `model` (ParkingSession o
+    ParkingSessionHistory). Solo usan columnas de la sesión, así que no
+    dependen de qué relaciones una session_projection. Cada filtro tiene un
+    índice que lo respalda.
+    """
+    clauses = []
+    if 'plate' in filters:
+        # Subconsulta sobre la placa (única) en lugar de filtrar el JOIN: así
+        # el filtro funciona aunque la consulta no una la tabla de vehículos
+        clauses.append(model.vehicle_id == (
+            db.select(Vehicle.id).where(Vehicle.license_plate == filters['plate']).scalar_subquery()
+        ))
+    if 'space_id' in filters:
+        clauses.append(model.space_id == filters['space_id'])
+    if 'floor' in filters:
+        # Subconsulta sobre el índice de pisos: las sesiones se buscan por space_id
+        clauses.append(model.space_id.in_(
+            db.select(ParkingSpace.id).where(ParkingSpace.floor == filters['floor']).scalar_subquery()
+        ))
+    if 'payment_status' in filters:
+        clauses.append(model.payment_status == filters['payment_status'])
+    if 'is_active' in filters:
+        clauses.append(model.is_active == filters['is_active'])
+    if 'from' in filters:
+        field, value = filters['from']
+        clauses.append(getattr(model, field) >= value)
+    if 'to' in filters:
+        field, value = filters['to']
+        clauses.append(getattr(model, field) < value)
+    return clauses
+
+
+def parse_time(value, name):
+    """Fecha u hora ISO 8601 como datetime UTC sin zona horaria; FilterError si no es válida"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise FilterError(f'{name} debe ser una fecha ISO 8601 (p. ej. 2026-01-31 o 2026-01-31T08:00:00)')
+    # Las fechas se guardan en UTC sin zona horaria
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
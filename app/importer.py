@@ -0,0 +1,239 @@
+import codecs
+import csv
+import json
+import math
+from itertools import islice
+
+from sqlalchemy.exc import IntegrityError
+
+from app import counters, db
+from app.models.parking import ParkingSpace, Vehicle
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+# Máximo de errores de fila que se reportan (el resto solo se cuenta)
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportFormatError(ValueError):
+    """Archivo de importación inválido (formato o encabezados)"""
+
+
+class ImportDecodeError(ImportFormatError):
+    """
+    El archivo dejó de poder decodificarse como UTF-8 a mitad de la lectura.
+    `line` es la primera línea que no se leyó; import_rows agrega en `summary`
+    lo importado (y ya confirmado) de las líneas anteriores.
+    """
+
+    def __init__(self, line):
+        super().__init__('El archivo debe estar codificado en UTF-8')
+        self.line = line
+        self.summary = None
+
+
+def _text(row, field, max_length, required=False, default=None):
+    value = row.get(field)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        if required:
+            raise ValueError(f'{field} es requerido')
+        return default
+    value = str(value).strip()
+    if len(value) > max_length:
+        raise ValueError(f'{field} no puede tener más de {max_length} caracteres')
+    return value
+
+
+def _number(row, field, cast, default):
+    value = row.get(field)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return default
+    if isinstance(value, bool):
+        raise ValueError(f'{field} debe ser numérico')
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} debe ser numérico')
+
+
+def _space_row(row):
+    hourly_rate = _number(row, 'hourly_rate', float, 2000.0)
+    if not math.isfinite(hourly_rate):
+        raise ValueError('hourly_rate debe ser un número finito')
+    if hourly_rate < 0:
+        raise ValueError('hourly_rate no puede ser negativo')
+    return {
+        'number': _text(row, 'number', 10, required=True),
+        'floor': _number(row, 'floor', int, 1),
+        'space_type': _text(row, 'space_type', 20, default='regular'),
+        'hourly_rate': hourly_rate,
+    }
+
+
+def _vehicle_row(row):
+    return {
+        'license_plate': _text(row, 'license_plate', 10, required=True).upper(),
+        'vehicle_type': _text(row, 'vehicle_type', 20, required=True),
+        'owner_name': _text(row, 'owner_name', 100, required=True),
+        'owner_phone': _text(row, 'owner_phone', 15),
+    }
+
+
+# Tipo de importación -> (modelo, columna única, validador de fila, contador de /api/stats)
+IMPORT_KINDS = {
+    'spaces': (ParkingSpace, 'number', _space_row, 'total_spaces'),
+    'vehicles': (Vehicle, 'license_plate', _vehicle_row, 'total_vehicles'),
+}
+
+
+def decode_lines(stream, encoding='utf-8-sig'):
+    """
+    Decodifica un stream binario línea por línea. A diferencia de
+    codecs.getreader, que decodifica por adelantado, un error de decodificación
+    se lanza justo en la línea que lo contiene y las anteriores ya se entregaron.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for line in stream:
+        yield decoder.decode(line)
+
+
+def read_rows(stream, fmt):
+    """
+    Lee filas de un stream de texto sin cargar el archivo completo.
+    Retorna un iterador de (número de línea, dict o None si la línea no se pudo leer).
+    """
+    if fmt == 'csv':
+        return _read_csv(stream)
+    if fmt == 'ndjson':
+        return _read_ndjson(stream)
+    raise ImportFormatError(f"Formato no soportado: {fmt} (use {' o '.join(IMPORT_FORMATS)})")
+
+
+def _read_csv(stream):
+    reader = csv.DictReader(stream)
+    try:
+        if reader.fieldnames is None:
+            return
+        for row in reader:
+            # Columnas sobrantes quedan bajo la clave None: se ignoran
+            row.pop(None, None)
+            yield reader.line_num, row
+    except UnicodeDecodeError:
+        raise ImportDecodeError(reader.line_num + 1) from None
+
+
+def _read_ndjson(stream):
+    line_number = 0
+    lines = iter(stream)
+    while True:
+        try:
+            line = next(lines, None)
+        except UnicodeDecodeError:
+            raise ImportDecodeError(line_number + 1) from None
+        if line is None:
+            return
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, None
+            continue
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def detect_format(content_type=None, filename=None):
+    """Deduce el formato a partir del Content-Type o de la extensión del archivo"""
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in ('text/csv', 'application/csv'):
+        return 'csv'
+    if content_type in ('application/x-ndjson', 'application/ndjson', 'application/jsonl'):
+        return 'ndjson'
+    if filename:
+        extension = filename.rsplit('.', 1)[-1].lower()
+        if extension == 'csv':
+            return 'csv'
+        if extension in ('ndjson', 'jsonl'):
+            return 'ndjson'
+    return None
+
+
+def import_rows(kind, rows, chunk_size):
+    """
+    Importa filas (iterador de (línea, dict)) de espacios o vehículos.
+
+    Las filas se procesan en bloques de `chunk_size`: cada bloque se valida,
+    se descartan los duplicados (dentro del bloque y contra la base de datos,
+    con una sola consulta IN) y se inserta con un executemany y un commit.
+    Solo un bloque está en memoria a la vez, así que el consumo no crece con
+    el tamaño del archivo. Los duplicados se omiten; las filas inválidas se
+    cuentan y las primeras MAX_REPORTED_ERRORS se reportan con su línea.
+
+    Si el archivo deja de poder decodificarse, se importan las filas leídas
+    hasta ahí y se lanza ImportDecodeError con el resumen de lo importado.
+    """
+    model, key, validate, counter = IMPORT_KINDS[kind]
+    key_column = getattr(model, key)
+    summary = {'inserted': 0, 'duplicates': 0, 'invalid': 0, 'errors': []}
+
+    rows = iter(rows)
+    failure = None
+    while failure is None:
+        chunk = []
+        try:
+            for item in islice(rows, chunk_size):
+                chunk.append(item)
+        except ImportDecodeError as e:
+            failure = e
+        if not chunk:
+            break
+
+        valid = {}
+        for line_number, row in chunk:
+            try:
+                if row is None:
+                    raise ValueError('Fila ilegible')
+                values = validate(row)
+            except ValueError as e:
+                summary['invalid'] += 1
+                if len(summary['errors']) < MAX_REPORTED_ERRORS:
+                    summary['errors'].append({'line': line_number, 'error': str(e)})
+                continue
+            if values[key] in valid:
+                summary['duplicates'] += 1
+            else:
+                valid[values[key]] = values
+
+        if valid:
+            try:
+                _insert_chunk(model, key_column, counter, valid, summary)
+            except IntegrityError:
+                # Otro proceso insertó una de las claves entre la consulta y el
+                # INSERT: se repite el bloque, que ahora la detecta como duplicada
+                db.session.rollback()
+                _insert_chunk(model, key_column, counter, valid, summary)
+
+    if failure is not None:
+        failure.summary = summary
+        raise failure
+    return summary
+
+
+def _insert_chunk(model, key_column, counter, valid, summary):
+    """Descarta las claves ya existentes e inserta el resto del bloque con un executemany"""
+    existing = db.session.scalars(
+        db.select(key_column).where(key_column.in_(list(valid)))
+    )
+    for value in existing:
+        del valid[value]
+        summary['duplicates'] += 1
+    if not valid:
+        return
+
+    db.session.execute(db.insert(model.__table__), list(valid.values()))
+    # Con la versión de espacios, los demás procesos (y este) reconstruyen su
+    # índice de espacios libres
+    counters.adjust(spaces=model is ParkingSpace, **{counter: len(valid)})
+    db.session.commit()
+    summary['inserted'] += len(valid)
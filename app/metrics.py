@@ -0,0 +1,110 @@
+import os
+import time
+
+from flask import Response, g, has_request_context, request
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from sqlalchemy import event
+
+from app import db
+
+# Límites (segundos) de los buckets del histograma de latencia
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LABELS = ('endpoint', 'method', 'status')
+
+
+class RequestMetrics:
+    """
+    Métricas por endpoint y código de estado, expuestas en formato de texto de
+    Prometheus en /metrics: histograma de latencia, número de consultas SQL y
+    tiempo total en la base de datos.
+
+    Las consultas se cuentan con los eventos before/after_cursor_execute del
+    motor y se atribuyen a la petición en curso (flask.g). El costo por
+    petición es un par de perf_counter por consulta y la actualización de
+    tres métricas de prometheus_client, bajo como para dejarlo activo en
+    producción.
+
+    Con varios workers de gunicorn, gunicorn.conf.py define
+    PROMETHEUS_MULTIPROC_DIR: cada proceso escribe sus valores en archivos de
+    ese directorio y /metrics los suma con MultiProcessCollector, así que
+    cualquier worker que atienda el scrape responde los totales de todos (los
+    de workers reciclados incluidos, sin etiquetas por proceso).
+    """
+
+    def __init__(self):
+        self.registry = CollectorRegistry()
+        self.duration = Histogram(
+            'parking_http_request_duration_seconds', 'Latencia de las peticiones HTTP.',
+            LABELS, buckets=LATENCY_BUCKETS, registry=self.registry
+        )
+        self.queries = Counter(
+            'parking_http_request_queries', 'Consultas SQL emitidas por las peticiones HTTP.',
+            LABELS, registry=self.registry
+        )
+        self.db_time = Counter(
+            'parking_http_request_db_seconds', 'Tiempo en la base de datos de las peticiones HTTP.',
+            LABELS, registry=self.registry
+        )
+
+    def init_app(self, app):
+        if not app.config.get('METRICS_ENABLED', True):
+            return
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view, methods=['GET'])
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def reset(self):
+        for metric in (self.duration, self.queries, self.db_time):
+            metric.clear()
+
+    def _before_request(self):
+        g.metrics_start = time.perf_counter()
+        g.metrics_queries = 0
+        g.metrics_db_time = 0.0
+
+    def _after_request(self, response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+
+        labels = (request.endpoint or 'unmatched', request.method, str(response.status_code))
+        self.duration.labels(*labels).observe(time.perf_counter() - start)
+        self.queries.labels(*labels).inc(g.pop('metrics_queries', 0))
+        self.db_time.labels(*labels).inc(g.pop('metrics_db_time', 0.0))
+        return response
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('metrics_query_start')
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        # Consultas fuera de una petición (hilo de reconciliación, comandos) no se atribuyen
+        if has_request_context() and 'metrics_start' in g:
+            g.metrics_queries += 1
+            g.metrics_db_time += elapsed
+
+    def render(self):
+        """Métricas en formato de texto de Prometheus (sumadas entre procesos en modo multiproceso)"""
+        if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = self.registry
+        return generate_latest(registry)
+
+    def metrics_view(self):
+        """Métricas de la aplicación en formato Prometheus"""
+        return Response(self.render(), content_type=CONTENT_TYPE_LATEST)
+
+
+request_metrics = RequestMetrics()
@@ -1 +1 @@
-from .parking import ParkingSpace, Vehicle, ParkingSession
\ No newline at end of file
+from .parking import ParkingSpace, Vehicle, ParkingSession, ParkingSessionHistory, ParkingCounter
\ No newline at end of file
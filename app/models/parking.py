@@ -1,8 +1,14 @@
 from datetime import datetime
+from sqlalchemy.orm import declared_attr
 from app import db
 
 class ParkingSpace(db.Model):
     __tablename__ = 'parking_spaces'
+    __table_args__ = (
+        db.Index('ix_parking_spaces_is_occupied', 'is_occupied'),
+        # Filtro ?floor= del listado de sesiones
+        db.Index('ix_parking_spaces_floor', 'floor'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     number = db.Column(db.String(10), unique=True, nullable=False)  # Ej: "A1", "B5"
@@ -13,7 +19,7 @@ class ParkingSpace(db.Model):
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     
     # Relación con entradas y salidas
-    sessions = db.relationship('ParkingSession', backref='space', lazy=True)
+    sessions = db.relationship('ParkingSession', back_populates='space', lazy=True)
     
     def to_dict(self):
         return {
@@ -37,7 +43,7 @@ class Vehicle(db.Model):
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     
     # Relación con entradas y salidas
-    sessions = db.relationship('ParkingSession', backref='vehicle', lazy=True)
+    sessions = db.relationship('ParkingSession', back_populates='vehicle', lazy=True)
     
     def to_dict(self):
         return {
@@ -49,12 +55,13 @@ class Vehicle(db.Model):
             'created_at': self.created_at.isoformat()
         }
 
-class ParkingSession(db.Model):
-    __tablename__ = 'parking_sessions'
+class ParkingSessionMixin:
+    """
+    Columnas y comportamiento comunes a las sesiones vivas (parking_sessions)
+    y a las archivadas (parking_sessions_history)
+    """
     
     id = db.Column(db.Integer, primary_key=True)
-    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False)
-    space_id = db.Column(db.Integer, db.ForeignKey('parking_spaces.id'), nullable=False)
     entry_time = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     exit_time = db.Column(db.DateTime, nullable=True)
     total_hours = db.Column(db.Float, nullable=True)
@@ -63,6 +70,23 @@ class ParkingSession(db.Model):
     payment_status = db.Column(db.String(20), nullable=False, default='pending')  # pending, paid
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     
+    @declared_attr
+    def vehicle_id(cls):
+        return db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False)
+    
+    @declared_attr
+    def space_id(cls):
+        return db.Column(db.Integer, db.ForeignKey('parking_spaces.id'), nullable=False)
+    
+    @classmethod
+    def query_with_relations(cls):
+        """
+        Consulta de sesiones que trae vehículo y espacio en la misma consulta (JOIN),
+        para usar y serializar con to_dict() la sesión sin consultas extra (también
+        al recargarla tras un commit, que repite el JOIN)
+        """
+        return cls.query.options(db.joinedload(cls.vehicle), db.joinedload(cls.space))
+    
     def calculate_cost(self):
         if self.exit_time and self.entry_time:
             duration = self.exit_time - self.entry_time
@@ -86,4 +110,113 @@ class ParkingSession(db.Model):
             'is_active': self.is_active,
             'payment_status': self.payment_status,
             'created_at': self.created_at.isoformat()
-        }
\ No newline at end of file
+        }
+
+class ParkingSession(ParkingSessionMixin, db.Model):
+    __tablename__ = 'parking_sessions'
+    __table_args__ = (
+        # Un vehículo y un espacio solo pueden tener una sesión activa. Son
+        # también los índices de las búsquedas de la sesión activa por vehículo
+        # o espacio (entrada, salida, lotes, eliminación)
+        db.Index('uq_parking_sessions_active_vehicle', 'vehicle_id', unique=True,
+                 sqlite_where=db.text('is_active = 1'), postgresql_where=db.text('is_active')),
+        db.Index('uq_parking_sessions_active_space', 'space_id', unique=True,
+                 sqlite_where=db.text('is_active = 1'), postgresql_where=db.text('is_active')),
+        # Filtros del listado sobre todas las sesiones (?plate=, ?space_id=,
+        # ?floor=); no incluyen is_active para que una salida no los reescriba
+        db.Index('ix_parking_sessions_vehicle', 'vehicle_id'),
+        db.Index('ix_parking_sessions_space', 'space_id'),
+        # Conteo y listado de sesiones activas en orden de id (paginación por
+        # cursor) sin recorrer el historial
+        db.Index('ix_parking_sessions_active', 'is_active',
+                 sqlite_where=db.text('is_active = 1'), postgresql_where=db.text('is_active')),
+        # Filtros del listado de sesiones (?from=&to=, ?payment_status=); el
+        # índice de entrada cubre los intervalos que lee app/analytics.py
+        db.Index('ix_parking_sessions_entry_interval', 'entry_time', 'exit_time', 'space_id'),
+        db.Index('ix_parking_sessions_exit_time', 'exit_time'),
+        db.Index('ix_parking_sessions_payment_status', 'payment_status'),
+        # AUTOINCREMENT: los ids de sesiones archivadas (y borradas de esta
+        # tabla) nunca se reutilizan, así que no chocan con los del histórico
+        {'sqlite_autoincrement': True},
+    )
+    
+    vehicle = db.relationship('Vehicle', back_populates='sessions')
+    space = db.relationship('ParkingSpace', back_populates='sessions')
+
+class ParkingSessionHistory(ParkingSessionMixin, db.Model):
+    """Sesiones cerradas y pagadas movidas fuera de parking_sessions (ver app/archive.py)"""
+    __tablename__ = 'parking_sessions_history'
+    __table_args__ = (
+        db.Index('ix_parking_sessions_history_vehicle', 'vehicle_id'),
+        db.Index('ix_parking_sessions_history_exit_time', 'exit_time'),
+        db.Index('ix_parking_sessions_history_entry_interval', 'entry_time', 'exit_time', 'space_id'),
+        db.Index('ix_parking_sessions_history_space', 'space_id'),
+        db.Index('ix_parking_sessions_history_payment_status', 'payment_status'),
+    )
+    
+    # Conserva el id que tenía en parking_sessions
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    vehicle = db.relationship('Vehicle')
+    space = db.relationship('ParkingSpace')
+
+class ParkingCounter(db.Model):
+    __tablename__ = 'parking_counters'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+    
+    @classmethod
+    def current(cls, name):
+        """Valor actual de un contador (0 si no existe)"""
+        value = db.session.execute(db.select(cls.value).where(cls.name == name)).scalar()
+        return value or 0
+    
+    @classmethod
+    def add(cls, deltas):
+        """
+        Suma varios contadores con un único UPDATE ... RETURNING dentro de la
+        transacción actual; los que aún no existen se crean con un INSERT.
+        El UPDATE es atómico en la base de datos, así que es seguro entre procesos.
+        `deltas` es un dict nombre -> incremento. Retorna dict nombre -> nuevo valor.
+        """
+        deltas = {name: delta for name, delta in deltas.items() if delta}
+        if not deltas:
+            return {}
+        values = dict(db.session.execute(
+            db.update(cls)
+            .where(cls.name.in_(deltas))
+            .values(value=cls.value + db.case(deltas, value=cls.name, else_=0))
+            .returning(cls.name, cls.value)
+            .execution_options(synchronize_session=False)
+        ).all())
+        missing = {name: delta for name, delta in deltas.items() if name not in values}
+        if missing:
+            db.session.execute(db.insert(cls), [{'name': name, 'value': delta} for name, delta in missing.items()])
+            values.update(missing)
+        return values
+
+
+class RevenueDaily(db.Model):
+    """
+    Resumen diario de sesiones cerradas (ver app/revenue.py): una fila por día
+    de salida, piso, tipo de espacio y tipo de vehículo. Los reportes de
+    ingresos leen estas filas en lugar de recorrer las sesiones.
+    """
+    __tablename__ = 'revenue_daily'
+    __table_args__ = (
+        # Agrupación por semana y mes (?group=week|month)
+        db.Index('ix_revenue_daily_week', 'week'),
+        db.Index('ix_revenue_daily_month', 'month'),
+    )
+    
+    day = db.Column(db.Date, primary_key=True)
+    floor = db.Column(db.Integer, primary_key=True)
+    space_type = db.Column(db.String(20), primary_key=True)
+    vehicle_type = db.Column(db.String(20), primary_key=True)
+    week = db.Column(db.Date, nullable=False)  # lunes de la semana de `day`
+    month = db.Column(db.Date, nullable=False)  # primer día del mes de `day`
+    sessions = db.Column(db.Integer, nullable=False, default=0)
+    total_cost = db.Column(db.Float, nullable=False, default=0.0)
+    total_hours = db.Column(db.Float, nullable=False, default=0.0)
@@ -0,0 +1,136 @@
+import base64
+import binascii
+from bisect import bisect_right
+
+from flask import current_app, request
+
+from app import db
+from app.serializers import fast_json
+
+
+class PaginationError(ValueError):
+    """Parámetros de paginación inválidos (?limit=&after=)"""
+
+
+def encode_cursor(key):
+    """
+    Convierte la clave de la última fila de una página en un cursor opaco
+    """
+    return base64.urlsafe_b64encode(str(key).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Recupera la clave codificada en un cursor generado por encode_cursor
+    """
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        return int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise PaginationError('Cursor inválido')
+
+
+def parse_page_args(args):
+    """
+    Lee ?limit= y ?after= de la petición.
+    Retorna (limit, after). Sin ?limit= se usa PAGE_SIZE_DEFAULT (acotado por
+    PAGE_SIZE_MAX), así que ningún listado retorna la tabla completa; after
+    es None si no se envió.
+    """
+    limit = args.get('limit')
+    after = args.get('after')
+
+    max_limit = current_app.config['PAGE_SIZE_MAX']
+    if limit is None:
+        limit = min(current_app.config['PAGE_SIZE_DEFAULT'], max_limit)
+    else:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise PaginationError('limit debe ser un número entero')
+        if limit < 1 or limit > max_limit:
+            raise PaginationError(f'limit debe estar entre 1 y {max_limit}')
+
+    if after is not None:
+        after = decode_cursor(after)
+
+    return limit, after
+
+
+def paginate(query, key_column):
+    """
+    Paginación por cursor (keyset) sobre una columna indexada y única.
+
+    En lugar de OFFSET se filtra por `key_column > after`, así que cada página
+    cuesta lo mismo sin importar el tamaño de la tabla. Sin ?limit= la página
+    es de PAGE_SIZE_DEFAULT filas.
+    Retorna (items, next_cursor); next_cursor es None en la última página.
+    """
+    limit, after = parse_page_args(request.args)
+
+    query = query.order_by(key_column)
+    if after is not None:
+        query = query.filter(key_column > after)
+
+    # Se pide una fila extra para saber si hay otra página
+    items = query.limit(limit + 1).all()
+    if len(items) <= limit:
+        return items, None
+
+    items = items[:limit]
+    return items, encode_cursor(getattr(items[-1], key_column.key))
+
+
+def paginate_merged(queries, key_name):
+    """
+    Igual que paginate, pero sobre varias consultas cuyas claves no se repiten
+    entre sí (p. ej. sesiones vivas y archivadas). Las consultas se unen con
+    UNION ALL en una sola sentencia: el filtro de keyset va dentro de cada
+    rama (usa su clave primaria) y el ORDER BY ... LIMIT sobre la unión, que
+    SQLite resuelve mezclando las ramas ya ordenadas.
+    """
+    limit, after = parse_page_args(request.args)
+
+    statements = []
+    for query in queries:
+        key_column = getattr(query.column_descriptions[0]['entity'], key_name)
+        if after is not None:
+            query = query.filter(key_column > after)
+        statements.append(query.statement)
+
+    union = db.union_all(*statements).subquery()
+    statement = db.select(union).order_by(union.c[key_name])
+    items = db.session.execute(statement.limit(limit + 1)).all()
+    if len(items) <= limit:
+        return items, None
+
+    items = items[:limit]
+    return items, encode_cursor(getattr(items[-1], key_name))
+
+
+def paginated_response(data, next_cursor):
+    """
+    Respuesta JSON de una página. El cuerpo sigue siendo la lista de elementos;
+    el cursor de la siguiente página va en el encabezado X-Next-Cursor.
+    """
+    response = fast_json.response(data)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+
+def paginate_items(items, key):
+    """
+    Igual que paginate, pero sobre una lista en memoria ya ordenada por `key`
+    (p. ej. los espacios libres del índice en memoria). La página se ubica
+    con búsqueda binaria sobre la clave y solo se copia la página pedida.
+    """
+    limit, after = parse_page_args(request.args)
+
+    start = 0 if after is None else bisect_right(items, after, key=key)
+
+    if len(items) - start <= limit:
+        return items[start:], None
+
+    items = items[start:start + limit]
+    return items, encode_cursor(key(items[-1]))
@@ -0,0 +1,83 @@
+import cProfile
+import io
+import os
+import pstats
+import re
+import time
+from datetime import datetime
+
+from flask import Response, current_app, g, request
+
+from app.auth import admin_token_error
+
+PROFILE_MODES = ('summary', 'file')
+
+
+class RequestProfiler:
+    """
+    Perfilado bajo demanda de una petición con cProfile, sin tocar las rutas.
+
+    Con PROFILING_ENABLED activo, una petición con el encabezado
+    `X-Profile: summary|file` o el parámetro `?profile=summary|file` se ejecuta
+    bajo cProfile (requiere ADMIN_TOKEN si está configurado):
+      - summary: la respuesta se reemplaza por las PROFILING_TOP_N funciones
+        con más tiempo acumulado; el código original va en X-Profile-Status
+      - file: la respuesta normal, y el perfil se guarda en PROFILING_DIR
+        (formato pstats, p. ej. para snakeviz) con su nombre en X-Profile-File
+    """
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _requested_mode(self):
+        mode = request.headers.get('X-Profile') or request.args.get('profile')
+        return mode if mode in PROFILE_MODES else None
+
+    def _before_request(self):
+        if not current_app.config.get('PROFILING_ENABLED'):
+            return None
+        mode = self._requested_mode()
+        if mode is None:
+            return None
+
+        error = admin_token_error()
+        if error is not None:
+            return error
+
+        g.profile_mode = mode
+        g.profile_start = time.perf_counter()
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+        return None
+
+    def _after_request(self, response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        profiler.disable()
+        elapsed_ms = (time.perf_counter() - g.pop('profile_start')) * 1000
+        mode = g.pop('profile_mode')
+
+        if mode == 'file':
+            response.headers['X-Profile-File'] = self._save(profiler, elapsed_ms)
+            return response
+
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats('cumulative').print_stats(current_app.config.get('PROFILING_TOP_N', 30))
+        summary = f'{request.method} {request.full_path.rstrip("?")} -> {response.status_code} en {elapsed_ms:.1f} ms\n'
+        summary_response = Response(summary + stream.getvalue(), content_type='text/plain; charset=utf-8')
+        summary_response.headers['X-Profile-Status'] = str(response.status_code)
+        return summary_response
+
+    def _save(self, profiler, elapsed_ms):
+        directory = current_app.config.get('PROFILING_DIR') or os.path.join(current_app.instance_path, 'profiles')
+        os.makedirs(directory, exist_ok=True)
+        endpoint = re.sub(r'[^A-Za-z0-9_.-]', '_', request.endpoint or 'unmatched')
+        filename = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{endpoint}-{elapsed_ms:.0f}ms.prof"
+        profiler.dump_stats(os.path.join(directory, filename))
+        return filename
+
+
+request_profiler = RequestProfiler()
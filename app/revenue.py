@@ -0,0 +1,130 @@
+from datetime import timedelta
+
+from app import db
+from app.data_version import data_version
+from app.models.parking import ParkingSpace, Vehicle, ParkingSession, ParkingSessionHistory, RevenueDaily
+
+# Agrupaciones de GET /api/reports/revenue: ?group= (columna de período) y ?by= (dimensión)
+GROUPS = ('day', 'week', 'month')
+DIMENSIONS = ('floor', 'space_type', 'vehicle_type')
+
+
+def period_starts(day):
+    """(lunes de la semana, primer día del mes) de `day`"""
+    return day - timedelta(days=day.weekday()), day.replace(day=1)
+
+
+def record(closed):
+    """
+    Suma al resumen diario las sesiones recién cerradas, en la transacción
+    actual: debe llamarse antes del commit de la salida. `closed` son tuplas
+    (session, space, vehicle). Se emite un UPDATE por día y combinación de
+    dimensiones (más un INSERT si la fila aún no existe), no uno por sesión.
+    """
+    totals = {}
+    for session, space, vehicle in closed:
+        key = (session.exit_time.date(), space.floor, space.space_type, vehicle.vehicle_type)
+        count, cost, hours = totals.get(key, (0, 0.0, 0.0))
+        totals[key] = (count + 1, cost + (session.total_cost or 0.0), hours + (session.total_hours or 0.0))
+
+    for (day, floor, space_type, vehicle_type), (count, cost, hours) in totals.items():
+        result = db.session.execute(
+            db.update(RevenueDaily)
+            .where(
+                RevenueDaily.day == day,
+                RevenueDaily.floor == floor,
+                RevenueDaily.space_type == space_type,
+                RevenueDaily.vehicle_type == vehicle_type
+            )
+            .values(
+                sessions=RevenueDaily.sessions + count,
+                total_cost=RevenueDaily.total_cost + cost,
+                total_hours=RevenueDaily.total_hours + hours
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            week, month = period_starts(day)
+            db.session.execute(db.insert(RevenueDaily).values(
+                day=day, floor=floor, space_type=space_type, vehicle_type=vehicle_type,
+                week=week, month=month, sessions=count, total_cost=cost, total_hours=hours
+            ))
+
+
+def rebuild():
+    """
+    Recalcula el resumen diario desde todas las sesiones cerradas (vivas y
+    archivadas) con una sola consulta agregada. Sirve para llenarlo la
+    primera vez y para corregirlo; las sesiones cuyo espacio o vehículo ya
+    no existe no se pueden clasificar y quedan fuera.
+    Retorna el número de filas del resumen.
+    """
+    # El DELETE toma el bloqueo de escritura: ninguna salida se intercala
+    db.session.execute(db.delete(RevenueDaily))
+
+    closed = db.union_all(*[
+        db.select(model.exit_time, model.space_id, model.vehicle_id, model.total_cost, model.total_hours)
+        .where(model.is_active.is_(False), model.exit_time.isnot(None))
+        for model in (ParkingSession, ParkingSessionHistory)
+    ]).subquery()
+    day = db.func.date(closed.c.exit_time, type_=db.Date)
+    rows = db.session.execute(
+        db.select(
+            day, ParkingSpace.floor, ParkingSpace.space_type, Vehicle.vehicle_type,
+            db.func.count(),
+            db.func.coalesce(db.func.sum(closed.c.total_cost), 0.0),
+            db.func.coalesce(db.func.sum(closed.c.total_hours), 0.0)
+        )
+        .join(ParkingSpace, closed.c.space_id == ParkingSpace.id)
+        .join(Vehicle, closed.c.vehicle_id == Vehicle.id)
+        .group_by(day, ParkingSpace.floor, ParkingSpace.space_type, Vehicle.vehicle_type)
+    ).all()
+
+    values = []
+    for day, floor, space_type, vehicle_type, count, cost, hours in rows:
+        week, month = period_starts(day)
+        values.append({
+            'day': day, 'floor': floor, 'space_type': space_type, 'vehicle_type': vehicle_type,
+            'week': week, 'month': month, 'sessions': count, 'total_cost': cost, 'total_hours': hours,
+        })
+    if values:
+        db.session.execute(db.insert(RevenueDaily), values)
+    data_version.bump()
+    db.session.commit()
+    return len(values)
+
+
+def report(group='day', by=None, start=None, end=None):
+    """
+    Ingresos por período (`group`: day, week o month) y opcionalmente por una
+    dimensión (`by`), sumados en SQL sobre el resumen diario. `start` y `end`
+    (fechas, inclusivas) filtran por día de salida, así que el primer y el
+    último período pueden quedar parciales. Retorna una lista de dicts
+    ordenada por período (y dimensión).
+    """
+    period = getattr(RevenueDaily, group)
+    keys = [period] + ([getattr(RevenueDaily, by)] if by else [])
+    query = (
+        db.select(
+            *keys,
+            db.func.sum(RevenueDaily.sessions),
+            db.func.sum(RevenueDaily.total_cost),
+            db.func.sum(RevenueDaily.total_hours)
+        )
+        .group_by(*keys)
+        .order_by(*keys)
+    )
+    if start is not None:
+        query = query.where(RevenueDaily.day >= start)
+    if end is not None:
+        query = query.where(RevenueDaily.day <= end)
+
+    result = []
+    for row in db.session.execute(query):
+        item = {'period': row[0].isoformat()}
+        if by:
+            item[by] = row[1]
+        sessions, cost, hours = row[len(keys):]
+        item.update(sessions=sessions, total_cost=round(cost, 2), total_hours=round(hours, 2))
+        result.append(item)
+    return result
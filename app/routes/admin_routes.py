@@ -0,0 +1,34 @@
+from flask import Blueprint, request, jsonify
+from app.auth import admin_token_error
+from app.slow_queries import slow_query_log
+
+admin_bp = Blueprint('admin', __name__)
+
+@admin_bp.before_request
+def require_admin_token():
+    """Los endpoints de administración exigen ADMIN_TOKEN (ver app/auth.py)"""
+    return admin_token_error()
+
+# ============ CONSULTAS LENTAS ============
+
+@admin_bp.route('/slow-queries', methods=['GET'])
+def get_slow_queries():
+    """Obtener las últimas consultas lentas (?limit=N, por defecto 50)"""
+    limit = request.args.get('limit', 50)
+    try:
+        limit = int(limit)
+    except ValueError:
+        return jsonify({'error': 'limit debe ser un número entero'}), 400
+    if limit < 1:
+        return jsonify({'error': 'limit debe ser mayor que 0'}), 400
+    
+    return jsonify({
+        'threshold_ms': slow_query_log.threshold_ms,
+        'entries': slow_query_log.entries(limit)
+    })
+
+@admin_bp.route('/slow-queries', methods=['DELETE'])
+def clear_slow_queries():
+    """Vaciar el registro de consultas lentas en memoria"""
+    slow_query_log.clear()
+    return '', 204
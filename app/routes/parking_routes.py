@@ -1,17 +1,36 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, abort, current_app, request, jsonify, stream_with_context
 from datetime import datetime
-from app import db
-from app.models.parking import ParkingSpace, Vehicle, ParkingSession
+from sqlalchemy.exc import IntegrityError
+from app import counters, db, revenue
+from app.analytics import report_cache
+from app.batch import SessionBatch
+from app.data_version import conditional, data_version
+from app.filters import FilterError, parse_session_filters, session_filter_clauses
+from app.importer import ImportDecodeError, ImportFormatError, decode_lines, detect_format, import_rows, read_rows
+from app.models.parking import ParkingSpace, Vehicle, ParkingSession, ParkingSessionHistory
+from app.pagination import PaginationError, paginate, paginate_items, paginate_merged, paginated_response
+from app.serializers import (SESSION_FIELDS, SESSION_RELATIONS, SPACE_FIELDS, VEHICLE_FIELDS, FieldsError,
+                             parse_fieldset, session_projection, session_row, space_projection, space_row,
+                             vehicle_projection, vehicle_row)
+from app.space_index import claim_best_space, occupy_space, space_index
+from app.stream import RECONNECT_DELAY_MS, occupancy_broker, stream_events
 
 parking_bp = Blueprint('parking', __name__)
 
 # ============ ESPACIOS DE PARKING ============
 
 @parking_bp.route('/spaces', methods=['GET'])
+@conditional
 def get_all_spaces():
-    """Obtener todos los espacios de parking"""
-    spaces = ParkingSpace.query.all()
-    return jsonify([space.to_dict() for space in spaces])
+    """Obtener todos los espacios de parking (admite ?fields=)"""
+    try:
+        fieldset = parse_fieldset(request.args, SPACE_FIELDS)
+        spaces, next_cursor = paginate(space_projection(fieldset), ParkingSpace.id)
+    except (PaginationError, FieldsError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    serialize = fieldset.serializer(space_row)
+    return paginated_response([serialize(space) for space in spaces], next_cursor)
 
 @parking_bp.route('/spaces', methods=['POST'])
 def create_space():
@@ -35,15 +54,27 @@ def create_space():
     )
     
     db.session.add(space)
+    db.session.flush()
+    version = counters.adjust(spaces=True, total_spaces=1)
+    space_data = space.to_dict()
     db.session.commit()
     
-    return jsonify(space.to_dict()), 201
+    space_index.add(space_data, version)
+    
+    return jsonify(space_data), 201
 
 @parking_bp.route('/spaces/<int:space_id>', methods=['GET'])
 def get_space(space_id):
-    """Obtener un espacio específico"""
-    space = ParkingSpace.query.get_or_404(space_id)
-    return jsonify(space.to_dict())
+    """Obtener un espacio específico (admite ?fields=)"""
+    try:
+        fieldset = parse_fieldset(request.args, SPACE_FIELDS)
+    except FieldsError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    space = space_projection(fieldset).filter(ParkingSpace.id == space_id).first()
+    if space is None:
+        abort(404)
+    return jsonify(fieldset.serializer(space_row)(space))
 
 @parking_bp.route('/spaces/<int:space_id>', methods=['DELETE'])
 def delete_space(space_id):
@@ -60,23 +91,95 @@ def delete_space(space_id):
         return jsonify({'error': 'No se puede eliminar un espacio con sesiones activas'}), 400
     
     db.session.delete(space)
+    version = counters.adjust(spaces=True, total_spaces=-1)
     db.session.commit()
     
+    space_index.remove(space_id, version)
+    
     return '', 204
 
 @parking_bp.route('/spaces/available', methods=['GET'])
+@conditional
 def get_available_spaces():
-    """Obtener espacios disponibles"""
-    spaces = ParkingSpace.query.filter_by(is_occupied=False).all()
-    return jsonify([space.to_dict() for space in spaces])
+    """Obtener espacios disponibles, filtrables por ?floor= y ?type= (desde el índice en memoria; admite ?fields=)"""
+    floor = request.args.get('floor')
+    if floor is not None:
+        try:
+            floor = int(floor)
+        except ValueError:
+            return jsonify({'error': 'floor debe ser un número entero'}), 400
+    
+    spaces = space_index.available(floor=floor, space_type=request.args.get('type'))
+    
+    try:
+        fieldset = parse_fieldset(request.args, SPACE_FIELDS)
+        spaces, next_cursor = paginate_items(spaces, key=lambda space: space['id'])
+    except (PaginationError, FieldsError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return paginated_response([fieldset.pick(space) for space in spaces], next_cursor)
+
+@parking_bp.route('/spaces/stream', methods=['GET'])
+def stream_spaces():
+    """Stream (Server-Sent Events) de los cambios de espacios libres; se reanuda con ?since= o Last-Event-ID"""
+    since = request.args.get('since') or request.headers.get('Last-Event-ID')
+    if since is not None:
+        try:
+            since = int(since)
+        except ValueError:
+            return jsonify({'error': 'since debe ser un número entero'}), 400
+    
+    config = current_app.config
+    subscriber, resumed = occupancy_broker.subscribe(since)
+    if subscriber is None:
+        # Todos los hilos del stream de este proceso están ocupados
+        response = jsonify({'error': 'Demasiados clientes conectados al stream, intente de nuevo más tarde'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(RECONNECT_DELAY_MS // 1000)
+        return response
+    
+    def poll():
+        # Cambios de otros procesos: el índice se reconstruye y publica la diferencia
+        space_index.ensure_fresh()
+        db.session.remove()
+    
+    def events():
+        try:
+            yield from stream_events(
+                subscriber, resumed,
+                snapshot=space_index.snapshot,
+                poll=lambda: occupancy_broker.poll(poll, config['STREAM_POLL_INTERVAL']),
+                poll_interval=config['STREAM_POLL_INTERVAL'],
+                keepalive_interval=config['STREAM_KEEPALIVE_INTERVAL']
+            )
+        finally:
+            occupancy_broker.unsubscribe(subscriber)
+    
+    response = Response(stream_with_context(events()), mimetype='text/event-stream')
+    # Libera el cupo aunque el cliente se desconecte antes de que empiece el generador
+    response.call_on_close(lambda: occupancy_broker.unsubscribe(subscriber))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # sin buffer en proxies nginx
+    return response
+
+@parking_bp.route('/spaces/import', methods=['POST'])
+def import_spaces():
+    """Importar espacios de parking en lote desde CSV o NDJSON"""
+    return _import_request('spaces')
 
 # ============ VEHÍCULOS ============
 
 @parking_bp.route('/vehicles', methods=['GET'])
 def get_all_vehicles():
-    """Obtener todos los vehículos"""
-    vehicles = Vehicle.query.all()
-    return jsonify([vehicle.to_dict() for vehicle in vehicles])
+    """Obtener todos los vehículos (admite ?fields=)"""
+    try:
+        fieldset = parse_fieldset(request.args, VEHICLE_FIELDS)
+        vehicles, next_cursor = paginate(vehicle_projection(fieldset), Vehicle.id)
+    except (PaginationError, FieldsError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    serialize = fieldset.serializer(vehicle_row)
+    return paginated_response([serialize(vehicle) for vehicle in vehicles], next_cursor)
 
 @parking_bp.route('/vehicles', methods=['POST'])
 def create_vehicle():
@@ -102,15 +205,23 @@ def create_vehicle():
     )
     
     db.session.add(vehicle)
+    counters.adjust(total_vehicles=1)
     db.session.commit()
     
     return jsonify(vehicle.to_dict()), 201
 
 @parking_bp.route('/vehicles/<license_plate>', methods=['GET'])
 def get_vehicle_by_plate(license_plate):
-    """Obtener vehículo por placa"""
-    vehicle = Vehicle.query.filter_by(license_plate=license_plate.upper()).first_or_404()
-    return jsonify(vehicle.to_dict())
+    """Obtener vehículo por placa (admite ?fields=)"""
+    try:
+        fieldset = parse_fieldset(request.args, VEHICLE_FIELDS)
+    except FieldsError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    vehicle = vehicle_projection(fieldset).filter(Vehicle.license_plate == license_plate.upper()).first()
+    if vehicle is None:
+        abort(404)
+    return jsonify(fieldset.serializer(vehicle_row)(vehicle))
 
 @parking_bp.route('/vehicles/<int:vehicle_id>', methods=['DELETE'])
 def delete_vehicle(vehicle_id):
@@ -123,36 +234,95 @@ def delete_vehicle(vehicle_id):
         return jsonify({'error': 'No se puede eliminar un vehículo con sesiones activas'}), 400
     
     db.session.delete(vehicle)
+    counters.adjust(total_vehicles=-1)
     db.session.commit()
     
     return '', 204
 
+@parking_bp.route('/vehicles/import', methods=['POST'])
+def import_vehicles():
+    """Importar vehículos en lote desde CSV o NDJSON"""
+    return _import_request('vehicles')
+
+def _import_request(kind):
+    """
+    Importa el cuerpo de la petición leyéndolo como stream: el archivo nunca
+    se carga completo en memoria. El formato se toma de ?format= o del Content-Type.
+    """
+    fmt = request.args.get('format') or detect_format(request.content_type)
+    if fmt is None:
+        return jsonify({'error': 'Indique el formato con ?format=csv|ndjson o el Content-Type'}), 400
+    
+    # Se decodifica por líneas en lugar de con io.TextIOWrapper: el stream de entrada
+    # de algunos servidores WSGI (p. ej. gunicorn) no implementa la interfaz completa de io
+    stream = decode_lines(request.stream)
+    try:
+        summary = import_rows(kind, read_rows(stream, fmt), current_app.config['IMPORT_CHUNK_SIZE'])
+    except ImportDecodeError as e:
+        # Las filas anteriores a la línea ilegible ya quedaron confirmadas:
+        # se reporta lo importado junto con el error
+        return jsonify({'error': str(e), 'line': e.line, **e.summary}), 400
+    except ImportFormatError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(summary)
+
 # ============ SESIONES DE PARKING ============
 
 @parking_bp.route('/sessions', methods=['GET'])
 def get_all_sessions():
-    """Obtener todas las sesiones de parking"""
-    sessions = ParkingSession.query.all()
-    return jsonify([session.to_dict() for session in sessions])
+    """Obtener las sesiones de parking, filtrables por placa, espacio, piso, pago, estado y rango de fechas (admite ?fields= y ?expand=)"""
+    try:
+        filters = parse_session_filters(request.args)
+        fieldset = parse_fieldset(request.args, SESSION_FIELDS, SESSION_RELATIONS)
+        # Incluye las sesiones archivadas en parking_sessions_history, que nunca están activas
+        models = [ParkingSession] if filters.get('is_active') else [ParkingSession, ParkingSessionHistory]
+        sessions, next_cursor = paginate_merged(
+            [session_projection(model, fieldset).filter(*session_filter_clauses(model, filters)) for model in models],
+            'id'
+        )
+    except (PaginationError, FilterError, FieldsError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    serialize = fieldset.serializer(session_row)
+    return paginated_response([serialize(session) for session in sessions], next_cursor)
 
 @parking_bp.route('/sessions/active', methods=['GET'])
 def get_active_sessions():
-    """Obtener sesiones activas"""
-    sessions = ParkingSession.query.filter_by(is_active=True).all()
-    return jsonify([session.to_dict() for session in sessions])
+    """Obtener sesiones activas (acepta los mismos filtros, ?fields= y ?expand= que /sessions)"""
+    try:
+        filters = parse_session_filters(request.args)
+        filters['is_active'] = True
+        fieldset = parse_fieldset(request.args, SESSION_FIELDS, SESSION_RELATIONS)
+        query = session_projection(ParkingSession, fieldset).filter(*session_filter_clauses(ParkingSession, filters))
+        sessions, next_cursor = paginate(query, ParkingSession.id)
+    except (PaginationError, FilterError, FieldsError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    serialize = fieldset.serializer(session_row)
+    return paginated_response([serialize(session) for session in sessions], next_cursor)
 
 @parking_bp.route('/sessions/entry', methods=['POST'])
 def vehicle_entry():
     """Registrar entrada de vehículo"""
     data = request.get_json()
     
-    # Validar datos requeridos
-    if not data.get('license_plate') or not data.get('space_id'):
-        return jsonify({'error': 'Placa y espacio son requeridos'}), 400
+    # Validar datos requeridos (el espacio es opcional: si falta se asigna automáticamente)
+    if not data.get('license_plate'):
+        return jsonify({'error': 'Placa es requerida'}), 400
+    
+    # El índice de espacios libres usa ids enteros: "1" debe ser el mismo espacio que 1
+    space_id = data.get('space_id')
+    if space_id:
+        try:
+            space_id = int(space_id)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'space_id debe ser un número entero'}), 400
     
     # Buscar o crear vehículo
     vehicle = Vehicle.query.filter_by(license_plate=data['license_plate'].upper()).first()
-    if not vehicle:
+    new_vehicle = vehicle is None
+    if new_vehicle:
         if not data.get('owner_name') or not data.get('vehicle_type'):
             return jsonify({'error': 'Para vehículos nuevos se requiere nombre del propietario y tipo de vehículo'}), 400
         
@@ -170,21 +340,44 @@ def vehicle_entry():
     if active_session:
         return jsonify({'error': 'El vehículo ya tiene una sesión activa'}), 400
     
-    # Verificar que el espacio esté disponible
-    space = ParkingSpace.query.get_or_404(data['space_id'])
-    if space.is_occupied:
-        return jsonify({'error': 'El espacio ya está ocupado'}), 400
+    claimed_space = None
+    if space_id:
+        # Ocupar el espacio solo si sigue libre (un único UPDATE condicional);
+        # el id retornado es el que se usa para la sesión y el índice
+        occupied_id = occupy_space(space_id)
+        if occupied_id is None:
+            ParkingSpace.query.get_or_404(space_id)
+            return jsonify({'error': 'El espacio ya está ocupado'}), 400
+        space_id = occupied_id
+    else:
+        # Asignar el mejor espacio libre según la política configurada
+        claimed_space = claim_best_space(data.get('space_type') or vehicle.vehicle_type)
+        if claimed_space is None:
+            return jsonify({'error': 'No hay espacios disponibles para este tipo de vehículo'}), 400
+        
+        space_id = claimed_space['id']
     
-    # Crear sesión y ocupar espacio
+    # Crear sesión
     session = ParkingSession(
         vehicle_id=vehicle.id,
-        space_id=space.id
+        space_id=space_id
     )
     
-    space.is_occupied = True
-    
     db.session.add(session)
-    db.session.commit()
+    version = counters.adjust(spaces=True, occupied_spaces=1, active_sessions=1, total_vehicles=int(new_vehicle))
+    try:
+        db.session.commit()
+    except Exception as error:
+        db.session.rollback()
+        if claimed_space is not None:
+            space_index.unclaim(claimed_space)
+        if isinstance(error, IntegrityError):
+            # Índices únicos parciales: otra entrada simultánea abrió una
+            # sesión para este vehículo o este espacio
+            return jsonify({'error': 'El vehículo o el espacio ya tienen una sesión activa'}), 400
+        raise
+    
+    space_index.remove(space_id, version)
     
     return jsonify(session.to_dict()), 201
 
@@ -198,29 +391,62 @@ def vehicle_exit():
     
     # Buscar vehículo y sesión activa
     vehicle = Vehicle.query.filter_by(license_plate=data['license_plate'].upper()).first_or_404()
-    session = ParkingSession.query.filter_by(vehicle_id=vehicle.id, is_active=True).first()
+    session = ParkingSession.query_with_relations().filter_by(vehicle_id=vehicle.id, is_active=True).first()
     
     if not session:
         return jsonify({'error': 'No hay sesión activa para este vehículo'}), 400
     
+    # El espacio llega con la sesión (JOIN) antes de tocarla: calculate_cost() no
+    # consulta y el autoflush no parte el UPDATE de la sesión en dos
+    space = session.space
+    
     # Registrar salida
     session.exit_time = datetime.utcnow()
     session.is_active = False
     session.calculate_cost()
     
     # Liberar espacio
-    space = ParkingSpace.query.get(session.space_id)
     space.is_occupied = False
     
+    revenue.record([(session, space, vehicle)])
+    report_cache.mark([session])
+    version = counters.adjust(spaces=True, occupied_spaces=-1, active_sessions=-1)
+    space_data = space.to_dict()
     db.session.commit()
     
+    space_index.add(space_data, version)
+    
     return jsonify(session.to_dict())
 
+@parking_bp.route('/sessions/batch', methods=['POST'])
+def process_session_batch():
+    """Registrar un lote de entradas y salidas en una sola transacción"""
+    data = request.get_json()
+    
+    events = data.get('events') if isinstance(data, dict) else None
+    if not isinstance(events, list) or not events:
+        return jsonify({'error': 'Se requiere una lista de eventos'}), 400
+    
+    max_events = current_app.config['BATCH_MAX_EVENTS']
+    if len(events) > max_events:
+        return jsonify({'error': f'El lote no puede tener más de {max_events} eventos'}), 400
+    
+    results = SessionBatch(events).run()
+    failed = sum(1 for result in results if result['status'] >= 400)
+    
+    return jsonify({
+        'results': results,
+        'succeeded': len(results) - failed,
+        'failed': failed
+    })
+
 @parking_bp.route('/sessions/<int:session_id>/pay', methods=['POST'])
 def pay_session(session_id):
     """Marcar sesión como pagada"""
-    session = ParkingSession.query.get_or_404(session_id)
+    session = ParkingSession.query_with_relations().filter_by(id=session_id).first_or_404()
     session.payment_status = 'paid'
+    report_cache.mark([session])
+    data_version.bump()
     db.session.commit()
     
     return jsonify(session.to_dict())
@@ -228,13 +454,15 @@ def pay_session(session_id):
 # ============ ESTADÍSTICAS ============
 
 @parking_bp.route('/stats', methods=['GET'])
+@conditional
 def get_statistics():
-    """Obtener estadísticas del parking"""
-    total_spaces = ParkingSpace.query.count()
-    occupied_spaces = ParkingSpace.query.filter_by(is_occupied=True).count()
+    """Obtener estadísticas del parking (contadores mantenidos en cada operación)"""
+    values = counters.read()
+    total_spaces = values['total_spaces']
+    occupied_spaces = values['occupied_spaces']
     available_spaces = total_spaces - occupied_spaces
-    active_sessions = ParkingSession.query.filter_by(is_active=True).count()
-    total_vehicles = Vehicle.query.count()
+    active_sessions = values['active_sessions']
+    total_vehicles = values['total_vehicles']
     
     return jsonify({
         'total_spaces': total_spaces,
@@ -257,14 +485,21 @@ def test_endpoint():
             'GET /api/spaces - Obtener todos los espacios',
             'POST /api/spaces - Crear espacio',
             'DELETE /api/spaces/:id - Eliminar espacio',
+            'POST /api/spaces/import - Importar espacios (CSV/NDJSON)',
             'GET /api/spaces/available - Espacios disponibles',
+            'GET /api/spaces/stream - Stream de cambios de espacios libres (SSE)',
             'GET /api/vehicles - Obtener todos los vehículos',
             'POST /api/vehicles - Registrar vehículo',
             'DELETE /api/vehicles/:id - Eliminar vehículo',
+            'POST /api/vehicles/import - Importar vehículos (CSV/NDJSON)',
             'GET /api/sessions - Obtener todas las sesiones',
             'GET /api/sessions/active - Sesiones activas',
             'POST /api/sessions/entry - Entrada de vehículo',
             'POST /api/sessions/exit - Salida de vehículo',
-            'GET /api/stats - Estadísticas'
+            'POST /api/sessions/batch - Lote de entradas y salidas',
+            'GET /api/stats - Estadísticas',
+            'GET /api/reports/revenue - Reporte de ingresos',
+            'GET /api/reports/occupancy - Ocupación en el tiempo',
+            'GET /api/reports/dwell - Permanencia y horas pico'
         ]
     })
\ No newline at end of file
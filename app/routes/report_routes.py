@@ -0,0 +1,115 @@
+from datetime import date, datetime, timedelta
+
+from flask import Blueprint, current_app, request, jsonify
+from app import analytics, revenue
+from app.analytics import report_cache
+from app.data_version import conditional, data_version, served_version
+from app.filters import FilterError, parse_session_filters, parse_time
+
+reports_bp = Blueprint('reports', __name__)
+
+# ============ INGRESOS ============
+
+@reports_bp.route('/revenue', methods=['GET'])
+@conditional
+def get_revenue():
+    """Ingresos por día, semana o mes (?group=), opcionalmente por piso, tipo de espacio o de vehículo (?by=)"""
+    group = request.args.get('group', 'day')
+    if group not in revenue.GROUPS:
+        return jsonify({'error': f'group debe ser uno de: {", ".join(revenue.GROUPS)}'}), 400
+
+    by = request.args.get('by')
+    if by is not None and by not in revenue.DIMENSIONS:
+        return jsonify({'error': f'by debe ser uno de: {", ".join(revenue.DIMENSIONS)}'}), 400
+
+    bounds = {}
+    for name in ('from', 'to'):
+        value = request.args.get(name)
+        if value is not None:
+            try:
+                bounds[name] = date.fromisoformat(value)
+            except ValueError:
+                return jsonify({'error': f'{name} debe ser una fecha ISO 8601 (p. ej. 2026-01-31)'}), 400
+    if 'from' in bounds and 'to' in bounds and bounds['from'] > bounds['to']:
+        return jsonify({'error': 'from no puede ser posterior a to'}), 400
+
+    rows = revenue.report(group=group, by=by, start=bounds.get('from'), end=bounds.get('to'))
+
+    return jsonify({
+        'group': group,
+        'by': by,
+        'from': request.args.get('from'),
+        'to': request.args.get('to'),
+        'rows': rows,
+        'totals': {
+            'sessions': sum(row['sessions'] for row in rows),
+            'total_cost': round(sum(row['total_cost'] for row in rows), 2),
+            'total_hours': round(sum(row['total_hours'] for row in rows), 2),
+        }
+    })
+
+# ============ OCUPACIÓN ============
+
+@reports_bp.route('/occupancy', methods=['GET'])
+def get_occupancy():
+    """Ocupación promedio y máxima por intervalos de ?step= minutos, en total o por piso o tipo de espacio (?by=)"""
+    by = request.args.get('by')
+    if by is not None and by not in analytics.OCCUPANCY_DIMENSIONS:
+        return jsonify({'error': f'by debe ser uno de: {", ".join(analytics.OCCUPANCY_DIMENSIONS)}'}), 400
+
+    try:
+        step = int(request.args.get('step', 15))
+    except ValueError:
+        return jsonify({'error': 'step debe ser un número entero de minutos'}), 400
+    if not 1 <= step <= 1440:
+        return jsonify({'error': 'step debe estar entre 1 y 1440 minutos'}), 400
+
+    # Por defecto, las últimas 24 horas
+    now = datetime.utcnow()
+    try:
+        end = parse_time(request.args['to'], 'to') if request.args.get('to') else now
+        if len(request.args.get('to', '')) == 10:  # solo fecha: hasta el final de ese día
+            end += timedelta(days=1)
+        start = parse_time(request.args['from'], 'from') if request.args.get('from') else end - timedelta(days=1)
+    except FilterError as e:
+        return jsonify({'error': str(e)}), 400
+    if start >= end:
+        return jsonify({'error': 'from debe ser anterior a to'}), 400
+    max_minutes = current_app.config['OCCUPANCY_MAX_MINUTES']
+    if end - start > timedelta(minutes=max_minutes):
+        return jsonify({'error': f'El rango no puede superar {max_minutes} minutos'}), 400
+
+    buckets, series = analytics.occupancy(start, end, step, by=by, now=now)
+
+    return jsonify({
+        'from': buckets[0],
+        'step': step,
+        'by': by,
+        'buckets': buckets,
+        'series': series
+    })
+
+# ============ PERMANENCIA Y HORAS PICO ============
+
+@reports_bp.route('/dwell', methods=['GET'])
+@conditional
+def get_dwell():
+    """Distribución de la permanencia y llegadas/salidas por hora y día de la semana de las sesiones cerradas"""
+    try:
+        filters = parse_session_filters(request.args)
+    except FilterError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Un resultado guardado lleva la versión con la que se calculó: el ETag
+    # corresponde al cuerpo servido aunque otro proceso ya haya cambiado datos
+    report, version = report_cache.get_or_compute(
+        'dwell', filters, lambda: analytics.dwell_report(filters), data_version.current()
+    )
+    served_version(version)
+
+    return jsonify({
+        'from': request.args.get('from'),
+        'to': request.args.get('to'),
+        'time_field': request.args.get('time_field', 'entry_time'),
+        **report
+    })
@@ -0,0 +1,298 @@
+import json
+from operator import itemgetter
+
+from flask import current_app, jsonify
+from flask.json.provider import DefaultJSONProvider
+
+from app import db
+from app.models.parking import ParkingSpace, Vehicle
+
+# Serialización de listados por proyección: en lugar de cargar objetos ORM
+# (identity map, estado por instancia, relaciones) para llamar a to_dict(),
+# se seleccionan solo las columnas que usa to_dict() como tuplas y se arma el
+# mismo dict a partir de ellas. Las funciones *_row replican los to_dict() de
+# app/models/parking.py: si cambia uno, debe cambiar el otro (lo verifica
+# test_projection_serializers_match_to_dict).
+
+SPACE_COLUMNS = (
+    ParkingSpace.id, ParkingSpace.number, ParkingSpace.floor, ParkingSpace.is_occupied,
+    ParkingSpace.space_type, ParkingSpace.hourly_rate, ParkingSpace.created_at,
+)
+
+VEHICLE_COLUMNS = (
+    Vehicle.id, Vehicle.license_plate, Vehicle.vehicle_type, Vehicle.owner_name,
+    Vehicle.owner_phone, Vehicle.created_at,
+)
+
+# Campos que se pueden pedir con ?fields= (en el orden de to_dict())
+SPACE_FIELDS = tuple(column.key for column in SPACE_COLUMNS)
+VEHICLE_FIELDS = tuple(column.key for column in VEHICLE_COLUMNS)
+SESSION_FIELDS = (
+    'id', 'vehicle_id', 'space_id', 'entry_time', 'exit_time', 'total_hours', 'total_cost',
+    'is_active', 'payment_status', 'created_at',
+)
+
+# Relaciones de una sesión que se pueden incluir con ?expand= y sus campos
+SESSION_RELATIONS = {'vehicle': VEHICLE_FIELDS, 'space': SPACE_FIELDS}
+
+# Modelo y clave foránea de cada relación, para el LEFT JOIN
+SESSION_JOINS = {'vehicle': (Vehicle, 'vehicle_id'), 'space': (ParkingSpace, 'space_id')}
+
+DATETIME_FIELDS = frozenset({'entry_time', 'exit_time', 'created_at'})
+
+
+class FieldsError(ValueError):
+    """Campos o relaciones desconocidos en ?fields= o ?expand="""
+
+
+class FieldSet:
+    """
+    Campos pedidos de un recurso: `fields` son las columnas propias y
+    `relations` las relaciones incluidas con sus campos. Las proyecciones
+    seleccionan y unen solo lo que contiene, más el id (clave de paginación
+    y, en las relaciones, marca de nulidad del LEFT JOIN) aunque no se haya
+    pedido. `default` indica la forma completa de to_dict().
+    """
+
+    def __init__(self, fields, relations=None, default=False):
+        self.fields = tuple(fields)
+        self.relations = dict(relations or {})
+        self.default = default
+
+    @property
+    def selected(self):
+        """Columnas propias que se seleccionan, en el orden de la fila"""
+        return _with_id(self.fields)
+
+    def serializer(self, default_row):
+        """
+        Función fila -> dict. Con la forma completa es `default_row` (las
+        funciones *_row); si no, arma solo los campos pedidos.
+        """
+        if self.default:
+            return default_row
+
+        plan = [(name, _getter(index, name)) for index, name in enumerate(self.selected) if name in self.fields]
+        start = len(self.selected)
+        for name in SESSION_RELATIONS:
+            if name in self.relations:
+                columns = _with_id(self.relations[name])
+                relation_plan = [(field, _getter(start + index, field))
+                                 for index, field in enumerate(columns) if field in self.relations[name]]
+                plan.append((name, _relation_getter(start, relation_plan)))
+                start += len(columns)
+
+        return lambda row: {key: get(row) for key, get in plan}
+
+    def pick(self, item):
+        """Filtra un dict ya armado (p. ej. del índice de espacios libres) a los campos pedidos"""
+        if self.default:
+            return item
+        return {name: item[name] for name in self.fields}
+
+
+def parse_fieldset(args, fields, relations=None):
+    """
+    Lee ?fields= y ?expand= (listas separadas por coma) para un recurso con
+    campos `fields` y relaciones `relations` (nombre -> campos):
+      - sin ninguno de los dos: forma completa, con todas las relaciones
+      - ?expand=vehicle,space: todos los campos propios y solo esas relaciones
+      - ?fields=id,entry_time: solo esos campos; las relaciones se piden en
+        ?expand=, por nombre en ?fields= (vehicle) o campo a campo (vehicle.license_plate)
+    """
+    relations = relations or {}
+    raw_fields = args.get('fields')
+    raw_expand = args.get('expand')
+    if raw_fields is None and raw_expand is None:
+        return FieldSet(fields, relations, default=True)
+
+    selected_relations = {}
+    for name in _split(raw_expand):
+        if name not in relations:
+            valid = ', '.join(relations) or 'ninguna'
+            raise FieldsError(f"expand: relación desconocida '{name}'; válidas: {valid}")
+        selected_relations[name] = relations[name]
+
+    if raw_fields is None:
+        return FieldSet(fields, selected_relations)
+
+    requested = _split(raw_fields)
+    if not requested:
+        raise FieldsError('fields no puede estar vacío')
+
+    own = set()
+    whole = set()
+    partial = {}
+    for name in requested:
+        relation, _, field = name.partition('.')
+        if field:
+            if relation not in relations or field not in relations[relation]:
+                raise FieldsError(_unknown_field(name, fields, relations))
+            partial.setdefault(relation, set()).add(field)
+        elif name in relations:
+            whole.add(name)
+            selected_relations[name] = relations[name]
+        elif name in fields:
+            own.add(name)
+        else:
+            raise FieldsError(_unknown_field(name, fields, relations))
+
+    # vehicle.license_plate acota la relación aunque también venga en ?expand=
+    for relation, names in partial.items():
+        if relation not in whole:
+            selected_relations[relation] = tuple(field for field in relations[relation] if field in names)
+
+    return FieldSet((name for name in fields if name in own), selected_relations)
+
+
+def _split(value):
+    if value is None:
+        return []
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def _unknown_field(name, fields, relations):
+    valid = list(fields) + [f'{relation}[.<campo>]' for relation in relations]
+    return f"fields: campo desconocido '{name}'; válidos: {', '.join(valid)}"
+
+
+def _with_id(fields):
+    return ('id',) + tuple(name for name in fields if name != 'id')
+
+
+def _getter(index, name):
+    if name in DATETIME_FIELDS:
+        return lambda row: row[index].isoformat() if row[index] is not None else None
+    return itemgetter(index)
+
+
+def _relation_getter(start, plan):
+    # Sin fila unida (LEFT JOIN) el id de la relación es NULL, como to_dict() da None
+    return lambda row: {key: get(row) for key, get in plan} if row[start] is not None else None
+
+
+def space_projection(fieldset=None):
+    """Consulta de espacios que retorna filas (tuplas) con las columnas de to_dict() o de `fieldset`"""
+    if fieldset is None or fieldset.default:
+        return db.session.query(*SPACE_COLUMNS)
+    return db.session.query(*(getattr(ParkingSpace, name) for name in fieldset.selected))
+
+
+def vehicle_projection(fieldset=None):
+    """Consulta de vehículos que retorna filas (tuplas) con las columnas de to_dict() o de `fieldset`"""
+    if fieldset is None or fieldset.default:
+        return db.session.query(*VEHICLE_COLUMNS)
+    return db.session.query(*(getattr(Vehicle, name) for name in fieldset.selected))
+
+
+def session_projection(model, fieldset=None):
+    """
+    Consulta de sesiones (`model` es ParkingSession o ParkingSessionHistory)
+    con las columnas del vehículo y del espacio en la misma fila, vía LEFT JOIN.
+    Las columnas unidas llevan prefijo (vehicle__id, ...) para no chocar con
+    las de la sesión (vehicle_id). Con `fieldset` solo se seleccionan los
+    campos pedidos y solo se unen las relaciones incluidas.
+    """
+    if fieldset is None:
+        fieldset = FieldSet(SESSION_FIELDS, SESSION_RELATIONS, default=True)
+
+    columns = [getattr(model, name) for name in fieldset.selected]
+    joins = []
+    # Mismo orden de relaciones que FieldSet.serializer()
+    for name in SESSION_RELATIONS:
+        if name in fieldset.relations:
+            target, foreign_key = SESSION_JOINS[name]
+            columns += [getattr(target, field).label(f'{name}__{field}') for field in _with_id(fieldset.relations[name])]
+            joins.append((target, getattr(model, foreign_key) == target.id))
+
+    query = db.session.query(*columns)
+    for target, condition in joins:
+        query = query.outerjoin(target, condition)
+    return query
+
+
+def space_row(row):
+    """Equivalente a ParkingSpace.to_dict() para una fila de space_projection()"""
+    id, number, floor, is_occupied, space_type, hourly_rate, created_at = row
+    return {
+        'id': id,
+        'number': number,
+        'floor': floor,
+        'is_occupied': is_occupied,
+        'space_type': space_type,
+        'hourly_rate': hourly_rate,
+        'created_at': created_at.isoformat()
+    }
+
+
+def vehicle_row(row):
+    """Equivalente a Vehicle.to_dict() para una fila de vehicle_projection()"""
+    id, license_plate, vehicle_type, owner_name, owner_phone, created_at = row
+    return {
+        'id': id,
+        'license_plate': license_plate,
+        'vehicle_type': vehicle_type,
+        'owner_name': owner_name,
+        'owner_phone': owner_phone,
+        'created_at': created_at.isoformat()
+    }
+
+
+def session_row(row):
+    """Equivalente a ParkingSession.to_dict() para una fila de session_projection()"""
+    (id, vehicle_id, space_id, entry_time, exit_time, total_hours, total_cost,
+     is_active, payment_status, created_at) = row[:10]
+    vehicle = row[10:16]
+    space = row[16:]
+    return {
+        'id': id,
+        'vehicle_id': vehicle_id,
+        'space_id': space_id,
+        'vehicle': vehicle_row(vehicle) if vehicle[0] is not None else None,
+        'space': space_row(space) if space[0] is not None else None,
+        'entry_time': entry_time.isoformat(),
+        'exit_time': exit_time.isoformat() if exit_time else None,
+        'total_hours': total_hours,
+        'total_cost': total_cost,
+        'is_active': is_active,
+        'payment_status': payment_status,
+        'created_at': created_at.isoformat()
+    }
+
+
+class FastJSON:
+    """
+    Codificación JSON de respuestas grandes con un único JSONEncoder reutilizado,
+    configurado como el proveedor JSON de Flask (ensure_ascii, sort_keys y
+    separadores compactos), así que el cuerpo es idéntico byte a byte al de
+    jsonify(). Si la app formatea la salida (modo debug o compact=False) o usa
+    otro proveedor JSON, se delega en jsonify().
+    """
+
+    def __init__(self):
+        self._encoders = {}
+
+    def _encoder(self, provider):
+        key = (provider.ensure_ascii, provider.sort_keys)
+        encoder = self._encoders.get(key)
+        if encoder is None:
+            encoder = self._encoders[key] = json.JSONEncoder(
+                ensure_ascii=provider.ensure_ascii,
+                sort_keys=provider.sort_keys,
+                separators=(',', ':'),
+                default=provider.default
+            )
+        return encoder
+
+    def response(self, data):
+        app = current_app._get_current_object()
+        provider = app.json
+        pretty = (provider.compact is None and app.debug) or provider.compact is False
+        if type(provider) is not DefaultJSONProvider or pretty:
+            return jsonify(data)
+
+        body = self._encoder(provider).encode(data)
+        return app.response_class(f'{body}\n', mimetype=provider.mimetype)
+
+
+fast_json = FastJSON()
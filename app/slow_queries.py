@@ -0,0 +1,154 @@
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from flask import has_request_context, request
+from sqlalchemy import event
+
+from app import db
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Límites para que una entrada del log no crezca sin control
+MAX_STATEMENT_LENGTH = 2000
+MAX_PARAMETER_LENGTH = 200
+MAX_PARAMETER_ROWS = 3
+
+
+class SlowQueryLog:
+    """
+    Registro de consultas lentas: solo las sentencias que tardan más de
+    SLOW_QUERY_THRESHOLD_MS. Cada entrada guarda la sentencia, sus parámetros,
+    la duración, el endpoint de Flask que la emitió y las últimas líneas de la
+    pila dentro de app/ (p. ej. el to_dict que disparó una carga perezosa).
+
+    Las entradas se guardan en un buffer circular en memoria de
+    SLOW_QUERY_LOG_SIZE elementos (leído por GET /api/admin/slow-queries) y,
+    si se configura SLOW_QUERY_LOG_FILE, también como líneas JSON en un
+    archivo con rotación.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = deque(maxlen=200)
+        self._logger = None
+        self.threshold_ms = None
+        self.stack_depth = 8
+
+    def init_app(self, app):
+        threshold = app.config.get('SLOW_QUERY_THRESHOLD_MS')
+        if threshold is None or threshold < 0:
+            return
+
+        self.threshold_ms = threshold
+        self.stack_depth = app.config.get('SLOW_QUERY_STACK_DEPTH', 8)
+        with self._lock:
+            self._entries = deque(self._entries, maxlen=app.config.get('SLOW_QUERY_LOG_SIZE', 200))
+
+        log_file = app.config.get('SLOW_QUERY_LOG_FILE')
+        if log_file and self._logger is None:
+            logger = logging.getLogger('parking.slow_queries')
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            handler = RotatingFileHandler(
+                log_file,
+                maxBytes=app.config.get('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024),
+                backupCount=app.config.get('SLOW_QUERY_LOG_BACKUPS', 5)
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+            self._logger = logger
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def entries(self, limit=None):
+        """Últimas entradas, de la más reciente a la más antigua"""
+        with self._lock:
+            entries = list(self._entries)
+        entries.reverse()
+        return entries[:limit] if limit is not None else entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('slow_query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('slow_query_start')
+        if not starts:
+            return
+        duration_ms = (time.perf_counter() - starts.pop()) * 1000
+        if self.threshold_ms is None or duration_ms < self.threshold_ms:
+            return
+
+        # Solo las consultas lentas pagan el costo de capturar la pila
+        entry = {
+            'timestamp': datetime.utcnow().isoformat(),
+            'duration_ms': round(duration_ms, 3),
+            'statement': statement[:MAX_STATEMENT_LENGTH],
+            'parameters': _trim_parameters(parameters, executemany),
+            'endpoint': None,
+            'method': None,
+            'path': None,
+            'stack': self._app_stack(),
+        }
+        if has_request_context():
+            entry['endpoint'] = request.endpoint
+            entry['method'] = request.method
+            entry['path'] = request.full_path.rstrip('?')
+
+        with self._lock:
+            self._entries.append(entry)
+        if self._logger is not None:
+            self._logger.info(json.dumps(entry, ensure_ascii=False))
+
+    def _app_stack(self):
+        """Últimos frames de la pila que pertenecen a app/, sin este módulo"""
+        frames = [
+            frame for frame in traceback.extract_stack()
+            if frame.filename.startswith(APP_DIR) and frame.filename != __file__
+        ]
+        return [
+            f'{os.path.relpath(frame.filename, os.path.dirname(APP_DIR))}:{frame.lineno} in {frame.name}'
+            for frame in frames[-self.stack_depth:]
+        ]
+
+
+def _trim_value(value):
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    text = str(value)
+    return text if len(text) <= MAX_PARAMETER_LENGTH else text[:MAX_PARAMETER_LENGTH] + '...'
+
+
+def _trim_row(row):
+    if isinstance(row, dict):
+        return {key: _trim_value(value) for key, value in row.items()}
+    if isinstance(row, (list, tuple)):
+        return [_trim_value(value) for value in row]
+    return _trim_value(row)
+
+
+def _trim_parameters(parameters, executemany):
+    """Parámetros serializables y acotados; en executemany solo las primeras filas"""
+    if executemany:
+        rows = list(parameters)
+        trimmed = [_trim_row(row) for row in rows[:MAX_PARAMETER_ROWS]]
+        if len(rows) > MAX_PARAMETER_ROWS:
+            trimmed.append(f'... {len(rows) - MAX_PARAMETER_ROWS} filas más')
+        return trimmed
+    return _trim_row(parameters)
+
+
+slow_query_log = SlowQueryLog()
@@ -0,0 +1,260 @@
+import heapq
+import threading
+
+from flask import current_app
+
+from app import db
+from app.models.parking import ParkingSpace, ParkingCounter
+from app.stream import occupancy_broker
+
+# Contador que versiona los cambios de ocupación/alta/baja de espacios
+VERSION_COUNTER = 'spaces_version'
+
+
+class FreeSpaceIndex:
+    """
+    Índice en memoria (por proceso) de los espacios libres, agrupados por
+    (piso, tipo de espacio).
+
+    Las rutas que cambian espacios incrementan `spaces_version` en la misma
+    transacción (counters.adjust(spaces=True), o bump_version en los lotes)
+    y, después del commit, aplican el cambio al índice con add/remove. Si la
+    versión recibida no es la siguiente a la del índice (otro proceso
+    modificó espacios), el índice queda desactualizado y se reconstruye desde
+    la base de datos en la siguiente lectura.
+
+    Para la asignación automática se mantiene además un heap por tipo de
+    espacio ordenado por (piso, id): elegir el mejor espacio libre es O(log n).
+    Los heaps se limpian de forma perezosa: una entrada cuyo espacio ya no
+    está libre se descarta al llegar a la cima.
+
+    Cada cambio aplicado (y la diferencia encontrada al reconstruir) se
+    publica en occupancy_broker para GET /api/spaces/stream.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}  # (floor, space_type) -> {space_id: space_dict}
+        self._keys = {}  # space_id -> (floor, space_type)
+        self._views = {}  # (floor, space_type) filtrado -> lista ordenada por id
+        self._heaps = {}  # space_type -> heap de (floor, space_id)
+        self.version = None
+
+    def init_app(self, app):
+        with app.app_context():
+            self.rebuild()
+
+    def rebuild(self, version=None):
+        """
+        Reconstruye el índice desde la base de datos. `version` es la versión
+        de los espacios leídos si el llamador ya la conoce (un lote que tiene
+        el bloqueo de escritura); si no, se lee de parking_counters.
+        """
+        # La versión se lee antes que los espacios: si otro commit ocurre en
+        # medio, el índice queda con una versión vieja y se reconstruye otra vez
+        if version is None:
+            version = ParkingCounter.current(VERSION_COUNTER)
+        spaces = ParkingSpace.query.filter_by(is_occupied=False).all()
+
+        buckets = {}
+        keys = {}
+        heaps = {}
+        for space in spaces:
+            key = (space.floor, space.space_type)
+            buckets.setdefault(key, {})[space.id] = space.to_dict()
+            keys[space.id] = key
+            heaps.setdefault(space.space_type, []).append((space.floor, space.id))
+        for heap in heaps.values():
+            heapq.heapify(heap)
+
+        with self._lock:
+            freed, taken = _diff(self._buckets, buckets)
+            self._buckets = buckets
+            self._keys = keys
+            self._heaps = heaps
+            self._views = {}
+            self.version = version
+            occupancy_broker.publish(version, freed=freed, taken=taken)
+
+    def ensure_fresh(self):
+        """Reconstruye el índice si su versión quedó atrás de la base de datos"""
+        if ParkingCounter.current(VERSION_COUNTER) != self.version:
+            self.rebuild()
+
+    def invalidate(self):
+        """Marca el índice como desactualizado; se reconstruye en la siguiente lectura"""
+        with self._lock:
+            self.version = None
+
+    def bump_version(self):
+        """
+        Incrementa la versión de espacios en la transacción actual.
+        Debe llamarse antes del commit; retorna la versión a pasar a add/remove.
+        """
+        return ParkingCounter.add({VERSION_COUNTER: 1})[VERSION_COUNTER]
+
+    def add(self, space_data, version):
+        """Registra un espacio libre (creado o liberado) ya confirmado en la base de datos"""
+        self.apply(version, freed=[space_data])
+
+    def remove(self, space_id, version):
+        """Quita un espacio (ocupado o eliminado) ya confirmado en la base de datos"""
+        self.apply(version, taken=[space_id])
+
+    def apply(self, version, freed=(), taken=()):
+        """
+        Aplica de una vez varios cambios confirmados bajo una misma versión
+        (p. ej. un lote de entradas y salidas): `freed` son dicts de espacios
+        que quedaron libres y `taken` ids de espacios ocupados o eliminados.
+        """
+        with self._lock:
+            if not self._advance(version):
+                return
+            for space_id in taken:
+                self._discard(space_id)
+            for space_data in freed:
+                self._insert(space_data)
+            self._views = {}
+            occupancy_broker.publish(version, freed=freed, taken=taken)
+
+    def claim(self, space_types, check_version=True):
+        """
+        Reserva el mejor espacio libre según la política: el primer tipo de
+        `space_types` que tenga espacios libres y, dentro de él, el piso más
+        bajo. El espacio sale del índice de inmediato, así que dos peticiones
+        del mismo proceso nunca reciben el mismo espacio.
+        Retorna el dict del espacio, o None si no hay ninguno libre.
+        Con check_version=False no se compara la versión con la base de datos
+        (lo usa un lote que ya verificó el índice y tiene el bloqueo de escritura).
+        """
+        if check_version:
+            self.ensure_fresh()
+
+        with self._lock:
+            for space_type in space_types:
+                heap = self._heaps.get(space_type)
+                while heap:
+                    floor, space_id = heapq.heappop(heap)
+                    if self._keys.get(space_id) != (floor, space_type):
+                        continue  # entrada obsoleta
+                    space_data = self._buckets[(floor, space_type)][space_id]
+                    self._discard(space_id)
+                    self._views = {}
+                    return space_data
+        return None
+
+    def unclaim(self, space_data):
+        """
+        Devuelve al índice un espacio libre sin avanzar la versión: una reserva
+        de claim que finalmente no se ocupó, o un espacio liberado dentro de un
+        lote aún sin confirmar
+        """
+        with self._lock:
+            self._insert(space_data)
+
+    def available(self, floor=None, space_type=None):
+        """Espacios libres ordenados por id, opcionalmente filtrados por piso y tipo"""
+        self.ensure_fresh()
+
+        with self._lock:
+            view_key = (floor, space_type)
+            view = self._views.get(view_key)
+            if view is None:
+                spaces = []
+                for (bucket_floor, bucket_type), bucket in self._buckets.items():
+                    if floor is not None and bucket_floor != floor:
+                        continue
+                    if space_type is not None and bucket_type != space_type:
+                        continue
+                    spaces.extend(bucket.values())
+                view = sorted(spaces, key=lambda space: space['id'])
+                self._views[view_key] = view
+            return view
+
+    def snapshot(self):
+        """(versión, espacios libres ordenados por id) leídos juntos bajo el lock"""
+        self.ensure_fresh()
+        with self._lock:
+            spaces = [space for bucket in self._buckets.values() for space in bucket.values()]
+            return self.version, sorted(spaces, key=lambda space: space['id'])
+
+    def _advance(self, version):
+        # Solo se aplica el cambio si es exactamente el siguiente; si no,
+        # se marca el índice como desactualizado para reconstruirlo
+        if self.version is not None and version == self.version + 1:
+            self.version = version
+            return True
+        self.version = None
+        return False
+
+    def _insert(self, space_data):
+        space_id = space_data['id']
+        self._discard(space_id)
+        key = (space_data['floor'], space_data['space_type'])
+        self._buckets.setdefault(key, {})[space_id] = space_data
+        self._keys[space_id] = key
+        self._views = {}
+
+        heap = self._heaps.setdefault(space_data['space_type'], [])
+        heapq.heappush(heap, (space_data['floor'], space_id))
+        # Compactar si acumula demasiadas entradas obsoletas
+        if len(heap) > 2 * len(self._keys) + 64:
+            heap[:] = [entry for entry in set(heap) if self._keys.get(entry[1]) == (entry[0], space_data['space_type'])]
+            heapq.heapify(heap)
+
+    def _discard(self, space_id):
+        key = self._keys.pop(space_id, None)
+        if key is not None:
+            bucket = self._buckets[key]
+            bucket.pop(space_id, None)
+            if not bucket:
+                del self._buckets[key]
+
+
+def _diff(old_buckets, new_buckets):
+    """Espacios que quedaron libres (dicts) y que dejaron de estarlo (ids) entre dos estados"""
+    old = {space_id: space for bucket in old_buckets.values() for space_id, space in bucket.items()}
+    new = {space_id: space for bucket in new_buckets.values() for space_id, space in bucket.items()}
+    freed = [space for space_id, space in sorted(new.items()) if old.get(space_id) != space]
+    taken = sorted(space_id for space_id in old if space_id not in new)
+    return freed, taken
+
+
+space_index = FreeSpaceIndex()
+
+
+def claim_best_space(vehicle_type, occupy=None, check_version=True):
+    """
+    Elige y ocupa el mejor espacio libre para el tipo de vehículo.
+    El índice entrega el candidato en O(log n) y `occupy` (por defecto el
+    UPDATE condicional de occupy_space) lo ocupa solo si sigue libre; si otro
+    proceso lo tomó, se prueba con el siguiente. Retorna el dict del espacio o None.
+    """
+    occupy = occupy or occupy_space
+    policy = current_app.config['SPACE_ASSIGNMENT_POLICY']
+    space_types = policy.get(vehicle_type) or [vehicle_type, 'regular']
+
+    while True:
+        space_data = space_index.claim(space_types, check_version=check_version)
+        if space_data is None:
+            return None
+
+        if occupy(space_data['id']):
+            return space_data
+
+
+def occupy_space(space_id):
+    """
+    Ocupa un espacio con un único UPDATE ... WHERE id=? AND is_occupied=0
+    RETURNING id. Retorna el id del espacio ocupado (entero, tal como está en
+    la base de datos), o None si no existe o ya estaba ocupado; así dos
+    entradas simultáneas nunca pueden ocupar el mismo espacio.
+    No sincroniza los objetos ParkingSpace ya cargados en la sesión.
+    """
+    return db.session.scalar(
+        db.update(ParkingSpace)
+        .where(ParkingSpace.id == space_id, ParkingSpace.is_occupied.is_(False))
+        .values(is_occupied=True)
+        .returning(ParkingSpace.id)
+        .execution_options(synchronize_session=False)
+    )
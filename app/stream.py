@@ -0,0 +1,189 @@
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+# Milisegundos que EventSource espera antes de reconectarse
+RECONNECT_DELAY_MS = 3000
+
+
+class Subscriber:
+    """Cola acotada de eventos de un cliente del stream"""
+
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = False
+
+
+class OccupancyBroker:
+    """
+    Difusión en el proceso de los cambios de espacios libres a los clientes
+    de GET /api/spaces/stream (Server-Sent Events).
+
+    El índice de espacios libres publica aquí cada cambio ya confirmado con
+    la versión de espacios (`spaces_version`) que lo produjo: espacios que
+    quedaron libres (`freed`, dicts) y espacios ocupados o eliminados
+    (`taken`, ids). Los cambios hechos por otros procesos llegan como la
+    diferencia calculada al reconstruir el índice.
+
+    Cada cliente tiene una cola de STREAM_QUEUE_SIZE eventos; si se llena, el
+    cliente se descarta (recibe lo que ya tenía en cola y se cierra su stream)
+    en lugar de frenar a los demás. Los últimos STREAM_HISTORY_SIZE eventos
+    se conservan para que un cliente que se reconecta con ?since= o
+    Last-Event-ID reciba solo los cambios que se perdió.
+
+    Cada cliente conectado ocupa un hilo del worker, así que el proceso
+    acepta a lo sumo STREAM_MAX_CLIENTS a la vez; los demás se rechazan.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._history = deque(maxlen=1000)
+        self.queue_size = 100
+        self.max_clients = 0  # 0 = sin límite
+        self.version = None  # última versión publicada
+        self._polled_at = 0.0
+
+    def init_app(self, app):
+        self.queue_size = app.config.get('STREAM_QUEUE_SIZE', 100)
+        self.max_clients = app.config.get('STREAM_MAX_CLIENTS', 0)
+        with self._lock:
+            self._history = deque(maxlen=app.config.get('STREAM_HISTORY_SIZE', 1000))
+            self.version = None
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, version, freed=(), taken=()):
+        """
+        Difunde un cambio confirmado. La primera versión publicada solo fija
+        la base (no hay clientes que puedan tener un estado anterior).
+        Debe llamarse en orden de versión (el índice lo hace bajo su lock).
+        """
+        with self._lock:
+            previous = self.version
+            if previous is not None and version <= previous:
+                return
+            self.version = version
+            if previous is None or not (freed or taken):
+                return
+
+            event = {
+                'previous': previous,
+                'version': version,
+                'data': json.dumps({'version': version, 'freed': list(freed), 'taken': list(taken)}, separators=(',', ':')),
+            }
+            self._history.append(event)
+            for subscriber in list(self._subscribers):
+                try:
+                    subscriber.queue.put_nowait(event)
+                except queue.Full:
+                    # Consumidor lento: se descarta y se reconecta con Last-Event-ID
+                    subscriber.dropped = True
+                    self._subscribers.discard(subscriber)
+
+    def subscribe(self, since=None):
+        """
+        Registra un cliente. Retorna (subscriber, resumed): si `since` es una
+        versión que el historial cubre, la cola ya trae los eventos posteriores
+        y resumed es True; si no, el cliente necesita una foto completa.
+        Si el proceso ya tiene max_clients clientes retorna (None, False).
+        """
+        subscriber = Subscriber(self.queue_size)
+        with self._lock:
+            if self.max_clients and len(self._subscribers) >= self.max_clients:
+                return None, False
+            backlog = self._backlog(since)
+            resumed = backlog is not None and len(backlog) < subscriber.queue.maxsize
+            if resumed:
+                for event in backlog:
+                    subscriber.queue.put_nowait(event)
+            self._subscribers.add(subscriber)
+        return subscriber, resumed
+
+    def poll(self, check, interval):
+        """
+        Ejecuta check() (p. ej. verificar la versión del índice contra la base
+        de datos) a lo sumo una vez cada `interval` segundos en el proceso,
+        sin importar cuántos clientes estén conectados
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._polled_at < interval:
+                return
+            self._polled_at = now
+        check()
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _backlog(self, since):
+        if since is None or self.version is None:
+            return None
+        if since == self.version:
+            return []
+        # Solo se reanuda desde un límite entre eventos: aplicar la diferencia
+        # de un evento a un estado intermedio podría omitir cambios
+        for index, event in enumerate(self._history):
+            if event['previous'] == since:
+                return list(self._history)[index:]
+        return None
+
+
+def format_event(data, event=None, event_id=None):
+    """Un evento en formato text/event-stream"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event is not None:
+        lines.append(f'event: {event}')
+    lines.append(f'data: {data}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def stream_events(subscriber, resumed, snapshot, poll, poll_interval, keepalive_interval):
+    """
+    Generador de la respuesta SSE de un cliente.
+
+    Sin reanudación, el primer evento es `snapshot` con todos los espacios
+    libres; los eventos en cola de versión menor o igual a la de la foto ya
+    están incluidos en ella y se omiten. Luego cada cambio es un evento
+    `occupancy` con id = versión. Cada `poll_interval` segundos sin eventos
+    se llama a poll() (detecta cambios de otros procesos) y cada
+    `keepalive_interval` se envía un comentario para mantener la conexión.
+    """
+    # Primer fragmento inmediato: los servidores WSGI envían los encabezados
+    # con él, y `retry` fija la espera del navegador antes de reconectarse
+    yield f'retry: {RECONNECT_DELAY_MS}\n\n'
+
+    last_version = None
+    if not resumed:
+        version, spaces = snapshot()
+        last_version = version
+        yield format_event(json.dumps({'version': version, 'spaces': spaces}, separators=(',', ':')), 'snapshot', version)
+
+    last_sent = time.monotonic()
+    while True:
+        try:
+            event = subscriber.queue.get(timeout=poll_interval)
+        except queue.Empty:
+            if subscriber.dropped:
+                return
+            poll()
+            if time.monotonic() - last_sent >= keepalive_interval:
+                last_sent = time.monotonic()
+                yield ': keepalive\n\n'
+            continue
+
+        if last_version is not None and event['version'] <= last_version:
+            continue
+        last_sent = time.monotonic()
+        yield format_event(event['data'], 'occupancy', event['version'])
+
+
+occupancy_broker = OccupancyBroker()
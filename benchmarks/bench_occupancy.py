@@ -0,0 +1,156 @@
+"""
+Benchmark: serie de ocupación (app/analytics.py) sobre muchas sesiones.
+
+Siembra --rows sesiones repartidas en --days días sobre --spaces espacios (la
+mitad archivadas, algunas activas) y calcula la ocupación de todo el período
+en intervalos de 15 minutos, en total y por piso. Reporta la mediana de
+--repeat corridas y el pico de memoria de Python (tracemalloc, incluye los
+arreglos NumPy), y verifica --check intervalos al azar contra conteos SQL
+minuto a minuto (lo que haría un cálculo ingenuo por intervalo).
+
+Uso:
+    python benchmarks/bench_occupancy.py
+    python benchmarks/bench_occupancy.py --rows 10000000 --days 365 --output resultados.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STEP = 15
+
+
+def seed(db, rows, days, spaces, chunk_size=200000):
+    """Inserta espacios y `rows` sesiones con executemany por bloques"""
+    from app.models.parking import ParkingSpace, Vehicle, ParkingSession, ParkingSessionHistory
+
+    base_time = datetime(2025, 1, 1)
+    db.session.execute(db.insert(ParkingSpace.__table__), [
+        {'id': i + 1, 'number': f'S{i}', 'floor': 1 + i % 5, 'is_occupied': False,
+         'space_type': 'regular', 'hourly_rate': 2000.0, 'created_at': base_time}
+        for i in range(spaces)
+    ])
+    db.session.execute(db.insert(Vehicle.__table__), [
+        {'id': 1, 'license_plate': 'BENCH1', 'vehicle_type': 'car', 'owner_name': 'Benchmark', 'created_at': base_time}
+    ])
+
+    rng = random.Random(42)
+    period = days * 86400
+    for chunk_start in range(0, rows, chunk_size):
+        live, archived = [], []
+        for i in range(chunk_start, min(rows, chunk_start + chunk_size)):
+            entry_time = base_time + timedelta(seconds=rng.randrange(period))
+            exit_time = entry_time + timedelta(seconds=rng.randrange(300, 6 * 3600))
+            session = {
+                'id': i + 1, 'vehicle_id': 1, 'space_id': 1 + i % spaces, 'entry_time': entry_time,
+                'exit_time': exit_time, 'total_hours': 1.0, 'total_cost': 2000.0, 'is_active': False,
+                'payment_status': 'paid', 'created_at': entry_time,
+            }
+            if i % 2:
+                archived.append(dict(session, archived_at=base_time))
+            else:
+                live.append(session)
+        db.session.execute(db.insert(ParkingSession.__table__), live)
+        db.session.execute(db.insert(ParkingSessionHistory.__table__), archived)
+        db.session.commit()
+    return base_time, base_time + timedelta(days=days)
+
+
+def measure(run, repeat):
+    """
+    Mediana en ms de `repeat` ejecuciones de run() y pico de memoria en MB de
+    una ejecución adicional (tracemalloc frena la asignación, así que no se
+    mide junto con el tiempo); retorna también el resultado
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    result = run()
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return statistics.median(times), peak, result
+
+
+def check(db, starts, series, samples):
+    """Compara intervalos al azar de la serie total con COUNT(*) por minuto en SQL"""
+    from app.models.parking import ParkingSession, ParkingSessionHistory
+
+    for index in random.Random(7).sample(range(len(starts)), samples):
+        counts = []
+        for minute in range(STEP):
+            t = datetime.fromisoformat(starts[index]) + timedelta(minutes=minute)
+            counts.append(sum(
+                db.session.scalar(db.select(db.func.count()).select_from(model).where(
+                    model.entry_time <= t, model.exit_time > t
+                ))
+                for model in (ParkingSession, ParkingSessionHistory)
+            ))
+        assert series[0]['peak'][index] == max(counts), f'intervalo {starts[index]}: pico distinto'
+        assert abs(series[0]['average'][index] - round(sum(counts) / STEP, 2)) < 1e-9, \
+            f'intervalo {starts[index]}: promedio distinto'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000, help='sesiones')
+    parser.add_argument('--days', type=int, default=90, help='días del período')
+    parser.add_argument('--spaces', type=int, default=2000, help='espacios')
+    parser.add_argument('--repeat', type=int, default=3, help='corridas por serie')
+    parser.add_argument('--check', type=int, default=5, help='intervalos verificados con SQL')
+    parser.add_argument('--output', help='archivo JSON donde guardar los resultados')
+    args = parser.parse_args()
+
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['CREATE_TABLES'] = '1'  # base temporal sin migraciones
+
+    from app import analytics, create_app, db
+
+    app = create_app('production')
+    results = []
+    try:
+        with app.app_context():
+            start_time = time.perf_counter()
+            start, end = seed(db, args.rows, args.days, args.spaces)
+            print(f'Siembra: {args.rows} sesiones en {time.perf_counter() - start_time:.1f} s', flush=True)
+
+            for by in (None, 'floor'):
+                ms, peak_mb, (starts, series) = measure(
+                    lambda: analytics.occupancy(start, end, STEP, by=by, now=end), args.repeat
+                )
+                if by is None:
+                    check(db, starts, series, min(args.check, len(starts)))
+                result = {
+                    'by': by,
+                    'rows': args.rows,
+                    'buckets': len(starts),
+                    'series': len(series),
+                    'ms': round(ms, 1),
+                    'peak_memory_mb': round(peak_mb, 1),
+                    'sessions_per_second': round(args.rows / (ms / 1000)),
+                }
+                results.append(result)
+                print(f"by={by or 'total':>5} | {args.rows} sesiones, {len(starts)} intervalos x {len(series)} series "
+                      f"| {result['ms']:9.1f} ms | memoria pico {result['peak_memory_mb']:6.1f} MB", flush=True)
+    finally:
+        os.close(db_fd)
+        os.unlink(db_path)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Benchmark: serialización de listados grandes, ORM + to_dict() + jsonify()
+contra proyección de columnas (app/serializers.py) + JSONEncoder reutilizado.
+
+Siembra --rows espacios, vehículos y sesiones (la mitad archivadas) y, para cada
+listado, arma la respuesta completa de ambas formas dentro de un contexto de
+petición. Verifica que los cuerpos sean idénticos byte a byte y reporta la
+mediana de --repeat corridas y la aceleración.
+
+Uso:
+    python benchmarks/bench_serialization.py
+    python benchmarks/bench_serialization.py --rows 100000 --repeat 5 --output resultados.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def seed(db, rows, chunk_size=50000):
+    """Inserta `rows` espacios, vehículos y sesiones con executemany por bloques"""
+    from app.models.parking import ParkingSpace, Vehicle, ParkingSession, ParkingSessionHistory
+
+    base_time = datetime(2024, 1, 1, 8, 0, 0)
+    for chunk_start in range(0, rows, chunk_size):
+        ids = range(chunk_start, min(rows, chunk_start + chunk_size))
+        db.session.execute(db.insert(ParkingSpace.__table__), [
+            {'id': i + 1, 'number': f'S{i}', 'floor': 1 + i % 5, 'is_occupied': i % 2 == 0,
+             'space_type': 'regular', 'hourly_rate': 2000.0 + i % 7 * 250.5,
+             'created_at': base_time + timedelta(seconds=i)}
+            for i in ids
+        ])
+        db.session.execute(db.insert(Vehicle.__table__), [
+            {'id': i + 1, 'license_plate': f'V{i:07d}', 'vehicle_type': 'car', 'owner_name': f'Dueño {i}',
+             'owner_phone': f'300{i:07d}' if i % 3 else None, 'created_at': base_time + timedelta(seconds=i)}
+            for i in ids
+        ])
+        sessions = []
+        for i in ids:
+            entry_time = base_time + timedelta(minutes=i, microseconds=i % 1000)
+            active = i % 2 == 0
+            sessions.append({
+                'id': i + 1, 'vehicle_id': i + 1, 'space_id': i + 1, 'entry_time': entry_time,
+                'exit_time': None if active else entry_time + timedelta(hours=2),
+                'total_hours': None if active else 2.0, 'total_cost': None if active else 4000.0,
+                'is_active': active, 'payment_status': 'pending' if active else 'paid',
+                'created_at': entry_time,
+            })
+        db.session.execute(db.insert(ParkingSession.__table__), [s for s in sessions if s['is_active']])
+        db.session.execute(db.insert(ParkingSessionHistory.__table__), [
+            dict(s, archived_at=base_time) for s in sessions if not s['is_active']
+        ])
+        db.session.commit()
+
+
+def measure(build, repeat, db):
+    """
+    Mediana en ms de `repeat` ejecuciones de build(); retorna (ms, cuerpo).
+    La sesión se descarta entre corridas para que el identity map no quede caliente.
+    """
+    times = []
+    body = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = build().get_data()
+        times.append((time.perf_counter() - start) * 1000)
+        db.session.remove()
+    return statistics.median(times), body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000, help='filas de cada tabla')
+    parser.add_argument('--repeat', type=int, default=3, help='corridas por listado')
+    parser.add_argument('--output', help='archivo JSON donde guardar los resultados')
+    args = parser.parse_args()
+
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['CREATE_TABLES'] = '1'  # base temporal sin migraciones
+
+    from flask import jsonify
+
+    from app import create_app, db
+    from app.models.parking import ParkingSpace, Vehicle, ParkingSession, ParkingSessionHistory
+    from app.serializers import (fast_json, session_projection, session_row, space_projection, space_row,
+                                 vehicle_projection, vehicle_row)
+
+    def orm_sessions():
+        sessions = (ParkingSession.query_with_relations().order_by(ParkingSession.id).all()
+                    + ParkingSessionHistory.query_with_relations().order_by(ParkingSessionHistory.id).all())
+        return sorted(sessions, key=lambda session: session.id)
+
+    def projected_sessions():
+        rows = (session_projection(ParkingSession).order_by(ParkingSession.id).all()
+                + session_projection(ParkingSessionHistory).order_by(ParkingSessionHistory.id).all())
+        return sorted(rows, key=lambda row: row.id)
+
+    listings = {
+        'spaces': (
+            lambda: jsonify([space.to_dict() for space in ParkingSpace.query.order_by(ParkingSpace.id)]),
+            lambda: fast_json.response([space_row(row) for row in space_projection().order_by(ParkingSpace.id)]),
+        ),
+        'vehicles': (
+            lambda: jsonify([vehicle.to_dict() for vehicle in Vehicle.query.order_by(Vehicle.id)]),
+            lambda: fast_json.response([vehicle_row(row) for row in vehicle_projection().order_by(Vehicle.id)]),
+        ),
+        'sessions': (
+            lambda: jsonify([session.to_dict() for session in orm_sessions()]),
+            lambda: fast_json.response([session_row(row) for row in projected_sessions()]),
+        ),
+    }
+
+    app = create_app('production')
+    results = []
+    try:
+        with app.app_context():
+            seed(db, args.rows)
+
+        for name, (orm_build, projected_build) in listings.items():
+            with app.test_request_context():
+                orm_ms, orm_body = measure(orm_build, args.repeat, db)
+                projected_ms, projected_body = measure(projected_build, args.repeat, db)
+
+            assert orm_body == projected_body, f'{name}: los cuerpos no son idénticos'
+            result = {
+                'listing': name,
+                'rows': args.rows,
+                'bytes': len(orm_body),
+                'orm_ms': round(orm_ms, 1),
+                'projection_ms': round(projected_ms, 1),
+                'speedup': round(orm_ms / projected_ms, 2),
+            }
+            results.append(result)
+            print(f"{name:>9} | {args.rows} filas, {result['bytes'] / 1e6:6.1f} MB | ORM {result['orm_ms']:9.1f} ms "
+                  f"| proyección {result['projection_ms']:9.1f} ms | x{result['speedup']:.2f}", flush=True)
+    finally:
+        os.close(db_fd)
+        os.unlink(db_path)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+Benchmark: latencia de entrada/salida a medida que crece el historial de sesiones.
+
+Llena la tabla parking_sessions con sesiones cerradas hasta cada tamaño pedido
+y mide la latencia de POST /api/sessions/entry y POST /api/sessions/exit.
+Con los índices de ParkingSession la latencia debe
+mantenerse plana; con --without-indexes se eliminan para comparar.
+
+Uso:
+    python benchmarks/bench_session_history.py
+    python benchmarks/bench_session_history.py --sizes 0 100000 1000000 --cycles 500
+    python benchmarks/bench_session_history.py --without-indexes
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SESSION_INDEXES = [
+    'uq_parking_sessions_active_vehicle',
+    'uq_parking_sessions_active_space',
+    'ix_parking_sessions_vehicle',
+    'ix_parking_sessions_space',
+    'ix_parking_sessions_active',
+]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def seed_history(db, ParkingSession, start, end, spaces, vehicles, chunk_size=50000):
+    """Inserta sesiones cerradas con ids [start, end) usando executemany por bloques"""
+    base_time = datetime(2020, 1, 1)
+    for chunk_start in range(start, end, chunk_size):
+        rows = []
+        for i in range(chunk_start, min(end, chunk_start + chunk_size)):
+            entry_time = base_time + timedelta(minutes=i)
+            rows.append({
+                'vehicle_id': vehicles[i % len(vehicles)],
+                'space_id': spaces[i % len(spaces)],
+                'entry_time': entry_time,
+                'exit_time': entry_time + timedelta(hours=2),
+                'total_hours': 2.0,
+                'total_cost': 4000.0,
+                'is_active': False,
+                'payment_status': 'paid',
+                'created_at': entry_time,
+            })
+        db.session.execute(db.insert(ParkingSession.__table__), rows)
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[0, 10000, 100000, 1000000],
+                        help='tamaños del historial a medir (sesiones cerradas)')
+    parser.add_argument('--cycles', type=int, default=200, help='pares entrada/salida por tamaño')
+    parser.add_argument('--without-indexes', action='store_true', help='eliminar los índices de sesiones')
+    parser.add_argument('--output', help='archivo JSON donde guardar los resultados')
+    args = parser.parse_args()
+
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['CREATE_TABLES'] = '1'  # base temporal sin migraciones
+
+    from app import create_app, db
+    from app.models.parking import ParkingSpace, Vehicle, ParkingSession
+
+    app = create_app('production')
+    results = []
+    try:
+        with app.app_context():
+            if args.without_indexes:
+                for name in SESSION_INDEXES:
+                    db.session.execute(db.text(f'DROP INDEX IF EXISTS {name}'))
+                db.session.commit()
+
+            # Espacios y vehículos del historial
+            db.session.execute(db.insert(ParkingSpace.__table__), [
+                {'number': f'H{i}', 'floor': 1 + i % 5, 'is_occupied': False, 'space_type': 'regular',
+                 'hourly_rate': 2000.0, 'created_at': datetime.utcnow()}
+                for i in range(500)
+            ])
+            db.session.execute(db.insert(Vehicle.__table__), [
+                {'license_plate': f'H{i:07d}', 'vehicle_type': 'car', 'owner_name': 'Histórico',
+                 'created_at': datetime.utcnow()}
+                for i in range(50000)
+            ])
+            db.session.commit()
+            spaces = [row[0] for row in db.session.execute(db.select(ParkingSpace.id))]
+            vehicles = [row[0] for row in db.session.execute(db.select(Vehicle.id))]
+
+        from app.space_index import space_index
+        with app.app_context():
+            space_index.rebuild()
+
+        client = app.test_client()
+        seeded = 0
+        for size in sorted(args.sizes):
+            with app.app_context():
+                seed_history(db, ParkingSession, seeded, size, spaces, vehicles)
+                seeded = max(seeded, size)
+                db.session.execute(db.text('ANALYZE'))
+                db.session.commit()
+
+            entry_times = []
+            exit_times = []
+            for cycle in range(args.cycles):
+                plate = vehicles[cycle % len(vehicles)]
+                body = {'license_plate': f'H{plate - vehicles[0]:07d}', 'space_id': spaces[cycle % len(spaces)]}
+
+                start = time.perf_counter()
+                response = client.post('/api/sessions/entry', json=body)
+                entry_times.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 201, response.data
+
+                start = time.perf_counter()
+                response = client.post('/api/sessions/exit', json={'license_plate': body['license_plate']})
+                exit_times.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, response.data
+
+            result = {
+                'history_sessions': size,
+                'entry_p50_ms': round(statistics.median(entry_times), 3),
+                'entry_p95_ms': round(percentile(entry_times, 95), 3),
+                'exit_p50_ms': round(statistics.median(exit_times), 3),
+                'exit_p95_ms': round(percentile(exit_times, 95), 3),
+            }
+            results.append(result)
+            print(f"{size:>10} sesiones | entrada p50 {result['entry_p50_ms']:8.3f} ms "
+                  f"p95 {result['entry_p95_ms']:8.3f} ms | salida p50 {result['exit_p50_ms']:8.3f} ms "
+                  f"p95 {result['exit_p95_ms']:8.3f} ms", flush=True)
+    finally:
+        os.close(db_fd)
+        os.unlink(db_path)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'indexes': not args.without_indexes, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
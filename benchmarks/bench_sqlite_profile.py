@@ -0,0 +1,209 @@
+"""
+Benchmark: rendimiento mixto de lectura/escritura con y sin el perfil de producción de SQLite.
+
+Corre el mismo trabajo dos veces sobre bases de datos nuevas:
+  - baseline: journal en modo rollback (DELETE), sin PRAGMAs ni pool configurado
+    (la configuración original)
+  - production: perfil de producción (WAL, synchronous=NORMAL, busy_timeout,
+    mmap_size y tamaño de pool)
+
+Durante `--duration` segundos, `--writers` hilos registran entradas y salidas
+mientras `--readers` hilos consultan /api/stats, /api/sessions/active y
+/api/sessions como lo haría un tablero. Se reportan operaciones por segundo,
+latencias p50/p95 y errores por tipo de operación.
+
+Uso:
+    python benchmarks/bench_sqlite_profile.py
+    python benchmarks/bench_sqlite_profile.py --duration 30 --writers 4 --readers 8
+    python benchmarks/bench_sqlite_profile.py --echo-baseline --output resultados.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+READ_URLS = ['/api/stats', '/api/sessions/active?limit=50', '/api/sessions?limit=100']
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def seed(db, counters, ParkingSpace, Vehicle, ParkingSession, writers, history):
+    """Un espacio y un vehículo por escritor, más un historial de sesiones cerradas"""
+    now = datetime.utcnow()
+    db.session.execute(db.insert(ParkingSpace.__table__), [
+        {'number': f'B{i}', 'floor': 1 + i % 5, 'is_occupied': False, 'space_type': 'regular',
+         'hourly_rate': 2000.0, 'created_at': now}
+        for i in range(max(writers, 50))
+    ])
+    db.session.execute(db.insert(Vehicle.__table__), [
+        {'license_plate': f'BEN{i:04d}', 'vehicle_type': 'car', 'owner_name': 'Benchmark', 'created_at': now}
+        for i in range(max(writers, 50))
+    ])
+    spaces = [row[0] for row in db.session.execute(db.select(ParkingSpace.id).order_by(ParkingSpace.id))]
+    vehicles = [row[0] for row in db.session.execute(db.select(Vehicle.id).order_by(Vehicle.id))]
+    counters.adjust(total_spaces=len(spaces), total_vehicles=len(vehicles))
+
+    rows = []
+    for i in range(history):
+        entry_time = now - timedelta(days=30, minutes=i)
+        rows.append({
+            'vehicle_id': vehicles[i % len(vehicles)],
+            'space_id': spaces[i % len(spaces)],
+            'entry_time': entry_time,
+            'exit_time': entry_time + timedelta(hours=2),
+            'total_hours': 2.0,
+            'total_cost': 4000.0,
+            'is_active': False,
+            'payment_status': 'paid',
+            'created_at': entry_time,
+        })
+    if rows:
+        db.session.execute(db.insert(ParkingSession.__table__), rows)
+    db.session.commit()
+    return spaces
+
+
+def run_workload(app, spaces, writers, readers, duration):
+    """Ejecuta escritores y lectores en paralelo; retorna latencias y errores por operación"""
+    results = {'write': [], 'read': []}
+    errors = {'write': 0, 'read': 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def record(kind, elapsed, ok):
+        with lock:
+            results[kind].append(elapsed)
+            if not ok:
+                errors[kind] += 1
+
+    def writer(index):
+        client = app.test_client()
+        body = {'license_plate': f'BEN{index:04d}', 'space_id': spaces[index]}
+        while not stop.is_set():
+            for url, payload in [('/api/sessions/entry', body), ('/api/sessions/exit', {'license_plate': body['license_plate']})]:
+                start = time.perf_counter()
+                try:
+                    response = client.post(url, json=payload)
+                    ok = response.status_code < 500
+                except Exception:
+                    ok = False
+                record('write', time.perf_counter() - start, ok)
+
+    def reader(index):
+        client = app.test_client()
+        count = 0
+        while not stop.is_set():
+            url = READ_URLS[(index + count) % len(READ_URLS)]
+            count += 1
+            start = time.perf_counter()
+            try:
+                ok = client.get(url).status_code < 500
+            except Exception:
+                ok = False
+            record('read', time.perf_counter() - start, ok)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    summary = {}
+    for kind, latencies in results.items():
+        summary[kind] = {
+            'ops': len(latencies),
+            'ops_per_second': round(len(latencies) / duration, 1),
+            'errors': errors[kind],
+            'p50_ms': round(statistics.median(latencies) * 1000, 2) if latencies else None,
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        }
+    return summary
+
+
+def run_profile(name, args):
+    from app import counters, create_app, db
+    from app.config import ProductionConfig
+    from app.models.parking import ParkingSpace, Vehicle, ParkingSession
+    from app.space_index import space_index
+
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(db_fd)
+
+    original = {
+        'SQLALCHEMY_DATABASE_URI': ProductionConfig.SQLALCHEMY_DATABASE_URI,
+        'SQLITE_PRAGMAS': ProductionConfig.SQLITE_PRAGMAS,
+        'SQLALCHEMY_ENGINE_OPTIONS': ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS,
+        'SQLALCHEMY_ECHO': ProductionConfig.SQLALCHEMY_ECHO,
+        'CREATE_TABLES': ProductionConfig.CREATE_TABLES,
+    }
+    ProductionConfig.SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+    ProductionConfig.CREATE_TABLES = True
+    if name == 'baseline':
+        ProductionConfig.SQLITE_PRAGMAS = {'journal_mode': 'DELETE'}
+        ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS = {}
+        ProductionConfig.SQLALCHEMY_ECHO = args.echo_baseline
+
+    # El eco de SQL se escribe en stdout: se descarta para no mezclarlo con el reporte
+    stdout = sys.stdout
+    if ProductionConfig.SQLALCHEMY_ECHO:
+        sys.stdout = open(os.devnull, 'w')
+    try:
+        app = create_app('production')
+        with app.app_context():
+            spaces = seed(db, counters, ParkingSpace, Vehicle, ParkingSession, args.writers, args.history)
+            space_index.rebuild()
+        summary = run_workload(app, spaces, args.writers, args.readers, args.duration)
+        with app.app_context():
+            db.engine.dispose()
+    finally:
+        if sys.stdout is not stdout:
+            sys.stdout.close()
+            sys.stdout = stdout
+        for key, value in original.items():
+            setattr(ProductionConfig, key, value)
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.unlink(db_path + suffix)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=10.0, help='segundos de carga por perfil')
+    parser.add_argument('--writers', type=int, default=4, help='hilos que registran entradas y salidas')
+    parser.add_argument('--readers', type=int, default=8, help='hilos que consultan el tablero')
+    parser.add_argument('--history', type=int, default=20000, help='sesiones cerradas en el historial')
+    parser.add_argument('--echo-baseline', action='store_true',
+                        help='incluir en el baseline el eco de SQL (SQLALCHEMY_ECHO = True original)')
+    parser.add_argument('--output', help='archivo JSON donde guardar los resultados')
+    args = parser.parse_args()
+
+    results = {}
+    for name in ('baseline', 'production'):
+        results[name] = summary = run_profile(name, args)
+        for kind in ('write', 'read'):
+            row = summary[kind]
+            print(f"{name:>10} {kind:>5}: {row['ops_per_second']:>8} ops/s  "
+                  f"p50={row['p50_ms']} ms  p95={row['p95_ms']} ms  errores={row['errors']}")
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'args': vars(args), 'results': results}, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""
+Prueba de carga local: peticiones por segundo según el número de workers de gunicorn.
+
+Para cada valor de --workers levanta `gunicorn -c gunicorn.conf.py wsgi:app`
+sobre una base de datos temporal con el perfil de producción, carga espacios y
+vehículos con los endpoints de importación y lanza --clients procesos cliente
+con conexiones keep-alive durante --duration segundos. La mezcla es la de un
+tablero (espacios disponibles, estadísticas, consultas por id) más entradas y
+salidas con --write-ratio. Con más workers las peticiones por segundo deben
+crecer hasta el número de núcleos de la máquina.
+
+Uso:
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --workers 1 2 4 8 --threads 4 --clients 8 --duration 20
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+READ_PATHS = ['/api/spaces/available?limit=50', '/api/stats', '/api/spaces/{space_id}', '/api/vehicles/LOAD{vehicle:05d}']
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            connection.request('GET', '/api/test')
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('gunicorn no respondió a tiempo')
+
+
+def seed(port, spaces, vehicles):
+    """Carga espacios y vehículos con los endpoints de importación masiva"""
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    body = 'number,floor\n' + ''.join(f'L{i},{1 + i % 5}\n' for i in range(spaces))
+    connection.request('POST', '/api/spaces/import', body, {'Content-Type': 'text/csv'})
+    connection.getresponse().read()
+    body = ''.join(
+        json.dumps({'license_plate': f'LOAD{i:05d}', 'vehicle_type': 'car', 'owner_name': 'Carga'}) + '\n'
+        for i in range(vehicles)
+    )
+    connection.request('POST', '/api/vehicles/import', body, {'Content-Type': 'application/x-ndjson'})
+    connection.getresponse().read()
+
+
+def client(args):
+    """Proceso cliente: hace peticiones hasta `deadline` y retorna sus latencias"""
+    port, deadline, client_index, clients, spaces, vehicles, write_ratio = args
+    rng = random.Random(client_index)
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    latencies = []
+    errors = 0
+    # Cada cliente usa sus propios vehículos para las entradas y salidas
+    own_vehicles = list(range(client_index, vehicles, clients))
+    parked = []
+
+    while time.time() < deadline:
+        if (own_vehicles or parked) and rng.random() < write_ratio:
+            if parked and (rng.random() < 0.5 or not own_vehicles):
+                plate = parked.pop()
+                method, path, body = 'POST', '/api/sessions/exit', {'license_plate': plate}
+            else:
+                plate = f'LOAD{own_vehicles.pop():05d}'
+                parked.append(plate)
+                method, path, body = 'POST', '/api/sessions/entry', {'license_plate': plate}
+            body = json.dumps(body)
+            headers = {'Content-Type': 'application/json'}
+        else:
+            path = rng.choice(READ_PATHS).format(space_id=rng.randint(1, spaces), vehicle=rng.randrange(vehicles))
+            method, body, headers = 'GET', None, {}
+
+        start = time.perf_counter()
+        try:
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 500:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        latencies.append(time.perf_counter() - start)
+
+    return latencies, errors
+
+
+def run(workers, args):
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(db_fd)
+    port = free_port()
+    env = dict(
+        os.environ,
+        FLASK_ENV='production',
+        DATABASE_URL=f'sqlite:///{db_path}',
+        CREATE_TABLES='1',
+        COUNTER_RECONCILE_INTERVAL='0',
+        WEB_CONCURRENCY=str(workers),
+        GUNICORN_THREADS=str(args.threads),
+        BIND=f'127.0.0.1:{port}',
+        GUNICORN_ACCESS_LOG='',
+        GUNICORN_LOG_LEVEL='warning',
+    )
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'], cwd=ROOT, env=env)
+    try:
+        wait_until_ready(port)
+        seed(port, args.spaces, args.vehicles)
+
+        deadline = time.time() + args.duration
+        jobs = [(port, deadline, i, args.clients, args.spaces, args.vehicles, args.write_ratio) for i in range(args.clients)]
+        with multiprocessing.Pool(args.clients) as pool:
+            results = pool.map(client, jobs)
+    finally:
+        # SIGTERM: apagado ordenado de gunicorn
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.unlink(db_path + suffix)
+
+    latencies = [latency for client_latencies, _ in results for latency in client_latencies]
+    return {
+        'workers': workers,
+        'threads': args.threads,
+        'requests': len(latencies),
+        'requests_per_second': round(len(latencies) / args.duration, 1),
+        'errors': sum(errors for _, errors in results),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+    }
+
+
+def main():
+    cores = multiprocessing.cpu_count()
+    default_workers = sorted({1, 2, 4, cores} & set(range(1, cores + 1))) or [1]
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=default_workers, help='número de workers a medir')
+    parser.add_argument('--threads', type=int, default=4, help='hilos por worker')
+    parser.add_argument('--clients', type=int, default=max(4, cores), help='procesos cliente concurrentes')
+    parser.add_argument('--duration', type=float, default=10.0, help='segundos de carga por configuración')
+    parser.add_argument('--spaces', type=int, default=2000, help='espacios cargados antes de medir')
+    parser.add_argument('--vehicles', type=int, default=20000, help='vehículos cargados antes de medir')
+    parser.add_argument('--write-ratio', type=float, default=0.1, help='fracción de entradas/salidas')
+    parser.add_argument('--output', help='archivo JSON donde guardar los resultados')
+    args = parser.parse_args()
+
+    print(f'Núcleos disponibles: {cores}')
+    results = []
+    for workers in args.workers:
+        result = run(workers, args)
+        results.append(result)
+        print(f"workers={result['workers']:>2} threads={result['threads']}: "
+              f"{result['requests_per_second']:>8} req/s  p50={result['p50_ms']} ms  "
+              f"p95={result['p95_ms']} ms  errores={result['errors']}")
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'cores': cores, 'args': vars(args), 'results': results}, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
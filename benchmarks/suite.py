@@ -0,0 +1,355 @@
+"""
+Suite de benchmarks de las rutas críticas del parking.
+
+Siembra un volumen de datos realista (por defecto 10k espacios, 1M de
+vehículos y 10M de sesiones en el historial; --scale lo reduce para corridas
+rápidas), levanta la aplicación con gunicorn y mide rendimiento y latencias
+p50/p95/p99 de:
+
+    vehicle_entry          POST /api/sessions/entry (asignación automática)
+    vehicle_exit           POST /api/sessions/exit
+    get_available_spaces   GET  /api/spaces/available
+    get_statistics         GET  /api/stats
+    get_all_sessions       GET  /api/sessions?limit=50&after=<cursor aleatorio>
+
+cada una con un solo cliente y con --clients clientes concurrentes. Los
+resultados se guardan en JSON (por defecto en benchmarks/results/) junto con
+el commit, la versión de Python/SQLite y los parámetros, para comparar
+corridas con --compare.
+
+La base sembrada se reutiliza entre corridas si se pasa --db con los mismos
+tamaños y semilla (sembrar 10M de sesiones toma varios minutos).
+
+Uso:
+    python benchmarks/suite.py --scale 0.01
+    python benchmarks/suite.py --db /tmp/parking-bench.db --clients 8 --workers 4
+    python benchmarks/suite.py --scale 0.01 --compare benchmarks/results/anterior.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import signal
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from load_test import free_port, percentile, wait_until_ready  # noqa: E402
+
+SCENARIOS = ['vehicle_entry', 'vehicle_exit', 'get_available_spaces', 'get_statistics', 'get_all_sessions']
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'  # formato de DateTime de SQLAlchemy en SQLite
+SEED_CHUNK = 100000
+
+
+# ============ SIEMBRA ============
+
+def seed_database(db_path, spaces, vehicles, sessions, occupancy, seed):
+    """Crea el esquema con create_app y lo llena con executemany por bloques"""
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['CREATE_TABLES'] = '1'  # base temporal sin migraciones
+    os.environ['COUNTER_RECONCILE_INTERVAL'] = '0'
+    from app import create_app
+
+    # El esquema (tablas e índices) se crea con la aplicación
+    create_app('production')
+
+    rng = random.Random(seed)
+    connection = sqlite3.connect(db_path)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=OFF')
+    now = datetime.utcnow()
+    created = now.strftime(DATETIME_FORMAT)
+
+    space_types = ['regular'] * 85 + ['electric'] * 10 + ['disabled'] * 5
+    connection.executemany(
+        'INSERT INTO parking_spaces (id, number, floor, is_occupied, space_type, hourly_rate, created_at) '
+        'VALUES (?, ?, ?, 0, ?, ?, ?)',
+        [(i + 1, f'S{i:05d}', 1 + i % 10, rng.choice(space_types), rng.choice([2000.0, 2500.0, 3000.0]), created)
+         for i in range(spaces)]
+    )
+
+    vehicle_types = ['car'] * 80 + ['motorcycle'] * 15 + ['electric'] * 5
+    for start in range(0, vehicles, SEED_CHUNK):
+        connection.executemany(
+            'INSERT INTO vehicles (id, license_plate, vehicle_type, owner_name, owner_phone, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            [(i + 1, f'V{i:07d}', rng.choice(vehicle_types), f'Propietario {i}', f'300{i:07d}', created)
+             for i in range(start, min(vehicles, start + SEED_CHUNK))]
+        )
+        connection.commit()
+
+    # Historial: sesiones cerradas repartidas en el último año
+    columns = ('vehicle_id, space_id, entry_time, exit_time, total_hours, total_cost, '
+               'is_active, payment_status, created_at')
+    for start in range(0, sessions, SEED_CHUNK):
+        rows = []
+        for _ in range(start, min(sessions, start + SEED_CHUNK)):
+            entry_time = now - timedelta(minutes=rng.randrange(365 * 24 * 60))
+            hours = round(rng.uniform(0.25, 10), 2)
+            exit_time = entry_time + timedelta(hours=hours)
+            rows.append((
+                rng.randrange(vehicles) + 1, rng.randrange(spaces) + 1,
+                entry_time.strftime(DATETIME_FORMAT), exit_time.strftime(DATETIME_FORMAT),
+                hours, round(hours * 2500, 2), 0, 'paid' if rng.random() < 0.9 else 'pending',
+                entry_time.strftime(DATETIME_FORMAT)
+            ))
+        connection.executemany(f'INSERT INTO parking_sessions ({columns}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        connection.commit()
+
+    # Sesiones activas: los primeros vehículos ocupan `occupancy` de los espacios
+    active = int(spaces * occupancy)
+    occupied = rng.sample(range(1, spaces + 1), active)
+    connection.executemany(
+        f'INSERT INTO parking_sessions ({columns}) VALUES (?, ?, ?, NULL, NULL, NULL, 1, ?, ?)',
+        [(i + 1, space_id, (now - timedelta(minutes=rng.randrange(600))).strftime(DATETIME_FORMAT), 'pending', created)
+         for i, space_id in enumerate(occupied)]
+    )
+    connection.executemany('UPDATE parking_spaces SET is_occupied = 1 WHERE id = ?', [(space_id,) for space_id in occupied])
+    connection.commit()
+    connection.execute('ANALYZE')
+    connection.close()
+
+    # Contadores de /api/stats consistentes con los datos sembrados
+    app = create_app('production')
+    from app import counters
+    with app.app_context():
+        counters.reconcile()
+
+
+def prepare_database(args):
+    params = {
+        'spaces': int(10000 * args.scale), 'vehicles': int(1000000 * args.scale),
+        'sessions': int(10000000 * args.scale), 'occupancy': args.occupancy, 'seed': args.seed,
+    }
+    db_path = args.db or tempfile.mkstemp(suffix='.db')[1]
+    meta_path = db_path + '.seed.json'
+
+    if args.db and os.path.exists(db_path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            if json.load(f) == params:
+                print(f'Reutilizando base sembrada: {db_path}', flush=True)
+                return db_path, params
+    for suffix in ('', '-wal', '-shm', '.seed.json'):
+        if os.path.exists(db_path + suffix):
+            os.unlink(db_path + suffix)
+
+    print(f"Sembrando {params['spaces']} espacios, {params['vehicles']} vehículos y "
+          f"{params['sessions']} sesiones...", flush=True)
+    start = time.perf_counter()
+    # En un proceso aparte: la siembra no debe dejar conexiones abiertas en este
+    process = multiprocessing.Process(target=seed_database, args=(
+        db_path, params['spaces'], params['vehicles'], params['sessions'], params['occupancy'], params['seed']))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        raise RuntimeError('La siembra falló')
+    with open(meta_path, 'w') as f:
+        json.dump(params, f)
+    print(f'Siembra completa en {time.perf_counter() - start:.1f} s', flush=True)
+    return db_path, params
+
+
+# ============ ESCENARIOS ============
+
+def encode_cursor(key):
+    from app.pagination import encode_cursor as encode
+    return encode(key)
+
+
+def build_request(scenario, vehicle_index, params, rng):
+    """(método, ruta, cuerpo JSON) de una petición del escenario"""
+    if scenario == 'vehicle_entry':
+        return 'POST', '/api/sessions/entry', {'license_plate': f'V{vehicle_index:07d}'}
+    if scenario == 'vehicle_exit':
+        return 'POST', '/api/sessions/exit', {'license_plate': f'V{vehicle_index:07d}'}
+    if scenario == 'get_available_spaces':
+        return 'GET', '/api/spaces/available', None
+    if scenario == 'get_statistics':
+        return 'GET', '/api/stats', None
+    cursor = encode_cursor(rng.randrange(max(params['sessions'], 1)))
+    return 'GET', f'/api/sessions?limit=50&after={cursor}', None
+
+
+def client(job):
+    """Proceso cliente: ejecuta sus peticiones del escenario y retorna latencias y errores"""
+    import http.client
+
+    port, scenario, params, vehicle_indexes, requests, seed = job
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    latencies = []
+    errors = 0
+    for i in range(requests):
+        vehicle_index = vehicle_indexes[i % len(vehicle_indexes)] if vehicle_indexes else None
+        method, path, body = build_request(scenario, vehicle_index, params, rng)
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        start = time.perf_counter()
+        try:
+            connection.request(method, path, json.dumps(body) if body is not None else None, headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors += 1
+        except OSError:
+            errors += 1
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        latencies.append(time.perf_counter() - start)
+    return latencies, errors
+
+
+def run_scenario(port, scenario, params, clients, requests, vehicle_pool):
+    """Reparte las peticiones entre `clients` procesos; retorna las métricas del escenario"""
+    per_client = max(1, requests // clients)
+    jobs = []
+    for index in range(clients):
+        # Entradas y salidas: cada cliente con sus propios vehículos
+        vehicles = vehicle_pool[index * per_client:(index + 1) * per_client] if scenario in ('vehicle_entry', 'vehicle_exit') else None
+        jobs.append((port, scenario, params, vehicles, per_client, index))
+
+    start = time.perf_counter()
+    if clients == 1:
+        results = [client(jobs[0])]
+    else:
+        with multiprocessing.Pool(clients) as pool:
+            results = pool.map(client, jobs)
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency * 1000 for latencies, _ in results for latency in latencies]
+    return {
+        'clients': clients,
+        'requests': len(latencies),
+        'errors': sum(errors for _, errors in results),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+    }
+
+
+def run_suite(db_path, params, args):
+    port = free_port()
+    env = dict(
+        os.environ,
+        FLASK_ENV='production',
+        DATABASE_URL=f'sqlite:///{db_path}',
+        COUNTER_RECONCILE_INTERVAL='0',
+        SLOW_QUERY_THRESHOLD_MS='-1',
+        BIND=f'127.0.0.1:{port}',
+        GUNICORN_ACCESS_LOG='',
+        GUNICORN_LOG_LEVEL='warning',
+    )
+    if args.workers:
+        env['WEB_CONCURRENCY'] = str(args.workers)
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'], cwd=ROOT, env=env)
+
+    # Vehículos sin sesión activa (los últimos) para entradas y salidas; se
+    # limitan a la mitad de los espacios libres para no agotarlos
+    free_spaces = params['spaces'] - int(params['spaces'] * params['occupancy'])
+    entries = min(args.requests, free_spaces // 2)
+
+    results = {}
+    try:
+        wait_until_ready(port, timeout=600)
+        for mode, clients in (('single', 1), ('concurrent', args.clients)):
+            rng = random.Random(args.seed + clients)
+            vehicle_pool = rng.sample(range(int(params['vehicles'] * 0.5), params['vehicles']), entries)
+            for scenario in args.scenarios:
+                requests = entries if scenario in ('vehicle_entry', 'vehicle_exit') else args.requests
+                # Calentamiento sin medir (cachés de SQLite y del índice de espacios)
+                if scenario not in ('vehicle_entry', 'vehicle_exit'):
+                    run_scenario(port, scenario, params, 1, min(20, requests), vehicle_pool)
+                result = run_scenario(port, scenario, params, clients, requests, vehicle_pool)
+                results.setdefault(scenario, {})[mode] = result
+                print(f"{scenario:>22} {mode:>10} ({clients:>2} clientes): {result['throughput_rps']:>9} req/s  "
+                      f"p50 {result['p50_ms']:>8} ms  p95 {result['p95_ms']:>8} ms  "
+                      f"p99 {result['p99_ms']:>8} ms  errores {result['errors']}", flush=True)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+    return results
+
+
+# ============ REPORTE ============
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """Imprime la variación de rendimiento y p95 frente a una corrida anterior"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+    print(f'\nComparación con {baseline_path}:')
+    for scenario, modes in results.items():
+        for mode, result in modes.items():
+            previous = baseline.get(scenario, {}).get(mode)
+            if not previous:
+                continue
+            throughput = (result['throughput_rps'] / previous['throughput_rps'] - 1) * 100 if previous['throughput_rps'] else 0
+            p95 = (result['p95_ms'] / previous['p95_ms'] - 1) * 100 if previous['p95_ms'] else 0
+            print(f'{scenario:>22} {mode:>10}: req/s {throughput:+7.1f}%  p95 {p95:+7.1f}%')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='fracción del volumen por defecto (10k espacios, 1M vehículos, 10M sesiones)')
+    parser.add_argument('--occupancy', type=float, default=0.6, help='fracción de espacios ocupados al iniciar')
+    parser.add_argument('--seed', type=int, default=42, help='semilla de los datos y de las peticiones')
+    parser.add_argument('--db', help='archivo de base de datos sembrada a reutilizar entre corridas')
+    parser.add_argument('--requests', type=int, default=1000, help='peticiones medidas por escenario y modo')
+    parser.add_argument('--clients', type=int, default=max(4, multiprocessing.cpu_count()), help='clientes concurrentes')
+    parser.add_argument('--workers', type=int, help='workers de gunicorn (por defecto los de gunicorn.conf.py)')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS, help='escenarios a medir')
+    parser.add_argument('--output', help='archivo JSON de resultados (por defecto benchmarks/results/<fecha>-<commit>.json)')
+    parser.add_argument('--compare', help='JSON de una corrida anterior con el que comparar')
+    args = parser.parse_args()
+
+    db_path, params = prepare_database(args)
+    try:
+        results = run_suite(db_path, params, args)
+    finally:
+        if not args.db:
+            for suffix in ('', '-wal', '-shm', '.seed.json'):
+                if os.path.exists(db_path + suffix):
+                    os.unlink(db_path + suffix)
+
+    commit = git_commit()
+    report = {
+        'timestamp': datetime.utcnow().isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpu_count': multiprocessing.cpu_count(),
+        'data': params,
+        'args': {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'db')},
+        'results': results,
+    }
+    output = args.output or os.path.join(
+        ROOT, 'benchmarks', 'results', f"{datetime.utcnow():%Y%m%dT%H%M%S}-{commit or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'\nResultados guardados en {output}')
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
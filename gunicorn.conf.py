@@ -0,0 +1,72 @@
+"""
+Configuración de gunicorn para producción.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Todos los valores se pueden ajustar con variables de entorno.
+"""
+import glob
+import multiprocessing
+import os
+import tempfile
+
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', 5001)}")
+
+# Procesos worker y hilos por worker. Cada worker es un proceso independiente
+# (escala con los núcleos); los hilos cubren la espera de E/S dentro de cada uno
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+worker_class = 'gthread'
+
+# Cada stream de ocupación (/api/spaces/stream) ocupa un hilo mientras está
+# conectado, aunque casi siempre esperando, sin CPU ni conexión a la base de
+# datos. GUNICORN_API_THREADS hilos por worker quedan reservados para el resto
+# de la API; salvo que se indique, los demás se pueden ocupar con streams
+api_threads = int(os.environ.get('GUNICORN_API_THREADS', 4))
+os.environ.setdefault('STREAM_MAX_CLIENTS', str(max(threads - api_threads, 1)))
+
+# La aplicación se crea una sola vez en el proceso maestro (esquema, índice de
+# espacios libres, reconciliación inicial) y los workers la heredan con fork
+preload_app = True
+
+# Apagado ordenado: ante SIGTERM los workers terminan las peticiones en curso
+# durante graceful_timeout segundos antes de salir
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+keepalive = 5
+
+# Reciclar workers de vez en cuando para acotar el crecimiento de memoria
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+# Métricas de Prometheus compartidas entre workers (prometheus_client en modo
+# multiproceso): cada proceso escribe sus valores en este directorio y /metrics
+# los suma. Debe definirse antes de cargar la aplicación; al arrancar se borran
+# los archivos de una ejecución anterior
+metrics_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'parking-metrics'))
+os.makedirs(metrics_dir, exist_ok=True)
+for path in glob.glob(os.path.join(metrics_dir, '*.db')):
+    os.remove(path)
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None  # vacío = desactivado
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    # Las conexiones del pool se abrieron en el maestro: compartirlas entre
+    # procesos corrompe la base de datos, así que cada worker abre las suyas.
+    # El hilo de reconciliación de contadores no sobrevive al fork y sigue
+    # corriendo solo en el maestro, una vez para todos los workers.
+    from app.engine import dispose_engines
+    from wsgi import app
+
+    dispose_engines(app)
+
+
+def child_exit(server, worker):
+    # Los contadores e histogramas del worker que terminó (p. ej. reciclado por
+    # max_requests) se siguen sumando; solo se descartan sus gauges en vivo
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
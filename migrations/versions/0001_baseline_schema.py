@@ -0,0 +1,61 @@
+"""baseline schema
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 06:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('parking_spaces',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('number', sa.String(length=10), nullable=False),
+    sa.Column('floor', sa.Integer(), nullable=False),
+    sa.Column('is_occupied', sa.Boolean(), nullable=False),
+    sa.Column('space_type', sa.String(length=20), nullable=False),
+    sa.Column('hourly_rate', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('number')
+    )
+    op.create_table('vehicles',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('license_plate', sa.String(length=10), nullable=False),
+    sa.Column('vehicle_type', sa.String(length=20), nullable=False),
+    sa.Column('owner_name', sa.String(length=100), nullable=False),
+    sa.Column('owner_phone', sa.String(length=15), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('license_plate')
+    )
+    op.create_table('parking_sessions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('vehicle_id', sa.Integer(), nullable=False),
+    sa.Column('space_id', sa.Integer(), nullable=False),
+    sa.Column('entry_time', sa.DateTime(), nullable=False),
+    sa.Column('exit_time', sa.DateTime(), nullable=True),
+    sa.Column('total_hours', sa.Float(), nullable=True),
+    sa.Column('total_cost', sa.Float(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('payment_status', sa.String(length=20), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['space_id'], ['parking_spaces.id'], ),
+    sa.ForeignKeyConstraint(['vehicle_id'], ['vehicles.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('parking_sessions')
+    op.drop_table('vehicles')
+    op.drop_table('parking_spaces')
@@ -0,0 +1,71 @@
+"""counters table, active-session constraints and hot-path indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 06:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+ACTIVE = sa.text('is_active = 1')
+
+SESSION_INDEXES = [
+    ('uq_parking_sessions_active_vehicle', ['vehicle_id'],
+     dict(unique=True, sqlite_where=ACTIVE, postgresql_where=sa.text('is_active'))),
+    ('uq_parking_sessions_active_space', ['space_id'],
+     dict(unique=True, sqlite_where=ACTIVE, postgresql_where=sa.text('is_active'))),
+    ('ix_parking_sessions_vehicle_active', ['vehicle_id', 'is_active'], dict(unique=False)),
+    ('ix_parking_sessions_space_active', ['space_id', 'is_active'], dict(unique=False)),
+    ('ix_parking_sessions_active', ['is_active'],
+     dict(unique=False, sqlite_where=ACTIVE, postgresql_where=sa.text('is_active'))),
+]
+
+
+def _index_names(table):
+    """Nombres de los índices que ya existen en `table`"""
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    # db.create_all() en create_app pudo haber creado ya la tabla de contadores
+    if not sa.inspect(op.get_bind()).has_table('parking_counters'):
+        op.create_table('parking_counters',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+        )
+
+    # Una base creada por db.create_all() (y marcada con stamp 0001) ya puede
+    # tener cualquiera de estos índices: solo se crean los que faltan
+    existing = _index_names('parking_spaces')
+    with op.batch_alter_table('parking_spaces', schema=None) as batch_op:
+        if 'ix_parking_spaces_is_occupied' not in existing:
+            batch_op.create_index('ix_parking_spaces_is_occupied', ['is_occupied'], unique=False)
+
+    existing = _index_names('parking_sessions')
+    with op.batch_alter_table('parking_sessions', schema=None) as batch_op:
+        for name, columns, kwargs in SESSION_INDEXES:
+            if name not in existing:
+                batch_op.create_index(name, columns, **kwargs)
+
+
+def downgrade():
+    existing = _index_names('parking_sessions')
+    with op.batch_alter_table('parking_sessions', schema=None) as batch_op:
+        for name, _, _ in reversed(SESSION_INDEXES):
+            if name in existing:
+                batch_op.drop_index(name)
+
+    with op.batch_alter_table('parking_spaces', schema=None) as batch_op:
+        if 'ix_parking_spaces_is_occupied' in _index_names('parking_spaces'):
+            batch_op.drop_index('ix_parking_spaces_is_occupied')
+
+    op.drop_table('parking_counters')
@@ -0,0 +1,57 @@
+"""parking_sessions_history table for archived sessions
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 07:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() en create_app pudo haber creado ya la tabla
+    if not sa.inspect(op.get_bind()).has_table('parking_sessions_history'):
+        op.create_table('parking_sessions_history',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('vehicle_id', sa.Integer(), nullable=False),
+        sa.Column('space_id', sa.Integer(), nullable=False),
+        sa.Column('entry_time', sa.DateTime(), nullable=False),
+        sa.Column('exit_time', sa.DateTime(), nullable=True),
+        sa.Column('total_hours', sa.Float(), nullable=True),
+        sa.Column('total_cost', sa.Float(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=False),
+        sa.Column('payment_status', sa.String(length=20), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['space_id'], ['parking_spaces.id'], ),
+        sa.ForeignKeyConstraint(['vehicle_id'], ['vehicles.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('parking_sessions_history', schema=None) as batch_op:
+            batch_op.create_index('ix_parking_sessions_history_vehicle', ['vehicle_id'], unique=False)
+            batch_op.create_index('ix_parking_sessions_history_exit_time', ['exit_time'], unique=False)
+
+    # AUTOINCREMENT en parking_sessions para que los ids archivados no se reutilicen
+    with op.batch_alter_table('parking_sessions', schema=None, recreate='always',
+                              table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        pass
+
+
+def downgrade():
+    with op.batch_alter_table('parking_sessions', schema=None, recreate='always',
+                              table_kwargs={'sqlite_autoincrement': False}) as batch_op:
+        pass
+
+    with op.batch_alter_table('parking_sessions_history', schema=None) as batch_op:
+        batch_op.drop_index('ix_parking_sessions_history_exit_time')
+        batch_op.drop_index('ix_parking_sessions_history_vehicle')
+
+    op.drop_table('parking_sessions_history')
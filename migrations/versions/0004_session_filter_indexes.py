@@ -0,0 +1,60 @@
+"""indexes for the session listing filters
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+# tabla -> [(índice, columnas)]
+INDEXES = {
+    'parking_spaces': [
+        ('ix_parking_spaces_floor', ['floor']),
+    ],
+    'parking_sessions': [
+        ('ix_parking_sessions_entry_time', ['entry_time']),
+        ('ix_parking_sessions_exit_time', ['exit_time']),
+        ('ix_parking_sessions_payment_status', ['payment_status']),
+    ],
+    'parking_sessions_history': [
+        ('ix_parking_sessions_history_entry_time', ['entry_time']),
+        ('ix_parking_sessions_history_space', ['space_id']),
+        ('ix_parking_sessions_history_payment_status', ['payment_status']),
+    ],
+}
+
+
+def _index_names(table):
+    """Nombres de los índices que ya existen en `table`"""
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    # Una base creada por db.create_all() (y marcada con stamp 0001) ya tiene
+    # parte de estos índices. SQLite no revierte el DDL de una migración que
+    # falla a medias, así que cada índice se crea solo si falta: la migración
+    # se puede volver a ejecutar después de un error
+    for table, indexes in INDEXES.items():
+        existing = _index_names(table)
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for name, columns in indexes:
+                if name not in existing:
+                    batch_op.create_index(name, columns, unique=False)
+
+
+def downgrade():
+    for table, indexes in reversed(INDEXES.items()):
+        existing = _index_names(table)
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for name, _ in reversed(indexes):
+                if name in existing:
+                    batch_op.drop_index(name)
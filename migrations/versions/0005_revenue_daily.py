@@ -0,0 +1,91 @@
+"""revenue_daily rollup table for revenue reports
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from datetime import timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() en create_app pudo haber creado ya la tabla
+    if not sa.inspect(op.get_bind()).has_table('revenue_daily'):
+        op.create_table('revenue_daily',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('floor', sa.Integer(), nullable=False),
+        sa.Column('space_type', sa.String(length=20), nullable=False),
+        sa.Column('vehicle_type', sa.String(length=20), nullable=False),
+        sa.Column('week', sa.Date(), nullable=False),
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('sessions', sa.Integer(), nullable=False),
+        sa.Column('total_cost', sa.Float(), nullable=False),
+        sa.Column('total_hours', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'floor', 'space_type', 'vehicle_type')
+        )
+        with op.batch_alter_table('revenue_daily', schema=None) as batch_op:
+            batch_op.create_index('ix_revenue_daily_week', ['week'], unique=False)
+            batch_op.create_index('ix_revenue_daily_month', ['month'], unique=False)
+
+    _fill_revenue_daily()
+
+
+def downgrade():
+    with op.batch_alter_table('revenue_daily', schema=None) as batch_op:
+        batch_op.drop_index('ix_revenue_daily_month')
+        batch_op.drop_index('ix_revenue_daily_week')
+
+    op.drop_table('revenue_daily')
+
+
+def _fill_revenue_daily():
+    """Llena el resumen desde las sesiones cerradas existentes (lo mismo que `flask rebuild-revenue`)"""
+    session_tables = [
+        sa.table(name, *[sa.column(column) for column in (
+            'exit_time', 'space_id', 'vehicle_id', 'total_cost', 'total_hours', 'is_active'
+        )])
+        for name in ('parking_sessions', 'parking_sessions_history')
+    ]
+    spaces = sa.table('parking_spaces', sa.column('id'), sa.column('floor'), sa.column('space_type'))
+    vehicles = sa.table('vehicles', sa.column('id'), sa.column('vehicle_type'))
+    revenue_daily = sa.table(
+        'revenue_daily', sa.column('day', sa.Date), sa.column('floor'), sa.column('space_type'),
+        sa.column('vehicle_type'), sa.column('week', sa.Date), sa.column('month', sa.Date),
+        sa.column('sessions'), sa.column('total_cost'), sa.column('total_hours')
+    )
+
+    closed = sa.union_all(*[
+        sa.select(table.c.exit_time, table.c.space_id, table.c.vehicle_id, table.c.total_cost, table.c.total_hours)
+        .where(table.c.is_active == sa.false(), table.c.exit_time.isnot(None))
+        for table in session_tables
+    ]).subquery()
+    day = sa.func.date(closed.c.exit_time, type_=sa.Date)
+    rows = op.get_bind().execute(
+        sa.select(
+            day, spaces.c.floor, spaces.c.space_type, vehicles.c.vehicle_type, sa.func.count(),
+            sa.func.coalesce(sa.func.sum(closed.c.total_cost), 0.0),
+            sa.func.coalesce(sa.func.sum(closed.c.total_hours), 0.0)
+        )
+        .join(spaces, closed.c.space_id == spaces.c.id)
+        .join(vehicles, closed.c.vehicle_id == vehicles.c.id)
+        .group_by(day, spaces.c.floor, spaces.c.space_type, vehicles.c.vehicle_type)
+    ).all()
+
+    op.execute(revenue_daily.delete())
+    if rows:
+        op.get_bind().execute(revenue_daily.insert(), [
+            {'day': day, 'floor': floor, 'space_type': space_type, 'vehicle_type': vehicle_type,
+             'week': day - timedelta(days=day.weekday()), 'month': day.replace(day=1),
+             'sessions': count, 'total_cost': cost, 'total_hours': hours}
+            for day, floor, space_type, vehicle_type, count, cost, hours in rows
+        ])
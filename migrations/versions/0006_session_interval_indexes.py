@@ -0,0 +1,49 @@
+"""covering (entry_time, exit_time, space_id) indexes for occupancy analytics
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+# (tabla, índice de entry_time de 0004, índice compuesto que lo reemplaza)
+TABLES = [
+    ('parking_sessions', 'ix_parking_sessions_entry_time', 'ix_parking_sessions_entry_interval'),
+    ('parking_sessions_history', 'ix_parking_sessions_history_entry_time', 'ix_parking_sessions_history_entry_interval'),
+]
+
+
+def _index_names(table):
+    """Nombres de los índices que ya existen en `table`"""
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    # El índice compuesto empieza por entry_time: reemplaza al de 0004. Una
+    # base creada por db.create_all() ya tiene el compuesto y nunca tuvo el viejo
+    for table, old, new in TABLES:
+        existing = _index_names(table)
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            if old in existing:
+                batch_op.drop_index(old)
+            if new not in existing:
+                batch_op.create_index(new, ['entry_time', 'exit_time', 'space_id'], unique=False)
+
+
+def downgrade():
+    for table, old, new in reversed(TABLES):
+        existing = _index_names(table)
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            if new in existing:
+                batch_op.drop_index(new)
+            if old not in existing:
+                batch_op.create_index(old, ['entry_time'], unique=False)
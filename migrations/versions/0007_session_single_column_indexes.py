@@ -0,0 +1,49 @@
+"""replace (vehicle_id|space_id, is_active) session indexes with single-column ones
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+# (índice compuesto de 0002, índice de una columna que lo reemplaza, columna)
+INDEXES = [
+    ('ix_parking_sessions_vehicle_active', 'ix_parking_sessions_vehicle', 'vehicle_id'),
+    ('ix_parking_sessions_space_active', 'ix_parking_sessions_space', 'space_id'),
+]
+
+
+def _index_names(table):
+    """Nombres de los índices que ya existen en `table`"""
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    # Las búsquedas de la sesión activa usan los índices únicos parciales; la
+    # columna is_active de los compuestos solo obligaba a reescribirlos en cada salida
+    existing = _index_names('parking_sessions')
+    with op.batch_alter_table('parking_sessions', schema=None) as batch_op:
+        for old, new, column in INDEXES:
+            if old in existing:
+                batch_op.drop_index(old)
+            if new not in existing:
+                batch_op.create_index(new, [column], unique=False)
+
+
+def downgrade():
+    existing = _index_names('parking_sessions')
+    with op.batch_alter_table('parking_sessions', schema=None) as batch_op:
+        for old, new, column in reversed(INDEXES):
+            if new in existing:
+                batch_op.drop_index(new)
+            if old not in existing:
+                batch_op.create_index(old, [column, 'is_active'], unique=False)
@@ -8,4 +8,5 @@ load_dotenv()
 app = create_app()
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5001)
\ No newline at end of file
+    # Servidor de desarrollo; en producción usar gunicorn (ver gunicorn.conf.py)
+    app.run(debug=app.debug, host='0.0.0.0', port=5001)
\ No newline at end of file
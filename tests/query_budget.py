@@ -0,0 +1,52 @@
+"""
+Utilidades para limitar el número de consultas SQL que emite una petición.
+
+    with query_budget(self, 2, label='GET /api/stats'):
+        self.client.get('/api/stats')
+
+Si dentro del bloque se ejecutan más sentencias que el presupuesto, la prueba
+falla y muestra todas las sentencias emitidas (útil para encontrar un N+1).
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app import db
+
+
+class QueryCounter:
+    """Cuenta (y guarda, con sus parámetros) las sentencias SQL ejecutadas sobre un motor mientras está activo"""
+
+    def __init__(self, engine=None):
+        self.engine = engine
+        self.statements = []
+        self.parameters = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+        self.parameters.append(parameters)
+
+    def __enter__(self):
+        if self.engine is None:
+            self.engine = db.engine
+        event.listen(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        event.remove(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+        return False
+
+
+@contextmanager
+def query_budget(testcase, budget, label=None, engine=None):
+    """Falla la prueba si el bloque ejecuta más de `budget` sentencias SQL"""
+    with QueryCounter(engine) as counter:
+        yield counter
+
+    if counter.count > budget:
+        statements = '\n'.join(f'  {i + 1}. {" ".join(statement.split())}' for i, statement in enumerate(counter.statements))
+        testcase.fail(f'{label or "Bloque"}: {counter.count} consultas, presupuesto {budget}\n{statements}')
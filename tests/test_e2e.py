@@ -1,13 +1,25 @@
 import unittest
 import json
 import os
+import pstats
+import shutil
 import sys
 import tempfile
+import threading
 
 # Agregar el directorio raíz al path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app import create_app, db
+from prometheus_client.parser import text_string_to_metric_families
+
+from app import counters, create_app, db
+from app.data_version import data_version
+from app.metrics import request_metrics
+from app.slow_queries import slow_query_log
+from app.models.parking import ParkingSpace
+from app.space_index import space_index
+from app.stream import occupancy_broker
+from tests.query_budget import QueryCounter
 
 class TestE2E(unittest.TestCase):
     
@@ -17,7 +29,7 @@ class TestE2E(unittest.TestCase):
         self.db_fd, self.db_path = tempfile.mkstemp()
         
         # Configurar la aplicación para testing
-        self.app = create_app()
+        self.app = create_app('testing')
         self.app.config['TESTING'] = True
         self.app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{self.db_path}'
         self.app.config['WTF_CSRF_ENABLED'] = False
@@ -206,5 +218,769 @@ class TestE2E(unittest.TestCase):
         space_ids = [space['id'] for space in spaces_list]
         self.assertNotIn(space_id, space_ids)
 
+    def test_get_spaces_keyset_pagination_walks_all_pages(self):
+        """
+        Prueba E2E: GET /spaces?limit=&after= recorre todas las páginas con el cursor
+        """
+        # Crear 5 espacios
+        for i in range(5):
+            response = self.client.post(
+                '/api/spaces',
+                data=json.dumps({'number': f'P{i}', 'floor': 1}),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 201)
+        
+        # Recorrer las páginas de 2 en 2
+        pages = []
+        url = '/api/spaces?limit=2'
+        while True:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(json.loads(response.data))
+            
+            next_cursor = response.headers.get('X-Next-Cursor')
+            if not next_cursor:
+                break
+            url = f'/api/spaces?limit=2&after={next_cursor}'
+        
+        # 3 páginas: 2 + 2 + 1, sin repetir ni perder espacios
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        numbers = [space['number'] for page in pages for space in page]
+        self.assertEqual(numbers, ['P0', 'P1', 'P2', 'P3', 'P4'])
+        
+        # /spaces/available pagina el índice en memoria con el mismo cursor, también
+        # cuando la clave del cursor ya no está en la lista (P1 ocupado)
+        first_cursor = self.client.get('/api/spaces?limit=2').headers['X-Next-Cursor']
+        p1 = pages[0][1]['id']
+        self.client.post('/api/sessions/entry', data=json.dumps({
+            'license_plate': 'PAG001', 'space_id': p1, 'vehicle_type': 'car', 'owner_name': 'Página'
+        }), content_type='application/json')
+        response = self.client.get(f'/api/spaces/available?limit=2&after={first_cursor}')
+        self.assertEqual([space['number'] for space in json.loads(response.data)], ['P2', 'P3'])
+        response = self.client.get(f"/api/spaces/available?limit=2&after={response.headers['X-Next-Cursor']}")
+        self.assertEqual([space['number'] for space in json.loads(response.data)], ['P4'])
+        self.assertNotIn('X-Next-Cursor', response.headers)
+        response = self.client.get('/api/spaces/available?limit=2')
+        self.assertEqual([space['number'] for space in json.loads(response.data)], ['P0', 'P2'])
+        
+        # Sin ?limit= cada listado retorna una página de PAGE_SIZE_DEFAULT y el cursor
+        self.app.config['PAGE_SIZE_DEFAULT'] = 2
+        self.client.post('/api/sessions/exit', data=json.dumps({'license_plate': 'PAG001'}), content_type='application/json')
+        for url, expected in [
+            ('/api/spaces', ['P0', 'P1']),
+            ('/api/spaces/available', ['P0', 'P1']),
+        ]:
+            response = self.client.get(url)
+            self.assertEqual([space['number'] for space in json.loads(response.data)], expected, url)
+            self.assertIn('X-Next-Cursor', response.headers, url)
+        for plate in ['PAG002', 'PAG003', 'PAG004']:
+            self.client.post('/api/sessions/entry', data=json.dumps({
+                'license_plate': plate, 'vehicle_type': 'car', 'owner_name': 'Página'
+            }), content_type='application/json')
+        for url in ['/api/vehicles', '/api/sessions', '/api/sessions/active']:
+            response = self.client.get(url)
+            self.assertEqual(len(json.loads(response.data)), 2, url)
+            self.assertIn('X-Next-Cursor', response.headers, url)
+        # Sesiones vivas y archivadas: 4 en total, dos páginas
+        cursor = self.client.get('/api/sessions').headers['X-Next-Cursor']
+        response = self.client.get(f'/api/sessions?after={cursor}')
+        self.assertEqual(len(json.loads(response.data)), 2)
+        self.assertNotIn('X-Next-Cursor', response.headers)
+        
+        # Parámetros inválidos retornan 400
+        self.assertEqual(self.client.get('/api/spaces?limit=0').status_code, 400)
+        self.assertEqual(self.client.get('/api/spaces?limit=abc').status_code, 400)
+        self.assertEqual(self.client.get('/api/spaces?after=%%%').status_code, 400)
+
+    def test_available_spaces_filters_and_follows_entry_exit(self):
+        """
+        Prueba E2E: GET /spaces/available filtra por piso y tipo, y refleja entradas y salidas
+        """
+        spaces_data = [
+            {'number': 'E1', 'floor': 1, 'space_type': 'regular'},
+            {'number': 'E2', 'floor': 2, 'space_type': 'electric'},
+            {'number': 'E3', 'floor': 2, 'space_type': 'electric'},
+            {'number': 'E4', 'floor': 2, 'space_type': 'regular'}
+        ]
+        ids = {}
+        for space_data in spaces_data:
+            response = self.client.post(
+                '/api/spaces',
+                data=json.dumps(space_data),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 201)
+            ids[space_data['number']] = json.loads(response.data)['id']
+        
+        def available_numbers(query=''):
+            response = self.client.get(f'/api/spaces/available{query}')
+            self.assertEqual(response.status_code, 200)
+            return [space['number'] for space in json.loads(response.data)]
+        
+        # Filtros por piso y tipo
+        self.assertEqual(available_numbers(), ['E1', 'E2', 'E3', 'E4'])
+        self.assertEqual(available_numbers('?floor=2'), ['E2', 'E3', 'E4'])
+        self.assertEqual(available_numbers('?floor=2&type=electric'), ['E2', 'E3'])
+        self.assertEqual(available_numbers('?type=regular'), ['E1', 'E4'])
+        self.assertEqual(self.client.get('/api/spaces/available?floor=x').status_code, 400)
+        
+        # La entrada ocupa el espacio
+        response = self.client.post(
+            '/api/sessions/entry',
+            data=json.dumps({
+                'license_plate': 'IDX123',
+                'space_id': ids['E2'],
+                'owner_name': 'Prueba',
+                'vehicle_type': 'car'
+            }),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(available_numbers('?floor=2&type=electric'), ['E3'])
+        
+        # La salida lo libera
+        response = self.client.post(
+            '/api/sessions/exit',
+            data=json.dumps({'license_plate': 'IDX123'}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(available_numbers('?floor=2&type=electric'), ['E2', 'E3'])
+        
+        # Un space_id enviado como texto ocupa el mismo espacio y también lo quita del índice
+        response = self.client.post(
+            '/api/sessions/entry',
+            data=json.dumps({'license_plate': 'IDX123', 'space_id': str(ids['E3'])}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(json.loads(response.data)['space_id'], ids['E3'])
+        self.assertEqual(available_numbers('?floor=2&type=electric'), ['E2'])
+        self.client.post('/api/sessions/exit', data=json.dumps({'license_plate': 'IDX123'}), content_type='application/json')
+        response = self.client.post(
+            '/api/sessions/entry',
+            data=json.dumps({'license_plate': 'IDX123', 'space_id': 'E3'}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        
+        # Al eliminar un espacio desaparece de los disponibles
+        self.assertEqual(self.client.delete(f"/api/spaces/{ids['E1']}").status_code, 204)
+        self.assertEqual(available_numbers(), ['E2', 'E3', 'E4'])
+        
+        # Un cambio hecho por otro proceso (versión adelantada) reconstruye el índice
+        ParkingSpace.query.filter_by(number='E4').update({'is_occupied': True})
+        space_index.bump_version()
+        db.session.commit()
+        self.assertEqual(available_numbers(), ['E2', 'E3'])
+
+    def test_entry_without_space_assigns_best_space(self):
+        """
+        Prueba E2E: POST /sessions/entry sin space_id asigna el mejor espacio según la política
+        """
+        spaces_data = [
+            {'number': 'F2R', 'floor': 2, 'space_type': 'regular'},
+            {'number': 'F1R', 'floor': 1, 'space_type': 'regular'},
+            {'number': 'F1E', 'floor': 1, 'space_type': 'electric'},
+            {'number': 'F1D', 'floor': 1, 'space_type': 'disabled'}
+        ]
+        for space_data in spaces_data:
+            response = self.client.post(
+                '/api/spaces',
+                data=json.dumps(space_data),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 201)
+        
+        def enter(plate, vehicle_type):
+            return self.client.post(
+                '/api/sessions/entry',
+                data=json.dumps({
+                    'license_plate': plate,
+                    'owner_name': 'Prueba',
+                    'vehicle_type': vehicle_type
+                }),
+                content_type='application/json'
+            )
+        
+        # Vehículo eléctrico: espacio eléctrico
+        response = enter('EV001', 'electric')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(json.loads(response.data)['space']['number'], 'F1E')
+        
+        # Carros: primero el piso más bajo
+        response = enter('CAR001', 'car')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(json.loads(response.data)['space']['number'], 'F1R')
+        
+        response = enter('CAR002', 'car')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(json.loads(response.data)['space']['number'], 'F2R')
+        self.assertTrue(json.loads(response.data)['space']['is_occupied'])
+        
+        # Sin espacios regulares libres (el de discapacitados no se asigna a un carro)
+        response = enter('CAR003', 'car')
+        self.assertEqual(response.status_code, 400)
+        
+        # Al salir un carro, su espacio vuelve a estar disponible para asignar
+        response = self.client.post(
+            '/api/sessions/exit',
+            data=json.dumps({'license_plate': 'CAR001'}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        response = enter('CAR003', 'car')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(json.loads(response.data)['space']['number'], 'F1R')
+
+    def test_concurrent_entries_never_double_book_a_space(self):
+        """
+        Prueba E2E: entradas simultáneas desde varios hilos nunca ocupan dos veces el mismo espacio
+        """
+        # 3 espacios y 12 vehículos ya registrados
+        space_ids = []
+        for i in range(3):
+            response = self.client.post(
+                '/api/spaces',
+                data=json.dumps({'number': f'S{i}', 'floor': 1}),
+                content_type='application/json'
+            )
+            space_ids.append(json.loads(response.data)['id'])
+        for i in range(12):
+            response = self.client.post(
+                '/api/vehicles',
+                data=json.dumps({'license_plate': f'THR{i:03d}', 'vehicle_type': 'car', 'owner_name': 'Prueba'}),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 201)
+        
+        def run_concurrently(bodies):
+            barrier = threading.Barrier(len(bodies))
+            statuses = [None] * len(bodies)
+            
+            def worker(index):
+                client = self.app.test_client()
+                barrier.wait()
+                response = client.post(
+                    '/api/sessions/entry',
+                    data=json.dumps(bodies[index]),
+                    content_type='application/json'
+                )
+                statuses[index] = response.status_code
+            
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(bodies))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return statuses
+        
+        # 4 vehículos compiten por el mismo espacio: solo uno entra
+        statuses = run_concurrently([
+            {'license_plate': f'THR{i:03d}', 'space_id': space_ids[0]} for i in range(4)
+        ])
+        self.assertEqual(statuses.count(201), 1)
+        self.assertEqual(statuses.count(400), 3)
+        
+        # 8 vehículos con asignación automática compiten por los 2 espacios restantes
+        statuses = run_concurrently([
+            {'license_plate': f'THR{i:03d}'} for i in range(4, 12)
+        ])
+        self.assertEqual(statuses.count(201), 2)
+        self.assertEqual(statuses.count(400), 6)
+        
+        # Cada espacio tiene exactamente una sesión activa
+        response = self.client.get('/api/sessions/active')
+        active_sessions = json.loads(response.data)
+        self.assertEqual(sorted(session['space_id'] for session in active_sessions), sorted(space_ids))
+        self.assertEqual(len({session['vehicle_id'] for session in active_sessions}), 3)
+        
+        response = self.client.get('/api/spaces/available')
+        self.assertEqual(json.loads(response.data), [])
+
+    def test_stats_counters_follow_operations_and_reconcile(self):
+        """
+        Prueba E2E: GET /stats refleja cada operación y la reconciliación corrige desviaciones
+        """
+        def stats():
+            response = self.client.get('/api/stats')
+            self.assertEqual(response.status_code, 200)
+            return json.loads(response.data)
+        
+        for number in ['T1', 'T2', 'T3', 'T4']:
+            self.client.post('/api/spaces', data=json.dumps({'number': number}), content_type='application/json')
+        self.client.post(
+            '/api/vehicles',
+            data=json.dumps({'license_plate': 'STA001', 'vehicle_type': 'car', 'owner_name': 'Prueba'}),
+            content_type='application/json'
+        )
+        
+        # Entrada de un vehículo registrado y de uno nuevo
+        self.client.post('/api/sessions/entry', data=json.dumps({'license_plate': 'STA001'}), content_type='application/json')
+        self.client.post(
+            '/api/sessions/entry',
+            data=json.dumps({'license_plate': 'STA002', 'owner_name': 'Prueba', 'vehicle_type': 'car'}),
+            content_type='application/json'
+        )
+        self.assertEqual(stats(), {
+            'total_spaces': 4,
+            'occupied_spaces': 2,
+            'available_spaces': 2,
+            'occupancy_rate': 50.0,
+            'active_sessions': 2,
+            'total_vehicles': 2
+        })
+        
+        # Salida y eliminación de un espacio libre
+        self.client.post('/api/sessions/exit', data=json.dumps({'license_plate': 'STA001'}), content_type='application/json')
+        available = json.loads(self.client.get('/api/spaces/available').data)
+        self.assertEqual(self.client.delete(f"/api/spaces/{available[-1]['id']}").status_code, 204)
+        self.assertEqual(stats(), {
+            'total_spaces': 3,
+            'occupied_spaces': 1,
+            'available_spaces': 2,
+            'occupancy_rate': 33.33,
+            'active_sessions': 1,
+            'total_vehicles': 2
+        })
+        
+        # Un cambio que no pasa por la API deja los contadores desviados
+        db.session.add(ParkingSpace(number='T5'))
+        db.session.commit()
+        self.assertEqual(stats()['total_spaces'], 3)
+        
+        # La reconciliación lo detecta y lo corrige
+        self.assertEqual(counters.reconcile(), {'total_spaces': 1})
+        self.assertEqual(stats()['total_spaces'], 4)
+        self.assertEqual(counters.reconcile(), {})
+
+    def test_batch_entry_exit_reports_each_event(self):
+        """
+        Prueba E2E: POST /sessions/batch procesa entradas y salidas en lote y reporta fallos parciales
+        """
+        space_ids = []
+        for number in ['L1', 'L2', 'L3']:
+            response = self.client.post('/api/spaces', data=json.dumps({'number': number}), content_type='application/json')
+            space_ids.append(json.loads(response.data)['id'])
+        self.client.post(
+            '/api/vehicles',
+            data=json.dumps({'license_plate': 'BAT001', 'vehicle_type': 'car', 'owner_name': 'Prueba'}),
+            content_type='application/json'
+        )
+        
+        events = [
+            {'type': 'entry', 'license_plate': 'bat001', 'space_id': space_ids[0]},
+            {'type': 'entry', 'license_plate': 'BAT002', 'owner_name': 'Nuevo', 'vehicle_type': 'car'},
+            {'type': 'entry', 'license_plate': 'BAT003'},
+            {'type': 'exit', 'license_plate': 'NOEXISTE'},
+            {'type': 'entry', 'license_plate': 'BAT001', 'space_id': space_ids[2]},
+            {'type': 'exit', 'license_plate': 'BAT001'},
+            {'type': 'entry', 'license_plate': 'BAT001', 'space_id': space_ids[0]},
+            {'type': 'bogus', 'license_plate': 'BAT001'}
+        ]
+        response = self.client.post(
+            '/api/sessions/batch',
+            data=json.dumps({'events': events}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        
+        # Un resultado por evento, en orden
+        statuses = [result['status'] for result in data['results']]
+        self.assertEqual(statuses, [201, 201, 400, 404, 400, 200, 201, 400])
+        self.assertEqual(data['succeeded'], 4)
+        self.assertEqual(data['failed'], 4)
+        
+        # La entrada automática ocupó el primer espacio libre (L2)
+        self.assertEqual(data['results'][1]['session']['space_id'], space_ids[1])
+        self.assertEqual(data['results'][1]['session']['vehicle']['license_plate'], 'BAT002')
+        
+        # BAT001 salió y volvió a entrar en L1 dentro del mismo lote
+        self.assertFalse(data['results'][5]['session']['is_active'])
+        self.assertTrue(data['results'][6]['session']['is_active'])
+        self.assertEqual(data['results'][6]['session']['space_id'], space_ids[0])
+        
+        # Estado final: dos sesiones activas, solo L3 libre y contadores consistentes
+        active = json.loads(self.client.get('/api/sessions/active').data)
+        self.assertEqual(sorted(session['space_id'] for session in active), space_ids[:2])
+        available = json.loads(self.client.get('/api/spaces/available').data)
+        self.assertEqual([space['id'] for space in available], [space_ids[2]])
+        self.assertEqual(counters.reconcile(), {})
+        
+        # Lote vacío o inválido
+        response = self.client.post('/api/sessions/batch', data=json.dumps({'events': []}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_rebuilds_stale_index_and_fails_only_conflicting_entries(self):
+        """
+        Prueba E2E: POST /sessions/batch reconstruye el índice si otro proceso cambió
+        espacios y responde 409 solo en la entrada cuyo espacio asignado ya no está libre
+        """
+        space_ids = []
+        for number in ['M1', 'M2', 'M3']:
+            response = self.client.post('/api/spaces', data=json.dumps({'number': number}), content_type='application/json')
+            space_ids.append(json.loads(response.data)['id'])
+        
+        def batch(events):
+            response = self.client.post('/api/sessions/batch', data=json.dumps({'events': events}), content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            return json.loads(response.data)['results']
+        
+        # Otro proceso ocupa M1 y confirma sin que este proceso actualice su índice
+        self.assertEqual([space['id'] for space in space_index.available()], space_ids)
+        ParkingSpace.query.filter_by(number='M1').update({'is_occupied': True})
+        counters.adjust(spaces=True, occupied_spaces=1)
+        db.session.commit()
+        
+        # El lote detecta la versión adelantada con el bloqueo tomado y asigna M2
+        results = batch([{'type': 'entry', 'license_plate': 'MIX001', 'owner_name': 'Uno', 'vehicle_type': 'car'}])
+        self.assertEqual(results[0]['status'], 201)
+        self.assertEqual(results[0]['session']['space_id'], space_ids[1])
+        
+        # M3 se ocupa sin avanzar la versión: el índice lo cree libre y el UPDATE no lo toma
+        ParkingSpace.query.filter_by(number='M3').update({'is_occupied': True})
+        counters.adjust(occupied_spaces=1)
+        db.session.commit()
+        results = batch([
+            {'type': 'entry', 'license_plate': 'MIX002', 'owner_name': 'Dos', 'vehicle_type': 'car'},
+            {'type': 'exit', 'license_plate': 'MIX001'}
+        ])
+        self.assertEqual([result['status'] for result in results], [409, 200])
+        
+        # La entrada fallida no dejó vehículo ni sesión, y el índice se reconstruyó
+        self.assertEqual(self.client.get('/api/vehicles/MIX002').status_code, 404)
+        self.assertEqual(json.loads(self.client.get('/api/sessions/active').data), [])
+        available = json.loads(self.client.get('/api/spaces/available').data)
+        self.assertEqual([space['id'] for space in available], [space_ids[1]])
+        self.assertEqual(counters.reconcile(), {})
+
+    def test_bulk_import_spaces_and_vehicles(self):
+        """
+        Prueba E2E: POST /spaces/import y /vehicles/import insertan en bloque y omiten duplicados
+        """
+        # Un espacio ya existente debe detectarse como duplicado
+        self.client.post('/api/spaces', data=json.dumps({'number': 'IMP1'}), content_type='application/json')
+        
+        csv_body = (
+            'number,floor,space_type,hourly_rate\n'
+            'IMP1,1,regular,2000\n'
+            'IMP2,2,electric,3000\n'
+            'IMP3,2,,\n'
+            'IMP2,3,regular,1000\n'
+            ',1,regular,2000\n'
+            'IMP4,piso,regular,2000\n'
+        )
+        response = self.client.post('/api/spaces/import', data=csv_body, content_type='text/csv')
+        self.assertEqual(response.status_code, 200)
+        summary = json.loads(response.data)
+        self.assertEqual(summary['inserted'], 2)
+        self.assertEqual(summary['duplicates'], 2)
+        self.assertEqual(summary['invalid'], 2)
+        self.assertEqual([error['line'] for error in summary['errors']], [6, 7])
+        
+        # Los espacios importados aparecen en el índice de disponibles con sus valores por defecto
+        available = json.loads(self.client.get('/api/spaces/available?floor=2').data)
+        self.assertEqual(
+            [(space['number'], space['space_type'], space['hourly_rate']) for space in available],
+            [('IMP2', 'electric', 3000.0), ('IMP3', 'regular', 2000.0)]
+        )
+        
+        ndjson_body = (
+            '{"license_plate": "imp001", "vehicle_type": "car", "owner_name": "Ana"}\n'
+            '{"license_plate": "IMP001", "vehicle_type": "car", "owner_name": "Ana"}\n'
+            'no es json\n'
+            '{"license_plate": "IMP002", "vehicle_type": "motorcycle", "owner_name": "Luis", "owner_phone": "300"}\n'
+        )
+        response = self.client.post('/api/vehicles/import', data=ndjson_body, content_type='application/x-ndjson')
+        summary = json.loads(response.data)
+        self.assertEqual((summary['inserted'], summary['duplicates'], summary['invalid']), (2, 1, 1))
+        
+        response = self.client.get('/api/vehicles/IMP001')
+        self.assertEqual(response.status_code, 200)
+        
+        # Los contadores de /api/stats incluyen las filas importadas
+        stats = json.loads(self.client.get('/api/stats').data)
+        self.assertEqual(stats['total_spaces'], 3)
+        self.assertEqual(stats['total_vehicles'], 2)
+        self.assertEqual(counters.reconcile(), {})
+        
+        # Sin formato reconocible
+        response = self.client.post('/api/spaces/import', data='x', content_type='text/plain')
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_import_reports_partial_summary_when_file_stops_decoding(self):
+        """
+        Prueba E2E: POST /spaces/import con bytes que no son UTF-8 a mitad del archivo
+        Responde 400 con la línea ilegible y el resumen de lo ya importado;
+        las tarifas NaN o infinitas se reportan como filas inválidas
+        """
+        self.app.config['IMPORT_CHUNK_SIZE'] = 2
+        csv_body = (
+            b'number,floor,space_type,hourly_rate\n'
+            b'DEC1,1,regular,2000\n'
+            b'DEC2,1,regular,NaN\n'
+            b'DEC3,1,regular,inf\n'
+            b'DEC4,1,regular,-Infinity\n'
+            b'DEC5,1,regular,1500\n'
+            b'DEC\xff,1,regular,2000\n'
+            b'DEC7,1,regular,2000\n'
+        )
+        response = self.client.post('/api/spaces/import', data=csv_body, content_type='text/csv')
+        self.assertEqual(response.status_code, 400)
+        data = json.loads(response.data)
+        self.assertEqual(data['error'], 'El archivo debe estar codificado en UTF-8')
+        self.assertEqual(data['line'], 7)
+        self.assertEqual((data['inserted'], data['duplicates'], data['invalid']), (2, 0, 3))
+        self.assertEqual(
+            [(error['line'], error['error']) for error in data['errors']],
+            [(line, 'hourly_rate debe ser un número finito') for line in (3, 4, 5)]
+        )
+
+        # Lo reportado como importado quedó confirmado; nada desde la línea ilegible
+        numbers = [space['number'] for space in json.loads(self.client.get('/api/spaces').data)]
+        self.assertEqual(numbers, ['DEC1', 'DEC5'])
+        self.assertEqual(json.loads(self.client.get('/api/stats').data)['total_spaces'], 2)
+
+        ndjson_body = (
+            b'{"license_plate": "DEC001", "vehicle_type": "car", "owner_name": "Ana"}\n'
+            b'\n'
+            b'{"license_plate": "DEC002", "vehicle_type": "car", "owner_name": "Jos\xe9"}\n'
+        )
+        response = self.client.post('/api/vehicles/import', data=ndjson_body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        data = json.loads(response.data)
+        self.assertEqual((data['line'], data['inserted']), (3, 1))
+        self.assertEqual(self.client.get('/api/vehicles/DEC001').status_code, 200)
+
+    def test_metrics_endpoint_reports_latency_and_queries(self):
+        """
+        Prueba E2E: GET /metrics expone latencia, consultas y tiempo de base de datos por endpoint
+        """
+        request_metrics.reset()
+        for _ in range(3):
+            self.client.get('/api/stats')
+        self.client.get('/api/spaces/99999')
+        
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        
+        samples = {
+            (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+            for family in text_string_to_metric_families(response.get_data(as_text=True))
+            for sample in family.samples
+        }
+        
+        def sample(name, endpoint, status, **extra):
+            return samples[(name, tuple(sorted({'endpoint': endpoint, 'method': 'GET', 'status': status, **extra}.items())))]
+        
+        stats = ('parking.get_statistics', '200')
+        self.assertEqual(sample('parking_http_request_duration_seconds_count', *stats), 3)
+        self.assertEqual(sample('parking_http_request_duration_seconds_bucket', *stats, le='+Inf'), 3)
+        self.assertGreater(sample('parking_http_request_duration_seconds_sum', *stats), 0)
+        # /api/stats lee los contadores con una sola consulta; la versión de
+        # datos para el ETag se lee solo en la primera petición (luego se reutiliza)
+        self.assertEqual(sample('parking_http_request_queries_total', *stats), 4)
+        self.assertGreater(sample('parking_http_request_db_seconds_total', *stats), 0)
+        
+        # Los errores se separan por código de estado
+        self.assertEqual(sample('parking_http_request_duration_seconds_count', 'parking.get_space', '404'), 1)
+
+    def test_slow_query_log_records_statement_and_call_site(self):
+        """
+        Prueba E2E: GET /api/admin/slow-queries muestra las consultas lentas con su endpoint y pila
+        """
+        self.client.post('/api/spaces', data=json.dumps({'number': 'SQ1'}), content_type='application/json')
+        
+        # Umbral 0: todas las consultas cuentan como lentas
+        threshold = slow_query_log.threshold_ms
+        slow_query_log.threshold_ms = 0
+        slow_query_log.clear()
+        try:
+            self.client.get('/api/spaces/available?floor=1')
+            self.client.get('/api/spaces?limit=5')
+        finally:
+            slow_query_log.threshold_ms = threshold
+        
+        response = self.client.get('/api/admin/slow-queries?limit=1')
+        self.assertEqual(response.status_code, 200)
+        entries = json.loads(response.data)['entries']
+        self.assertEqual(len(entries), 1)
+        
+        # La más reciente primero, con sentencia, parámetros, endpoint y pila dentro de app/
+        entry = entries[0]
+        self.assertIn('FROM parking_spaces', entry['statement'])
+        self.assertIn(6, entry['parameters'])  # LIMIT limit + 1
+        self.assertEqual(entry['endpoint'], 'parking.get_all_spaces')
+        self.assertEqual(entry['path'], '/api/spaces?limit=5')
+        self.assertGreaterEqual(entry['duration_ms'], 0)
+        self.assertTrue(any('parking_routes.py' in frame and 'get_all_spaces' in frame for frame in entry['stack']))
+        
+        # Con ADMIN_TOKEN configurado el endpoint exige el token
+        self.app.config['ADMIN_TOKEN'] = 'secreto'
+        response = self.client.get('/api/admin/slow-queries')
+        self.assertEqual(response.status_code, 401)
+        response = self.client.get('/api/admin/slow-queries', headers={'Authorization': 'Bearer secreto'})
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(len(json.loads(response.data)['entries']), 2)
+
+    def test_request_profiling_on_demand(self):
+        """
+        Prueba E2E: Con PROFILING_ENABLED, X-Profile/?profile= perfila la petición sin cambiar las rutas
+        """
+        # Desactivado: el encabezado se ignora
+        self.app.config['PROFILING_ENABLED'] = False
+        response = self.client.get('/api/stats', headers={'X-Profile': 'summary'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('total_spaces', json.loads(response.data))
+        
+        self.app.config['PROFILING_ENABLED'] = True
+        self.app.config['PROFILING_DIR'] = tempfile.mkdtemp()
+        
+        # summary: resumen de cProfile en lugar del cuerpo original
+        response = self.client.get('/api/stats', headers={'X-Profile': 'summary'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-Profile-Status'], '200')
+        summary = response.get_data(as_text=True)
+        self.assertIn('GET /api/stats -> 200', summary)
+        self.assertIn('get_statistics', summary)
+        
+        # file: respuesta normal y perfil guardado en disco
+        response = self.client.get('/api/sessions?profile=file')
+        self.assertEqual(json.loads(response.data), [])
+        path = os.path.join(self.app.config['PROFILING_DIR'], response.headers['X-Profile-File'])
+        stats = pstats.Stats(path)
+        self.assertTrue(any(function[2] == 'get_all_sessions' for function in stats.stats))
+        shutil.rmtree(self.app.config['PROFILING_DIR'])
+        
+        # Con ADMIN_TOKEN configurado, perfilar exige el token
+        self.app.config['ADMIN_TOKEN'] = 'secreto'
+        response = self.client.get('/api/stats?profile=summary')
+        self.assertEqual(response.status_code, 401)
+
+    def test_conditional_get_answers_304_until_data_changes(self):
+        """
+        Prueba E2E: /api/spaces, /api/spaces/available y /api/stats envían ETag y
+        responden 304 sin consultar la base de datos mientras los datos no cambien
+        """
+        urls = ['/api/spaces', '/api/spaces/available?floor=1', '/api/stats']
+        etags = {}
+        for url in urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+            etags[url] = response.headers['ETag']
+        
+        # Misma versión: 304 sin cuerpo y sin ninguna consulta
+        for url in urls:
+            with QueryCounter() as counter:
+                response = self.client.get(url, headers={'If-None-Match': etags[url]})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.data, b'')
+            self.assertEqual(response.headers['ETag'], etags[url])
+            self.assertEqual(counter.count, 0)
+        
+        # Un cambio de este proceso invalida la versión de inmediato
+        self.client.post('/api/spaces', data=json.dumps({'number': 'ET1'}), content_type='application/json')
+        for url in urls:
+            response = self.client.get(url, headers={'If-None-Match': etags[url]})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response.headers['ETag'], etags[url])
+            etags[url] = response.headers['ETag']
+        self.assertEqual(json.loads(self.client.get('/api/stats').data)['total_spaces'], 1)
+        
+        # Un cambio de otro proceso se ve cuando expira la copia en memoria (DATA_VERSION_TTL)
+        with self.app.app_context():
+            db.session.execute(db.text("UPDATE parking_counters SET value = value + 1 WHERE name = 'data_version'"))
+            db.session.commit()
+        response = self.client.get('/api/stats', headers={'If-None-Match': etags['/api/stats']})
+        self.assertEqual(response.status_code, 304)
+        data_version.invalidate()
+        response = self.client.get('/api/stats', headers={'If-None-Match': etags['/api/stats']})
+        self.assertEqual(response.status_code, 200)
+
+    def _read_event(self, events):
+        """Siguiente evento SSE del stream como (id, tipo, datos)"""
+        chunk = next(events).decode()
+        while 'data: ' not in chunk:  # retry inicial y keepalives
+            chunk = next(events).decode()
+        fields = dict(line.split(': ', 1) for line in chunk.strip().splitlines())
+        return int(fields['id']), fields['event'], json.loads(fields['data'])
+
+    def test_spaces_stream_pushes_occupancy_changes_and_resumes(self):
+        """
+        Prueba E2E: GET /api/spaces/stream envía la foto inicial, cada entrada/salida,
+        reanuda con Last-Event-ID sin foto y descarta a los consumidores lentos
+        """
+        self.app.config['STREAM_POLL_INTERVAL'] = 0.01
+        for number in ['SSE1', 'SSE2']:
+            self.client.post('/api/spaces', data=json.dumps({'number': number}), content_type='application/json')
+        
+        response = self.client.get('/api/spaces/stream', buffered=False)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        events = iter(response.response)
+        
+        version, kind, data = self._read_event(events)
+        self.assertEqual(kind, 'snapshot')
+        self.assertEqual([space['number'] for space in data['spaces']], ['SSE1', 'SSE2'])
+        space_id = data['spaces'][0]['id']
+        
+        # Cada entrada confirmada llega como un cambio con la siguiente versión
+        self.client.post('/api/sessions/entry', data=json.dumps({
+            'license_plate': 'SSE001', 'space_id': space_id, 'vehicle_type': 'car', 'owner_name': 'Stream'
+        }), content_type='application/json')
+        entry_version, kind, data = self._read_event(events)
+        self.assertEqual((kind, entry_version), ('occupancy', version + 1))
+        self.assertEqual(data, {'version': entry_version, 'freed': [], 'taken': [space_id]})
+        response.close()
+        self.assertEqual(occupancy_broker.subscriber_count, 0)
+        
+        # Desconectado se pierde la salida; al reconectar recibe solo ese cambio
+        self.client.post('/api/sessions/exit', data=json.dumps({'license_plate': 'SSE001'}), content_type='application/json')
+        response = self.client.get('/api/spaces/stream', headers={'Last-Event-ID': str(entry_version)}, buffered=False)
+        events = iter(response.response)
+        exit_version, kind, data = self._read_event(events)
+        self.assertEqual((kind, exit_version), ('occupancy', entry_version + 1))
+        self.assertEqual(data['taken'], [])
+        self.assertEqual([space['id'] for space in data['freed']], [space_id])
+        self.assertFalse(data['freed'][0]['is_occupied'])
+        response.close()
+        
+        # Una versión que el historial no cubre (p. ej. vista en otro proceso) recibe la foto completa
+        response = self.client.get(f'/api/spaces/stream?since={exit_version + 100}', buffered=False)
+        self.assertEqual(self._read_event(iter(response.response))[1], 'snapshot')
+        response.close()
+        
+        # Consumidor lento: con la cola llena se descarta y su stream termina
+        occupancy_broker.queue_size = 1
+        response = self.client.get(f'/api/spaces/stream?since={exit_version}', buffered=False)
+        events = iter(response.response)
+        for _ in range(2):
+            self.client.post('/api/sessions/entry', data=json.dumps({'license_plate': 'SSE001'}), content_type='application/json')
+            self.client.post('/api/sessions/exit', data=json.dumps({'license_plate': 'SSE001'}), content_type='application/json')
+        self.assertEqual(occupancy_broker.subscriber_count, 0)
+        self.assertEqual(self._read_event(events)[0], exit_version + 1)
+        self.assertEqual(list(events), [])
+        response.close()
+        
+        # Con el límite de clientes del proceso alcanzado, el siguiente recibe 503 y Retry-After
+        occupancy_broker.max_clients = 1
+        response = self.client.get('/api/spaces/stream', buffered=False)
+        self.assertEqual(self._read_event(iter(response.response))[1], 'snapshot')
+        rejected = self.client.get('/api/spaces/stream')
+        self.assertEqual(rejected.status_code, 503)
+        self.assertEqual(rejected.headers['Retry-After'], '3')
+        response.close()
+        self.assertEqual(occupancy_broker.subscriber_count, 0)
+        response = self.client.get('/api/spaces/stream', buffered=False)
+        self.assertEqual(response.status_code, 200)
+        response.close()
+        self.assertEqual(occupancy_broker.subscriber_count, 0)
+        
+        self.assertEqual(self.client.get('/api/spaces/stream?since=x').status_code, 400)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -1,13 +1,27 @@
 import unittest
+import json
 import os
+import shutil
+import subprocess
 import sys
 import tempfile
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+from flask import jsonify
+from prometheus_client.parser import text_string_to_metric_families
+from sqlalchemy.exc import IntegrityError
 
 # Agregar el directorio raíz al path
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
 
-from app import create_app, db
-from app.models.parking import ParkingSpace, Vehicle, ParkingSession
+from app import analytics, counters, create_app, db, revenue
+from app.archive import archive_sessions
+from app.data_version import data_version
+from app.models.parking import ParkingSpace, Vehicle, ParkingSession, ParkingSessionHistory, ParkingCounter, RevenueDaily
+from app.space_index import space_index
+from tests.query_budget import QueryCounter, query_budget
 
 class TestIntegration(unittest.TestCase):
     
@@ -17,7 +31,7 @@ class TestIntegration(unittest.TestCase):
         self.db_fd, self.db_path = tempfile.mkstemp()
         
         # Configurar la aplicación para testing
-        self.app = create_app()
+        self.app = create_app('testing')
         self.app.config['TESTING'] = True
         self.app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{self.db_path}'
         self.app.config['WTF_CSRF_ENABLED'] = False
@@ -124,6 +138,800 @@ class TestIntegration(unittest.TestCase):
         vehicles_with_phone = Vehicle.query.filter(Vehicle.owner_phone.isnot(None)).all()
         self.assertEqual(len(vehicles_with_phone), 2)
     
+    def _create_sessions(self, count, offset=0):
+        """Crea `count` sesiones activas, cada una con su propio vehículo y espacio"""
+        for i in range(offset, offset + count):
+            space = ParkingSpace(number=f'Q{i}', floor=1)
+            vehicle = Vehicle(license_plate=f'QRY{i}', vehicle_type='car', owner_name='Prueba')
+            db.session.add_all([space, vehicle])
+            db.session.flush()
+            db.session.add(ParkingSession(vehicle_id=vehicle.id, space_id=space.id))
+        db.session.commit()
+        db.session.expunge_all()
+    
+    def _count_queries(self, url):
+        """Cuenta las sentencias SQL emitidas al hacer GET sobre `url`"""
+        with QueryCounter() as counter:
+            response = self.client.get(url)
+        
+        self.assertEqual(response.status_code, 200)
+        return counter.count, json.loads(response.data)
+    
+    def test_session_listing_query_count_is_constant(self):
+        """
+        Prueba de integración: El listado de sesiones no hace una consulta por fila
+        El número de consultas no crece al aumentar el número de sesiones
+        """
+        for url in ['/api/sessions', '/api/sessions/active']:
+            db.session.query(ParkingSession).delete()
+            db.session.query(ParkingSpace).delete()
+            db.session.query(Vehicle).delete()
+            db.session.commit()
+            
+            # Pocas sesiones
+            self._create_sessions(3)
+            few_queries, few_data = self._count_queries(url)
+            self.assertEqual(len(few_data), 3)
+            
+            # Muchas sesiones
+            self._create_sessions(30, offset=3)
+            many_queries, many_data = self._count_queries(url)
+            self.assertEqual(len(many_data), 33)
+            
+            # La cantidad de consultas debe ser la misma
+            self.assertEqual(few_queries, many_queries)
+            
+            # Cada sesión incluye su vehículo y su espacio
+            for session in many_data:
+                self.assertEqual(session['vehicle']['id'], session['vehicle_id'])
+                self.assertEqual(session['space']['id'], session['space_id'])
+    
+    # Presupuesto de consultas de cada ruta de parking_routes.py y report_routes.py:
+    # (método, URL, cuerpo, status esperado, máximo de consultas).
+    # Las rutas con ETag incluyen la lectura de data_version (una vez por TTL);
+    # las salidas incluyen el UPDATE + INSERT de la primera fila del día en revenue_daily.
+    # Contadores y versiones se escriben con un solo UPDATE ... RETURNING por petición
+    # (el lote suma el UPDATE que toma el bloqueo de escritura al inicio).
+    # Salida y pago cargan la sesión con vehículo y espacio (query_with_relations),
+    # también al recargarla para serializarla tras el commit
+    ROUTE_QUERY_BUDGETS = [
+        ('GET', '/api/spaces', None, 200, 2),
+        ('GET', '/api/spaces?limit=10', None, 200, 2),
+        ('POST', '/api/spaces', {'number': 'NEW1'}, 201, 3),
+        ('GET', '/api/spaces/{free_space_id}', None, 200, 1),
+        ('DELETE', '/api/spaces/{free_space_id}', None, 204, 5),
+        ('GET', '/api/spaces/available', None, 200, 2),
+        ('GET', '/api/spaces/available?floor=1&type=regular', None, 200, 2),
+        ('GET', '/api/spaces/stream', None, 200, 1),
+        ('POST', '/api/spaces/import', 'number,floor\nIMP1,1\nIMP2,2\n', 200, 3),
+        ('GET', '/api/vehicles', None, 200, 1),
+        ('GET', '/api/vehicles?limit=10', None, 200, 1),
+        ('POST', '/api/vehicles', {'license_plate': 'NEW001', 'vehicle_type': 'car', 'owner_name': 'Nuevo'}, 201, 4),
+        ('GET', '/api/vehicles/{free_plate}', None, 200, 1),
+        ('DELETE', '/api/vehicles/{free_vehicle_id}', None, 204, 5),
+        ('POST', '/api/vehicles/import', '{"license_plate": "IMP001", "vehicle_type": "car", "owner_name": "Imp"}\n', 200, 3),
+        ('GET', '/api/sessions', None, 200, 1),
+        ('GET', '/api/sessions?plate={parked_plate}&from=2020-01-01&payment_status=pending', None, 200, 1),
+        ('GET', '/api/sessions?limit=10', None, 200, 1),
+        ('GET', '/api/sessions/active', None, 200, 1),
+        ('POST', '/api/sessions/entry', {'license_plate': '{free_plate}', 'space_id': '{free_space_id}'}, 201, 8),
+        ('POST', '/api/sessions/entry', {'license_plate': '{free_plate}'}, 201, 9),
+        ('POST', '/api/sessions/exit', {'license_plate': '{parked_plate}'}, 200, 8),
+        ('POST', '/api/sessions/batch', {'events': [
+            {'type': 'exit', 'license_plate': '{parked_plate}'},
+            {'type': 'entry', 'license_plate': '{free_plate}'},
+        ]}, 200, 10),
+        ('POST', '/api/sessions/{closed_session_id}/pay', None, 200, 4),
+        ('GET', '/api/stats', None, 200, 2),
+        ('GET', '/api/reports/revenue?group=month&by=floor', None, 200, 2),
+        ('GET', '/api/reports/occupancy?by=floor', None, 200, 2),
+        ('GET', '/api/reports/dwell?floor=1', None, 200, 2),
+        ('GET', '/api/test', None, 200, 0),
+    ]
+    
+    def _seed_route_fixtures(self, size):
+        """
+        `size` espacios y vehículos: la mitad con sesión activa, cada uno con
+        una sesión cerrada (la mitad archivada) y el resto libres y sin historial
+        """
+        spaces = [ParkingSpace(number=f'R{i}', floor=1 + i % 3) for i in range(size)]
+        vehicles = [Vehicle(license_plate=f'RTE{i}', vehicle_type='car', owner_name='Prueba') for i in range(size)]
+        db.session.add_all(spaces + vehicles)
+        data_version.bump()
+        db.session.flush()
+        
+        parked = size // 2
+        closed = []
+        for space, vehicle in zip(spaces[:parked], vehicles[:parked]):
+            space.is_occupied = True
+            db.session.add(ParkingSession(vehicle_id=vehicle.id, space_id=space.id))
+            session = ParkingSession(
+                vehicle_id=vehicle.id, space_id=space.id, is_active=False,
+                exit_time=datetime.utcnow(), total_hours=1.0, total_cost=2000.0
+            )
+            db.session.add(session)
+            closed.append(session)
+        db.session.flush()
+        
+        for session in closed[:parked // 2]:
+            db.session.add(ParkingSessionHistory(**{
+                column.name: getattr(session, column.name) for column in ParkingSession.__table__.columns
+            }))
+            db.session.delete(session)
+        db.session.commit()
+        
+        fixtures = {
+            'free_space_id': spaces[-1].id,
+            'free_vehicle_id': vehicles[-1].id,
+            'free_plate': vehicles[-1].license_plate,
+            'parked_plate': vehicles[0].license_plate,
+            'closed_session_id': closed[-1].id,
+        }
+        counters.adjust(spaces=True, total_spaces=size, total_vehicles=size, occupied_spaces=parked, active_sessions=parked)
+        space_index.rebuild()
+        db.session.expunge_all()
+        return fixtures
+    
+    def _fill(self, value, fixtures):
+        """Reemplaza los valores '{nombre}' del cuerpo JSON por la fixture correspondiente"""
+        if isinstance(value, str) and value.startswith('{') and value.endswith('}') and value[1:-1] in fixtures:
+            return fixtures[value[1:-1]]
+        if isinstance(value, list):
+            return [self._fill(item, fixtures) for item in value]
+        if isinstance(value, dict):
+            return {key: self._fill(item, fixtures) for key, item in value.items()}
+        return value
+    
+    def test_route_query_budgets_do_not_grow_with_data(self):
+        """
+        Prueba de integración: Cada ruta respeta su presupuesto de consultas SQL
+        con pocos y con muchos registros, así que un N+1 en to_dict se detecta
+        """
+        for size in [4, 40]:
+            for method, url, body, status, budget in self.ROUTE_QUERY_BUDGETS:
+                # Datos nuevos para cada ruta: las rutas de escritura cambian el estado
+                db.session.remove()
+                db.drop_all()
+                db.create_all()
+                fixtures = self._seed_route_fixtures(size)
+                url = url.format(**fixtures)
+                if not isinstance(body, str):
+                    body = self._fill(body, fixtures)
+                
+                label = f'{method} {url} con {size} registros'
+                with self.subTest(label):
+                    with query_budget(self, budget, label=label):
+                        if isinstance(body, str):
+                            content_type = 'text/csv' if url.endswith('spaces/import') else 'application/x-ndjson'
+                            response = self.client.open(url, method=method, data=body, content_type=content_type)
+                        else:
+                            response = self.client.open(url, method=method, json=body)
+                        if response.mimetype == 'text/event-stream':
+                            # El stream no termina: se lee hasta la foto inicial
+                            events = iter(response.response)
+                            while b'snapshot' not in next(events):
+                                pass
+                            response.close()
+                    self.assertEqual(response.status_code, status, response.data)
+    
+    def test_projection_serializers_match_to_dict(self):
+        """
+        Prueba de integración: Los listados serializados por proyección son
+        idénticos byte a byte a jsonify() de los to_dict() de los modelos
+        """
+        fixtures = self._seed_route_fixtures(6)
+        # Texto no ASCII, teléfono nulo y espacio con otra tarifa
+        vehicle = db.session.get(Vehicle, fixtures['free_vehicle_id'])
+        vehicle.owner_name = 'José Peña ñandú 🚗'
+        db.session.get(ParkingSpace, fixtures['free_space_id']).hourly_rate = 1234.5
+        db.session.add(Vehicle(license_plate='NUL001', vehicle_type='motorcycle', owner_name='Sin teléfono', owner_phone=None))
+        db.session.commit()
+        
+        sessions = ParkingSession.query.all() + ParkingSessionHistory.query.all()
+        expected = {
+            '/api/spaces': [space.to_dict() for space in ParkingSpace.query.order_by(ParkingSpace.id)],
+            '/api/vehicles': [vehicle.to_dict() for vehicle in Vehicle.query.order_by(Vehicle.id)],
+            '/api/sessions': [session.to_dict() for session in sorted(sessions, key=lambda session: session.id)],
+            '/api/sessions/active': [session.to_dict() for session in sorted(sessions, key=lambda session: session.id) if session.is_active],
+        }
+        
+        for url, items in expected.items():
+            with self.subTest(url):
+                with self.app.test_request_context():
+                    expected_body = jsonify(items).get_data()
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.mimetype, 'application/json')
+                self.assertEqual(response.get_data(), expected_body)
+    
+    def test_session_filters_compile_to_one_indexed_query(self):
+        """
+        Prueba de integración: Los filtros de /api/sessions retornan lo mismo que
+        filtrar la lista completa, en una sola consulta que usa índices
+        """
+        floors = [1, 1, 2, 3]
+        spaces = [ParkingSpace(number=f'F{i}', floor=floor) for i, floor in enumerate(floors)]
+        vehicles = [Vehicle(license_plate=f'FIL{i}', vehicle_type='car', owner_name='Filtro') for i in range(4)]
+        db.session.add_all(spaces + vehicles)
+        db.session.flush()
+        
+        base = datetime(2026, 3, 1, 8, 0)
+        for day in range(6):
+            for i, (space, vehicle) in enumerate(zip(spaces, vehicles)):
+                entry_time = base + timedelta(days=day, hours=i)
+                db.session.add(ParkingSession(
+                    vehicle_id=vehicle.id, space_id=space.id, entry_time=entry_time,
+                    exit_time=entry_time + timedelta(hours=3), total_hours=3.0, total_cost=6000.0,
+                    is_active=False, payment_status='paid' if (day + i) % 2 else 'pending'
+                ))
+        db.session.add(ParkingSession(vehicle_id=vehicles[0].id, space_id=spaces[0].id, entry_time=base + timedelta(days=7)))
+        db.session.commit()
+        # Las sesiones de los dos primeros días pagadas pasan al histórico
+        archived = ParkingSession.query.filter(ParkingSession.entry_time < base + timedelta(days=2),
+                                               ParkingSession.payment_status == 'paid').all()
+        for session in archived:
+            db.session.add(ParkingSessionHistory(**{
+                column.name: getattr(session, column.name) for column in ParkingSession.__table__.columns
+            }))
+            db.session.delete(session)
+        db.session.commit()
+        
+        everything = json.loads(self.client.get('/api/sessions').data)
+        self.assertEqual(len(everything), 25)
+        space_floors = {space.id: space.floor for space in spaces}
+        cases = {
+            'plate=fil1': lambda s: s['vehicle']['license_plate'] == 'FIL1',
+            f'space_id={spaces[2].id}': lambda s: s['space_id'] == spaces[2].id,
+            'floor=1': lambda s: space_floors[s['space_id']] == 1,
+            'payment_status=paid': lambda s: s['payment_status'] == 'paid',
+            'is_active=true': lambda s: s['is_active'],
+            'is_active=false&plate=FIL0': lambda s: not s['is_active'] and s['vehicle_id'] == vehicles[0].id,
+            'from=2026-03-02&to=2026-03-03': lambda s: '2026-03-02' <= s['entry_time'] < '2026-03-04',
+            'from=2026-03-02T12:00:00&to=2026-03-04&time_field=exit_time':
+                lambda s: '2026-03-02T12:00:00' <= (s['exit_time'] or '') < '2026-03-05',
+            'to=2026-03-01T10:00:00%2B00:00&floor=1': lambda s: s['entry_time'] < '2026-03-01T10:00:00' and space_floors[s['space_id']] == 1,
+        }
+        
+        for params, predicate in cases.items():
+            with self.subTest(params):
+                with QueryCounter() as counter:
+                    response = self.client.get(f'/api/sessions?{params}')
+                self.assertEqual(response.status_code, 200, response.data)
+                expected = [session for session in everything if predicate(session)]
+                self.assertTrue(expected)
+                self.assertEqual(json.loads(response.data), expected)
+                self.assertEqual(counter.count, 1)
+                
+                # Los filtros selectivos no recorren las tablas de sesiones completas
+                if 'is_active' not in params and 'payment_status' not in params:
+                    plan = db.session.connection().exec_driver_sql(
+                        f'EXPLAIN QUERY PLAN {counter.statements[0]}', counter.parameters[0]
+                    ).all()
+                    scans = [row[3] for row in plan if row[3].startswith('SCAN parking_sessions')]
+                    self.assertEqual(scans, [])
+        
+        # Paginación por cursor sobre un filtro
+        first = self.client.get('/api/sessions?payment_status=pending&limit=5')
+        second = self.client.get(f"/api/sessions?payment_status=pending&limit=5&after={first.headers['X-Next-Cursor']}")
+        pending = [session for session in everything if session['payment_status'] == 'pending']
+        self.assertEqual(json.loads(first.data) + json.loads(second.data), pending[:10])
+        
+        # /sessions/active acepta los mismos filtros
+        active = json.loads(self.client.get('/api/sessions/active?plate=FIL0').data)
+        self.assertEqual([session['is_active'] for session in active], [True])
+        
+        for params in ['floor=x', 'payment_status=free', 'is_active=maybe', 'from=ayer', 'time_field=created_at']:
+            self.assertEqual(self.client.get(f'/api/sessions?{params}').status_code, 400)
+    
+    def test_fieldsets_select_and_join_only_requested_fields(self):
+        """
+        Prueba de integración: ?fields= y ?expand= retornan solo los campos pedidos
+        y la consulta solo selecciona esas columnas y une esas relaciones
+        """
+        fixtures = self._seed_route_fixtures(6)
+        full = {
+            path: json.loads(self.client.get(path).data)
+            for path in ['/api/spaces', '/api/vehicles', '/api/sessions', '/api/sessions/active']
+        }
+        
+        def only(item, names):
+            return {name: item[name] for name in names}
+        
+        # (ruta, parámetros, forma esperada, tablas unidas)
+        cases = [
+            ('/api/spaces', 'fields=number,floor', lambda s: only(s, ['number', 'floor']), []),
+            ('/api/vehicles', 'fields=license_plate', lambda v: only(v, ['license_plate']), []),
+            ('/api/sessions', 'fields=id,entry_time,exit_time', lambda s: only(s, ['id', 'entry_time', 'exit_time']), []),
+            ('/api/sessions', 'expand=', lambda s: {k: v for k, v in s.items() if k not in ('vehicle', 'space')}, []),
+            ('/api/sessions', 'expand=space', lambda s: {k: v for k, v in s.items() if k != 'vehicle'},
+             ['parking_spaces']),
+            ('/api/sessions', 'fields=total_cost,vehicle.license_plate',
+             lambda s: {'total_cost': s['total_cost'], 'vehicle': only(s['vehicle'], ['license_plate'])}, ['vehicles']),
+            ('/api/sessions/active', 'fields=space_id,vehicle&expand=space',
+             lambda s: only(s, ['space_id', 'vehicle', 'space']), ['vehicles', 'parking_spaces']),
+        ]
+        for path, params, shape, joined in cases:
+            with self.subTest(f'{path}?{params}'):
+                with QueryCounter() as counter:
+                    response = self.client.get(f'{path}?{params}')
+                self.assertEqual(response.status_code, 200, response.data)
+                self.assertEqual(json.loads(response.data), [shape(item) for item in full[path]])
+                self.assertEqual(counter.count, 1)
+                for table in ['vehicles', 'parking_spaces']:
+                    self.assertEqual(f'JOIN {table} ' in counter.statements[0], table in joined, table)
+        
+        # Filtrar por placa no obliga a unir la tabla de vehículos
+        with QueryCounter() as counter:
+            response = self.client.get(f"/api/sessions/active?fields=id&plate={fixtures['parked_plate']}")
+        self.assertEqual(len(json.loads(response.data)), 1)
+        self.assertNotIn('JOIN', counter.statements[0])
+        
+        # Paginación por cursor sin pedir el id
+        first = self.client.get('/api/spaces?fields=number&limit=4')
+        second = self.client.get(f"/api/spaces?fields=number&limit=4&after={first.headers['X-Next-Cursor']}")
+        self.assertEqual(json.loads(first.data) + json.loads(second.data),
+                         [only(space, ['number']) for space in full['/api/spaces']])
+        
+        # Detalle de espacio y vehículo, y espacios libres desde el índice
+        space = json.loads(self.client.get(f"/api/spaces/{fixtures['free_space_id']}?fields=id,is_occupied").data)
+        self.assertEqual(space, {'id': fixtures['free_space_id'], 'is_occupied': False})
+        vehicle = json.loads(self.client.get(f"/api/vehicles/{fixtures['free_plate']}?fields=license_plate").data)
+        self.assertEqual(vehicle, {'license_plate': fixtures['free_plate']})
+        available = json.loads(self.client.get('/api/spaces/available?fields=id').data)
+        self.assertIn({'id': fixtures['free_space_id']}, available)
+        self.assertEqual(self.client.get('/api/spaces/999999?fields=id').status_code, 404)
+        
+        for url in ['/api/spaces?fields=owner_name', '/api/spaces?expand=vehicle', '/api/sessions?fields=',
+                    '/api/sessions?fields=vehicle.hourly_rate', '/api/sessions?expand=driver',
+                    '/api/vehicles/X?fields=floor', '/api/spaces/available?fields=x']:
+            self.assertEqual(self.client.get(url).status_code, 400, url)
+    
+    def _revenue_rows(self):
+        return {
+            (row.day, row.floor, row.space_type, row.vehicle_type): (row.week, row.month, row.sessions,
+                                                                     round(row.total_cost, 2), round(row.total_hours, 2))
+            for row in RevenueDaily.query
+        }
+    
+    def test_revenue_rollup_follows_exits_and_reports_aggregate_in_sql(self):
+        """
+        Prueba de integración: El resumen diario de ingresos se actualiza con cada
+        salida igual que si se recalculara, y el reporte agrega por período y
+        dimensión con una consulta que no depende del número de sesiones
+        """
+        spaces = [ParkingSpace(number=f'V{i}', floor=1 + i % 2, space_type=('regular', 'electric')[i % 2],
+                               hourly_rate=1000.0 * (i + 1)) for i in range(4)]
+        vehicles = [Vehicle(license_plate=f'REV{i}', vehicle_type=('car', 'motorcycle')[i // 2], owner_name='Ingresos')
+                    for i in range(4)]
+        db.session.add_all(spaces + vehicles)
+        db.session.flush()
+        
+        # 40 días de sesiones cerradas (la mitad archivadas), del 2026-01-20 al 2026-02-28
+        base = datetime(2026, 1, 20, 8, 0)
+        for day in range(40):
+            for i, (space, vehicle) in enumerate(zip(spaces, vehicles)):
+                entry_time = base + timedelta(days=day, hours=i)
+                model = ParkingSessionHistory if day % 2 else ParkingSession
+                extra = {'id': 10000 + day * 4 + i} if model is ParkingSessionHistory else {}
+                db.session.add(model(
+                    vehicle_id=vehicle.id, space_id=space.id, entry_time=entry_time,
+                    exit_time=entry_time + timedelta(hours=1 + i), total_hours=1.0 + i,
+                    total_cost=(1.0 + i) * space.hourly_rate, is_active=False, payment_status='paid', **extra
+                ))
+        db.session.commit()
+        self.assertEqual(revenue.rebuild(), 160)
+        
+        # Las salidas por la API (una y en lote) suman al resumen como lo haría rebuild()
+        vehicle_ids = [vehicle.id for vehicle in vehicles]
+        space_ids = [space.id for space in spaces]
+        for vehicle_id, space_id in zip(vehicle_ids, space_ids):
+            db.session.add(ParkingSession(vehicle_id=vehicle_id, space_id=space_id,
+                                          entry_time=datetime.utcnow() - timedelta(hours=2)))
+        db.session.commit()
+        self.assertEqual(self.client.post('/api/sessions/exit', json={'license_plate': 'REV0'}).status_code, 200)
+        response = self.client.post('/api/sessions/batch', json={'events': [
+            {'type': 'exit', 'license_plate': f'REV{i}'} for i in range(1, 4)
+        ]})
+        self.assertEqual(json.loads(response.data)['succeeded'], 3)
+        
+        incremental = self._revenue_rows()
+        revenue.rebuild()
+        self.assertEqual(incremental, self._revenue_rows())
+        
+        # Reporte contra la agregación de las sesiones en Python
+        closed = ParkingSession.query_with_relations().all() + ParkingSessionHistory.query_with_relations().all()
+        def expected(group, by, start=None, end=None):
+            totals = {}
+            for session in closed:
+                day = session.exit_time.date()
+                if (start and day < start) or (end and day > end):
+                    continue
+                week, month = revenue.period_starts(day)
+                period = {'day': day, 'week': week, 'month': month}[group]
+                dimension = {'floor': session.space.floor, 'space_type': session.space.space_type,
+                             'vehicle_type': session.vehicle.vehicle_type, None: None}[by]
+                count, cost, hours = totals.get((period, dimension), (0, 0.0, 0.0))
+                totals[(period, dimension)] = (count + 1, cost + session.total_cost, hours + session.total_hours)
+            rows = []
+            for (period, dimension), (count, cost, hours) in sorted(totals.items(), key=lambda item: (item[0][0], item[0][1] or '')):
+                row = {'period': period.isoformat()}
+                if by:
+                    row[by] = dimension
+                row.update(sessions=count, total_cost=round(cost, 2), total_hours=round(hours, 2))
+                rows.append(row)
+            return rows
+        
+        cases = [('day', None), ('week', 'floor'), ('month', 'space_type'), ('month', 'vehicle_type'), ('week', None)]
+        for group, by in cases:
+            with self.subTest(group=group, by=by):
+                url = f'/api/reports/revenue?group={group}' + (f'&by={by}' if by else '')
+                with QueryCounter() as counter:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200, response.data)
+                data = json.loads(response.data)
+                self.assertEqual(data['rows'], expected(group, by))
+                self.assertEqual(data['totals']['sessions'], 164)
+                # Una consulta al resumen (más la versión de datos del ETag)
+                self.assertLessEqual(counter.count, 2)
+                self.assertEqual(sum('revenue_daily' in statement for statement in counter.statements), 1)
+                self.assertFalse(any('parking_sessions' in statement for statement in counter.statements))
+        
+        start, end = datetime(2026, 2, 3).date(), datetime(2026, 2, 16).date()
+        data = json.loads(self.client.get('/api/reports/revenue?group=week&by=vehicle_type&from=2026-02-03&to=2026-02-16').data)
+        self.assertEqual(data['rows'], expected('week', 'vehicle_type', start, end))
+        self.assertEqual(data['totals']['sessions'], 14 * 4)
+        
+        for params in ['group=year', 'by=owner_name', 'from=ayer', 'from=2026-03-01&to=2026-02-01']:
+            self.assertEqual(self.client.get(f'/api/reports/revenue?{params}').status_code, 400, params)
+    
+    def test_occupancy_series_matches_minute_by_minute_counts(self):
+        """
+        Prueba de integración: La serie de ocupación por barrido coincide con
+        contar minuto a minuto las sesiones presentes, con sesiones leídas en
+        varios bloques, activas, archivadas y de espacios ya eliminados
+        """
+        self.app.config['ANALYTICS_CHUNK_SIZE'] = 7
+        spaces = [ParkingSpace(number=f'O{i}', floor=1 + i % 2, space_type=('regular', 'electric', 'disabled')[i % 3])
+                  for i in range(6)]
+        vehicles = [Vehicle(license_plate=f'OCC{i}', vehicle_type='car', owner_name='Ocupación') for i in range(40)]
+        db.session.add_all(spaces + vehicles)
+        db.session.flush()
+        
+        base = datetime(2026, 3, 1, 6, 0)
+        intervals = []
+        for i, vehicle in enumerate(vehicles):
+            space = spaces[i % len(spaces)]
+            entry_time = base + timedelta(minutes=37 * i, seconds=13 * i)
+            active = i >= 36
+            exit_time = None if active else entry_time + timedelta(minutes=20 + 29 * (i % 5), seconds=i)
+            model = ParkingSessionHistory if i % 3 == 0 else ParkingSession
+            extra = {'id': 1000 + i} if model is ParkingSessionHistory else {}
+            db.session.add(model(vehicle_id=vehicle.id, space_id=space.id, entry_time=entry_time,
+                                 exit_time=exit_time, is_active=active, **extra))
+            intervals.append((entry_time, exit_time, space))
+        # Sesión de un espacio eliminado: no pertenece a ningún grupo
+        db.session.add(ParkingSessionHistory(id=999, vehicle_id=vehicles[0].id, space_id=9999,
+                                             entry_time=base, exit_time=base + timedelta(hours=5), is_active=False))
+        db.session.commit()
+        
+        now = base + timedelta(hours=25)
+        start, end = base + timedelta(minutes=50, seconds=30), base + timedelta(hours=26)
+        for by in [None, 'floor', 'space_type']:
+            with self.subTest(by=by):
+                buckets, series = analytics.occupancy(start, end, 15, by=by, now=now)
+                self.assertEqual(buckets[0], '2026-03-01T06:50:00')
+                self.assertEqual(len(buckets), 101)
+                groups = [None] if by is None else sorted({getattr(space, by) for space in spaces})
+                self.assertEqual([item.get(by) for item in series], groups)
+                for item in series:
+                    members = [space for space in spaces if by is None or getattr(space, by) == item[by]]
+                    self.assertEqual(item['capacity'], len(members))
+                    for index, bucket in enumerate(buckets):
+                        minutes = [datetime.fromisoformat(bucket) + timedelta(minutes=m) for m in range(15)]
+                        counts = [sum(1 for entry_time, exit_time, space in intervals
+                                      if space in members and entry_time <= t < (exit_time or now))
+                                  for t in minutes]
+                        self.assertEqual(item['peak'][index], max(counts), bucket)
+                        self.assertAlmostEqual(item['average'][index], round(sum(counts) / 15, 2), msg=bucket)
+        
+        response = self.client.get('/api/reports/occupancy?from=2026-03-01T06:00:00&to=2026-03-01&step=60&by=floor')
+        self.assertEqual(response.status_code, 200, response.data)
+        data = json.loads(response.data)
+        self.assertEqual((len(data['buckets']), data['buckets'][0], data['step']), (18, '2026-03-01T06:00:00', 60))
+        self.assertEqual([item['floor'] for item in data['series']], [1, 2])
+        
+        for params in ['step=0', 'step=x', 'by=vehicle_type', 'from=ayer', 'from=2026-03-02&to=2026-03-01',
+                       'from=2020-01-01&to=2026-01-01']:
+            self.assertEqual(self.client.get(f'/api/reports/occupancy?{params}').status_code, 400, params)
+    
+    def test_dwell_report_matches_python_counts_and_cache_follows_exits(self):
+        """
+        Prueba de integración: La permanencia (percentiles, histograma) y las
+        llegadas/salidas por día y hora coinciden con calcularlas fila a fila,
+        y la caché por rango y filtros solo se descarta cuando se cierra una
+        sesión de ese rango
+        """
+        self.app.config['ANALYTICS_CHUNK_SIZE'] = 5
+        spaces = [ParkingSpace(number=f'D{i}', floor=1 + i % 2) for i in range(4)]
+        vehicles = [Vehicle(license_plate=f'DWL{i}', vehicle_type='car', owner_name='Permanencia') for i in range(31)]
+        db.session.add_all(spaces + vehicles)
+        db.session.flush()
+        
+        base = datetime(2026, 3, 2, 7, 0)  # lunes
+        closed = []
+        for i, vehicle in enumerate(vehicles[:30]):
+            space = spaces[i % len(spaces)]
+            entry_time = base + timedelta(hours=7 * i, minutes=i)
+            exit_time = entry_time + timedelta(minutes=5 + 23 * i, seconds=i)
+            model = ParkingSessionHistory if i % 3 == 0 else ParkingSession
+            extra = {'id': 1000 + i} if model is ParkingSessionHistory else {}
+            db.session.add(model(vehicle_id=vehicle.id, space_id=space.id, entry_time=entry_time,
+                                 exit_time=exit_time, is_active=False, **extra))
+            closed.append((entry_time, exit_time, space))
+        # Sesión activa: no tiene permanencia y queda fuera hasta que salga
+        db.session.add(ParkingSession(vehicle_id=vehicles[30].id, space_id=spaces[0].id,
+                                      entry_time=base + timedelta(days=1), is_active=True))
+        spaces[0].is_occupied = True
+        db.session.commit()
+        
+        def expected(sessions):
+            dwell = sorted((exit_time - entry_time).total_seconds() // 60 for entry_time, exit_time, _ in sessions)
+            arrivals = [0] * (7 * 24)
+            for entry_time, _, _ in sessions:
+                arrivals[entry_time.weekday() * 24 + entry_time.hour] += 1
+            return dwell, arrivals
+        
+        for params, predicate in [
+            ('', lambda entry_time, space: True),
+            ('floor=2&from=2026-03-03&to=2026-03-06', lambda entry_time, space: space.floor == 2
+             and datetime(2026, 3, 3) <= entry_time < datetime(2026, 3, 7)),
+        ]:
+            with self.subTest(params=params):
+                sessions = [item for item in closed if predicate(item[0], item[2])]
+                dwell, arrivals = expected(sessions)
+                response = self.client.get(f'/api/reports/dwell?{params}')
+                self.assertEqual(response.status_code, 200, response.data)
+                data = json.loads(response.data)
+                self.assertEqual(data['sessions'], len(sessions))
+                self.assertEqual(data['dwell']['max_minutes'], dwell[-1])
+                for p in analytics.DWELL_PERCENTILES:
+                    # Percentil por rango más cercano
+                    self.assertEqual(data['dwell']['percentiles'][f'p{p}'], dwell[max(1, -(-p * len(dwell) // 100)) - 1])
+                self.assertEqual([bucket['sessions'] for bucket in data['dwell']['histogram']], [
+                    sum(1 for value in dwell if low <= value and (high is None or value < high))
+                    for low, high in zip(analytics.DWELL_BUCKETS, analytics.DWELL_BUCKETS[1:] + (None,))
+                ])
+                self.assertEqual(sum(data['arrivals']['by_weekday_hour'], []), arrivals)
+                self.assertEqual(sum(data['arrivals']['by_hour']), len(sessions))
+                self.assertEqual(sum(data['departures']['by_weekday']), len(sessions))
+                peak = max(range(7 * 24), key=lambda index: (arrivals[index], -index))
+                self.assertEqual(data['arrivals']['peak'], {'weekday': peak // 24, 'hour': peak % 24,
+                                                            'sessions': arrivals[peak]})
+        
+        def report(params):
+            with QueryCounter() as counter:
+                response = self.client.get(f'/api/reports/dwell?{params}')
+            self.assertEqual(response.status_code, 200, response.data)
+            computed = any('parking_sessions_history' in statement for statement in counter.statements)
+            return computed, json.loads(response.data)['sessions']
+        
+        early, late = 'to=2026-03-02', 'from=2026-03-03'
+        self.assertEqual(report(early), (True, 3))
+        self.assertEqual(report(late)[0], True)
+        self.assertEqual(report(early), (False, 3))
+        
+        # La salida de la sesión activa (entró el 2026-03-03) solo invalida el rango que la contiene
+        response = self.client.post('/api/sessions/exit', json={'license_plate': 'DWL30'})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(report(early), (False, 3))
+        self.assertEqual(report(late), (True, 28))
+        self.assertEqual(report(''), (True, 31))
+        
+        # Otro proceso cambia datos: al expirar la versión en memoria este proceso
+        # ve la versión nueva, pero el resultado guardado conserva el ETag con que se calculó
+        etag = self.client.get(f'/api/reports/dwell?{late}').headers['ETag']
+        ParkingCounter.add({'data_version': 1})
+        db.session.commit()
+        data_version.invalidate()
+        self.assertNotEqual(f'W/"v{data_version.current()}"', etag)
+        self.assertEqual(self.client.get(f'/api/reports/dwell?{late}').headers['ETag'], etag)
+        self.assertEqual(self.client.get(f'/api/reports/dwell?{late}', headers={'If-None-Match': etag}).status_code, 304)
+        # Al vencer la entrada se recalcula con la versión nueva
+        analytics.report_cache.clear()
+        self.assertEqual(self.client.get(f'/api/reports/dwell?{late}').headers['ETag'], f'W/"v{data_version.current()}"')
+        
+        for params in ['floor=x', 'from=ayer', 'time_field=created_at']:
+            self.assertEqual(self.client.get(f'/api/reports/dwell?{params}').status_code, 400, params)
+    
+    def test_only_one_active_session_per_vehicle_and_space(self):
+        """
+        Prueba de integración: Los índices únicos parciales impiden dos sesiones activas
+        para el mismo vehículo o el mismo espacio, pero permiten el historial cerrado
+        """
+        space = ParkingSpace(number='U1', floor=1)
+        other_space = ParkingSpace(number='U2', floor=1)
+        vehicle = Vehicle(license_plate='UNQ123', vehicle_type='car', owner_name='Prueba')
+        other_vehicle = Vehicle(license_plate='UNQ456', vehicle_type='car', owner_name='Prueba')
+        db.session.add_all([space, other_space, vehicle, other_vehicle])
+        db.session.commit()
+        
+        # Varias sesiones cerradas del mismo vehículo y espacio son válidas
+        for _ in range(2):
+            db.session.add(ParkingSession(vehicle_id=vehicle.id, space_id=space.id, is_active=False))
+        db.session.add(ParkingSession(vehicle_id=vehicle.id, space_id=space.id))
+        db.session.commit()
+        
+        # Segunda sesión activa del mismo vehículo
+        db.session.add(ParkingSession(vehicle_id=vehicle.id, space_id=other_space.id))
+        with self.assertRaises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+        
+        # Segunda sesión activa en el mismo espacio
+        db.session.add(ParkingSession(vehicle_id=other_vehicle.id, space_id=space.id))
+        with self.assertRaises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+        
+        self.assertEqual(ParkingSession.query.filter_by(is_active=True).count(), 1)
+    
+    def _flask_db(self, db_path, *args):
+        """Ejecuta `flask db ...` (como indica el README) sobre la base `db_path` en un proceso aparte"""
+        env = dict(os.environ, FLASK_APP='run.py', FLASK_ENV='production', DATABASE_URL=f'sqlite:///{db_path}',
+                   COUNTER_RECONCILE_INTERVAL='0', CREATE_TABLES='')
+        result = subprocess.run([sys.executable, '-m', 'flask', 'db', *args], cwd=ROOT, env=env,
+                                capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+    
+    @staticmethod
+    def _schema(db_path):
+        """Tablas de la base `db_path` con los nombres de sus índices"""
+        engine = sa.create_engine(f'sqlite:///{db_path}')
+        try:
+            inspector = sa.inspect(engine)
+            return {table: {index['name'] for index in inspector.get_indexes(table)}
+                    for table in inspector.get_table_names() if table != 'alembic_version'}
+        finally:
+            engine.dispose()
+    
+    def test_migrations_build_model_schema_from_any_starting_point(self):
+        """
+        Prueba de integración: `flask db upgrade` deja el esquema de los modelos
+        partiendo de una base vacía, de una base con el esquema original o de
+        una creada por db.create_all() (estas dos marcadas con stamp 0001), y
+        downgrade base la vacía de nuevo
+        """
+        expected = {table.name: {index.name for index in table.indexes} for table in db.metadata.sorted_tables}
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        
+        fresh = os.path.join(workdir, 'fresh.db')
+        self._flask_db(fresh, 'upgrade')
+        self.assertEqual(self._schema(fresh), expected)
+        self._flask_db(fresh, 'downgrade', 'base')
+        self.assertEqual(self._schema(fresh), {})
+        
+        # Base con el esquema original: el de la revisión 0001, sin registro de Alembic
+        baseline = os.path.join(workdir, 'baseline.db')
+        self._flask_db(baseline, 'upgrade', '0001')
+        engine = sa.create_engine(f'sqlite:///{baseline}')
+        with engine.begin() as connection:
+            connection.execute(sa.text('DROP TABLE alembic_version'))
+        engine.dispose()
+        
+        created = os.path.join(workdir, 'created.db')
+        engine = sa.create_engine(f'sqlite:///{created}')
+        db.metadata.create_all(engine)
+        engine.dispose()
+        
+        for source in (baseline, created):
+            with self.subTest(source=os.path.basename(source)):
+                copy = os.path.join(workdir, f'copy-{os.path.basename(source)}')
+                shutil.copy(source, copy)
+                self._flask_db(copy, 'stamp', '0001')
+                self._flask_db(copy, 'upgrade')
+                self.assertEqual(self._schema(copy), expected)
+    
+    def test_metrics_add_up_requests_from_every_worker_process(self):
+        """
+        Prueba de integración: con PROMETHEUS_MULTIPROC_DIR (como lo define
+        gunicorn.conf.py) /metrics responde los totales de todos los procesos,
+        incluidos los que ya terminaron, sin etiquetas por proceso
+        """
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        metrics_dir = os.path.join(workdir, 'metrics')
+        os.makedirs(metrics_dir)
+        env = dict(os.environ, FLASK_ENV='production', DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'workers.db')}",
+                   COUNTER_RECONCILE_INTERVAL='0', PROMETHEUS_MULTIPROC_DIR=metrics_dir)
+        # Cada proceso hace de worker: atiende N peticiones y el último responde el scrape
+        worker = ('import sys\n'
+                  'from wsgi import app\n'
+                  'client = app.test_client()\n'
+                  'for _ in range(int(sys.argv[1])):\n'
+                  '    client.get("/api/test")\n'
+                  'if len(sys.argv) > 2:\n'
+                  '    sys.stdout.write(client.get("/metrics").get_data(as_text=True))\n')
+
+        outputs = []
+        for args in (['2'], ['3', 'scrape']):
+            result = subprocess.run([sys.executable, '-c', worker, *args], cwd=ROOT, env=env,
+                                    capture_output=True, text=True)
+            self.assertEqual(result.returncode, 0, result.stderr)
+            outputs.append(result.stdout)
+
+        counts = [sample for family in text_string_to_metric_families(outputs[-1]) for sample in family.samples
+                  if sample.name == 'parking_http_request_duration_seconds_count']
+        self.assertEqual([(sample.labels, sample.value) for sample in counts],
+                         [({'endpoint': 'parking.test_endpoint', 'method': 'GET', 'status': '200'}, 5.0)])
+
+    def test_archive_moves_old_paid_sessions_to_history(self):
+        """
+        Prueba de integración: Archivar sesiones cerradas y pagadas antiguas
+        Las sesiones pasan a parking_sessions_history y el listado las sigue mostrando
+        """
+        space = ParkingSpace(number='H1', floor=1, hourly_rate=1000.0)
+        vehicle = Vehicle(license_plate='HIS123', vehicle_type='car', owner_name='Prueba')
+        db.session.add_all([space, vehicle])
+        db.session.commit()
+        
+        old = datetime.utcnow() - timedelta(days=100)
+        recent = datetime.utcnow() - timedelta(days=1)
+        # (fin de la sesión, estado de pago): solo las tres primeras se archivan
+        closed = [(old, 'paid'), (old, 'paid'), (old, 'paid'), (old, 'pending'), (recent, 'paid')]
+        for exit_time, payment_status in closed:
+            db.session.add(ParkingSession(
+                vehicle_id=vehicle.id, space_id=space.id, is_active=False,
+                entry_time=exit_time - timedelta(hours=2), exit_time=exit_time,
+                total_hours=2.0, total_cost=2000.0, payment_status=payment_status
+            ))
+        db.session.add(ParkingSession(vehicle_id=vehicle.id, space_id=space.id))
+        db.session.commit()
+        all_ids = [session.id for session in ParkingSession.query.order_by(ParkingSession.id)]
+        
+        # Bloques de 2 filas: se necesitan dos bloques para las tres sesiones
+        archived = archive_sessions(older_than_days=30, batch_size=2)
+        self.assertEqual(archived, 3)
+        self.assertEqual(ParkingSession.query.count(), 3)
+        self.assertEqual(
+            [session.id for session in ParkingSessionHistory.query.order_by(ParkingSessionHistory.id)],
+            all_ids[:3]
+        )
+        
+        # Una segunda ejecución no encuentra nada más que archivar
+        self.assertEqual(archive_sessions(older_than_days=30, batch_size=2), 0)
+        
+        # El listado recorre ambas tablas en orden, también paginado
+        response = self.client.get('/api/sessions')
+        self.assertEqual([session['id'] for session in json.loads(response.data)], all_ids)
+        
+        listed = []
+        url = '/api/sessions?limit=4'
+        while url:
+            response = self.client.get(url)
+            listed.extend(session['id'] for session in json.loads(response.data))
+            cursor = response.headers.get('X-Next-Cursor')
+            url = f'/api/sessions?limit=4&after={cursor}' if cursor else None
+        self.assertEqual(listed, all_ids)
+        
+        # Las sesiones archivadas conservan vehículo, espacio y costo
+        archived_session = json.loads(self.client.get('/api/sessions?limit=1').data)[0]
+        self.assertEqual(archived_session['vehicle']['license_plate'], 'HIS123')
+        self.assertEqual(archived_session['total_cost'], 2000.0)
+        
+        # Al archivar la sesión con el id más alto, su id no se reutiliza en la tabla viva
+        last_session = db.session.get(ParkingSession, all_ids[-1])
+        last_session.is_active = False
+        last_session.exit_time = old
+        last_session.payment_status = 'paid'
+        db.session.commit()
+        self.assertEqual(archive_sessions(older_than_days=30), 1)
+        
+        new_session = ParkingSession(vehicle_id=vehicle.id, space_id=space.id)
+        db.session.add(new_session)
+        db.session.commit()
+        self.assertGreater(new_session.id, all_ids[-1])
+    
     def test_delete_parking_session_from_database(self):
         """
         Prueba de integración: Eliminar registro de base de datos
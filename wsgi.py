@@ -0,0 +1,8 @@
+from app import create_app
+from dotenv import load_dotenv
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Aplicación para servidores WSGI de producción (gunicorn -c gunicorn.conf.py wsgi:app)
+app = create_app()